@@ -0,0 +1,101 @@
+"""离线批量分析通话录音：语音识别 + 音频情感 + 文本情感及两者的融合结果，结果写入JSONL
+
+用法:
+    python batch_analyze.py 录音目录 -o results.jsonl --batch-size 8
+    python batch_analyze.py 录音目录 -o results.jsonl --timeline   # 另外输出逐段的转写和情感时间线
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from models.model_manager import ModelManager
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg")
+
+
+def find_audio_files(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量分析通话录音的文本和情感")
+    parser.add_argument("directory", help="录音文件所在目录（递归查找）")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="输出的JSONL文件")
+    parser.add_argument("--batch-size", type=int, default=8, help="每个模型前向的批大小")
+    parser.add_argument("--chunk-size", type=int, default=64, help="每次读入内存的文件数")
+    parser.add_argument("--timeline", action="store_true", help="输出按Whisper分段对齐的情感时间线")
+    args = parser.parse_args()
+
+    paths = find_audio_files(args.directory)
+    if not paths:
+        print(f"目录中没有音频文件: {args.directory}")
+        return 1
+    print(f"共找到 {len(paths)} 个音频文件")
+
+    # 三个模型都会用到，后台并发加载
+    manager = ModelManager(warmup=True)
+
+    start = time.perf_counter()
+    processed = 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        for offset in range(0, len(paths), args.chunk_size):
+            chunk = paths[offset:offset + args.chunk_size]
+            audios = []
+            for path in chunk:
+                try:
+                    # 解码一次，后续各模型共享同一段波形
+                    audios.append(manager.decode_audio(path))
+                except Exception as e:
+                    print(f"跳过无法解码的文件 {path}: {str(e)}")
+            if not audios:
+                continue
+
+            if args.timeline:
+                # 时间线需要Whisper的分段时间戳：每个文件只转写一次、只做一次分窗口音频情感分析，
+                # 整段的文本和音频情感直接取自这两步的结果
+                timelines = [manager.analyze_call_timeline(audio, batch_size=args.batch_size) for audio in audios]
+                texts = [timeline["text"] for timeline in timelines]
+                emotions = manager.analyze_multimodal_emotion_batch(
+                    texts, audios, batch_size=args.batch_size,
+                    audio_emotions=[timeline["emotions"] for timeline in timelines]
+                )
+            else:
+                texts = manager.recognize_batch(audios, batch_size=args.batch_size)
+                emotions = manager.analyze_multimodal_emotion_batch(texts, audios, batch_size=args.batch_size)
+
+            for i, (audio, text, emotion) in enumerate(zip(audios, texts, emotions)):
+                record = {
+                    "file": audio.source,
+                    "duration": round(audio.duration, 3),
+                    "transcript": text,
+                    "audio_emotion": emotion["audio"],
+                    "text_emotion": emotion["text"],
+                    "text_specific_emotion": emotion["text_specific"],
+                    "combined_emotion": emotion["combined"],
+                }
+                if args.timeline:
+                    record["timeline"] = timelines[i]["segments"]
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+
+            processed += len(audios)
+            elapsed = time.perf_counter() - start
+            print(f"已处理 {processed}/{len(paths)}，吞吐量 {processed / elapsed * 60:.1f} 文件/分钟")
+
+    elapsed = time.perf_counter() - start
+    print(f"完成: {processed} 个文件，耗时 {elapsed:.1f}s，吞吐量 {processed / elapsed * 60:.1f} 文件/分钟")
+    print(f"模型加载耗时: {manager.load_timings}")
+    print(f"文本情感升级到大模型的比例: {manager.emotion_escalation_rate:.1%}")
+    print(f"结果已写入: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
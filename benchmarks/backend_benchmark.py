@@ -0,0 +1,149 @@
+"""推理后端基准：在固定的本地测试集上比较各后端与fp32基线的准确度和延迟
+
+  - whisper: 转写文本与参考文本（--references，缺省时为fp32的转写）之间的字错误率CER
+  - emotion: 音频三类情感的主导情感与fp32一致的比例、分布的平均绝对差
+  - qwen: 文本情感分析的主导情感、具体情感与fp32一致的比例
+每个后端单独创建ModelManager并加载一次模型，记录加载耗时和每条输入的平均推理耗时。
+
+用法:
+    python -m benchmarks.backend_benchmark temp/*.wav --models whisper emotion qwen
+    python -m benchmarks.backend_benchmark temp/*.wav --models whisper --references refs.json
+"""
+import gc
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from models.backends import BACKENDS
+from models.model_manager import ModelManager
+from models.session import TurnContext
+from utils.audio_data import AudioData
+
+TEXTS = [
+    "我的订单三天了还没发货，怎么回事？",
+    "谢谢你们的帮助，问题已经解决了",
+    "这个产品质量太差了，我要投诉",
+    "请问怎么修改收货地址？",
+    "客服态度很好，非常满意",
+    "等了一个小时都没人理我，太让人失望了",
+    "能不能帮我看看退款到哪一步了",
+    "你们的快递员把包裹弄坏了，我很生气",
+]
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def cer(hypotheses, references):
+    """字错误率，忽略空白和标点"""
+    def clean(text):
+        return [c for c in text if c.isalnum()]
+    errors = sum(edit_distance(clean(h), clean(r)) for h, r in zip(hypotheses, references))
+    total = sum(len(clean(r)) for r in references)
+    return errors / total if total else 0.0
+
+
+def timed_map(func, items):
+    outputs, seconds = [], []
+    for item in items:
+        start = time.perf_counter()
+        outputs.append(func(item))
+        seconds.append(time.perf_counter() - start)
+    return outputs, float(np.mean(seconds)) if seconds else 0.0
+
+
+def run_backend(name, backend, audios):
+    # 前缀缓存使用贪心解码，各后端的大模型输出可以直接比较
+    manager = ModelManager(backends={name: backend}, fast_text_emotion=False, cache_size=0)
+    # 加载模型并预热一次，排除首次推理的初始化开销
+    if name == "whisper":
+        manager.recognize_speech(audios[0])
+        outputs, latency = timed_map(manager.recognize_speech, audios)
+    elif name == "emotion":
+        manager.analyze_audio_emotion(audios[0])
+        outputs, latency = timed_map(manager.analyze_audio_emotion, audios)
+    else:
+        manager._chat("你好", max_new_tokens=8)
+
+        def analyze(text):
+            turn = TurnContext()
+            manager.analyze_text_with_llm(text, turn)
+            return turn.text_emotions
+        outputs, latency = timed_map(analyze, TEXTS)
+    row = {
+        "model": name,
+        "backend": backend,
+        "active_backend": manager.active_backends.get(name),
+        "load_seconds": round(manager.load_timings[name] or 0.0, 2),
+        "latency_ms": round(latency * 1000, 1),
+    }
+    del manager
+    gc.collect()
+    return row, outputs
+
+
+def compare(name, outputs, baseline, references=None):
+    """与基线比较的准确度指标"""
+    if name == "whisper":
+        return {"cer": round(cer(outputs, references or baseline), 4)}
+    if name == "emotion":
+        agree = np.mean([max(o, key=o.get) == max(b, key=b.get) for o, b in zip(outputs, baseline)])
+        diff = np.mean([abs(o[k] - b[k]) for o, b in zip(outputs, baseline) for k in b])
+        return {"dominant_agreement": round(float(agree), 3), "mean_abs_diff": round(float(diff), 2)}
+    dominant = np.mean([
+        max(o["distribution"], key=o["distribution"].get) == max(b["distribution"], key=b["distribution"].get)
+        for o, b in zip(outputs, baseline)
+    ])
+    specific = np.mean([o["specific"] == b["specific"] for o, b in zip(outputs, baseline)])
+    return {"dominant_agreement": round(float(dominant), 3), "specific_agreement": round(float(specific), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推理后端的准确度与延迟")
+    parser.add_argument("files", nargs="*", help="测试用的16位PCM WAV文件（whisper/emotion需要）")
+    parser.add_argument("--models", nargs="+", default=["whisper", "emotion", "qwen"], choices=list(BACKENDS))
+    parser.add_argument("--references", help="参考转写的JSON文件 {文件路径: 文本}，缺省时以fp32转写为参考")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    audios = [AudioData.from_file(path).resample(16000) for path in args.files]
+    references = None
+    if args.references:
+        with open(args.references, encoding="utf-8") as f:
+            mapping = json.load(f)
+        references = [mapping[path] for path in args.files]
+
+    rows = []
+    for name in args.models:
+        if name != "qwen" and not audios:
+            print(f"{name}需要测试音频，跳过")
+            continue
+        baseline = None
+        for backend in BACKENDS[name]:
+            row, outputs = run_backend(name, backend, audios)
+            if backend == "fp32":
+                baseline = outputs
+                baseline_latency = row["latency_ms"]
+            row.update(compare(name, outputs, baseline, references))
+            row["speedup"] = round(baseline_latency / row["latency_ms"], 2) if row["latency_ms"] else None
+            rows.append(row)
+            print(json.dumps(row, ensure_ascii=False))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""多轮对话基准：同一会话连续多轮生成回复，观察每轮耗时是否随对话变长而增长
+
+对比两种配置：
+  - kv: 跨轮复用KV缓存，每轮只预填充新增的消息
+  - full: 不保留KV缓存（max_kv_sessions=0），每轮重新预填充摘要和全部历史
+两种配置都启用对话记忆，历史超过token预算后压缩为摘要。
+
+用法:
+    python -m benchmarks.conversation_benchmark --turns 20 --budget 1024
+    python -m benchmarks.conversation_benchmark --standins qwen=tiny --turns 10
+"""
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from models.model_manager import ModelManager
+
+TEXTS = [
+    "你好，我上周买的耳机到现在还没发货",
+    "订单号是20240518001，能帮我查一下吗？",
+    "为什么这么久？我都等了七天了",
+    "那能不能先给我退款？",
+    "退款要多久到账？",
+    "算了，还是继续等吧，能加急吗？",
+    "好的，谢谢，另外耳机有保修吗？",
+    "保修期内坏了怎么处理？",
+]
+# 回复使用固定的情感分布，两种配置的提示词一致
+EMOTIONS = {"积极": 15.0, "消极": 55.0, "中性": 30.0}
+
+
+def run(manager, turns):
+    session = manager.sessions.get()
+    rows = []
+    for i in range(turns):
+        text = TEXTS[i % len(TEXTS)]
+        turn = session.new_turn()
+        manager.analyze_emotion(text, turn)
+        start = time.perf_counter()
+        response = manager.generate_response(text, EMOTIONS, turn)
+        elapsed = time.perf_counter() - start
+        session.record(text, response, EMOTIONS)
+        stats = session.memory.stats()
+        rows.append({"turn": i + 1, "seconds": round(elapsed, 3), **stats})
+        print(json.dumps(rows[-1], ensure_ascii=False))
+    return rows
+
+
+def summarize(rows):
+    seconds = [row["seconds"] for row in rows]
+    half = len(seconds) // 2
+    return {
+        "mean_seconds": round(float(np.mean(seconds)), 3),
+        "first_half_seconds": round(float(np.mean(seconds[:half])), 3) if half else None,
+        "second_half_seconds": round(float(np.mean(seconds[half:])), 3),
+        "compactions": rows[-1]["compactions"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多轮对话每轮耗时")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--budget", type=int, default=1024, help="每个会话历史和摘要的token预算")
+    parser.add_argument("--standins", help="使用替身模型，如 qwen=tiny（可以直接前向计算，会走KV缓存路径）")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    results = {}
+    for name, kv_sessions in (("kv", 4), ("full", 0)):
+        print(f"==== {name} ====")
+        manager = ModelManager(
+            cache_size=0, memory_token_budget=args.budget, max_kv_sessions=kv_sessions, standins=args.standins
+        )
+        rows = run(manager, args.turns)
+        results[name] = {"turns": rows, "summary": summarize(rows)}
+        print(json.dumps({name: results[name]["summary"]}, ensure_ascii=False))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
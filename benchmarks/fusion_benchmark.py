@@ -0,0 +1,149 @@
+"""多模态情感融合基准：逐轮字典循环与EmotionAnalyzer批量数组计算的耗时对比
+
+  - 映射: emotion2vec的9类分数 -> 三类情感，原来的逐条下标求和 vs 映射矩阵的一次矩阵乘法
+  - 融合: 原来的逐轮逐类字典循环 vs fuse_batch（字典接口）vs fuse（数组接口）
+  - 片段: 每条音频按片段打分后汇总（pool_segments）
+  - 权重学习: 在合成的标注数据上学习文本权重，报告学到的权重和准确率
+所有实现的结果都与原实现逐项比较，报告最大误差。数据为随机生成，不需要加载模型。
+
+用法:
+    python -m benchmarks.fusion_benchmark
+    python -m benchmarks.fusion_benchmark --batch-sizes 1,100,10000 --segments 20 --json results.json
+"""
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from models.emotion_analyzer import EmotionAnalyzer, EMOTION_LABELS
+
+
+def legacy_map(scores):
+    """ModelManager原来的逐条映射"""
+    emotions = {
+        "积极": scores[3] * 100,
+        "消极": (scores[0] + scores[1] + scores[2] + scores[6]) * 100,
+        "中性": scores[4] * 100
+    }
+    total = sum(emotions.values())
+    if total > 0:
+        for key in emotions:
+            emotions[key] = (emotions[key] / total) * 100
+    return emotions
+
+
+def legacy_fuse(text_emotions, audio_emotions, text_weight=0.6, audio_weight=0.4):
+    """ModelManager原来的逐类字典融合"""
+    combined = {}
+    for emotion in ["积极", "消极", "中性"]:
+        combined[emotion] = text_emotions[emotion] * text_weight + audio_emotions[emotion] * audio_weight
+    return combined
+
+
+def random_distributions(rng, n):
+    return rng.dirichlet(np.ones(3), n).astype(np.float32) * 100
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def max_error(dicts, array):
+    return float(np.max(np.abs(EmotionAnalyzer.to_array(dicts) - array))) if len(dicts) else 0.0
+
+
+def measure(analyzer, rng, batch_size, segments, repeat):
+    scores = rng.dirichlet(np.ones(9), batch_size).astype(np.float32)
+    score_lists = scores.tolist()
+    text = random_distributions(rng, batch_size)
+    text_dicts = analyzer.to_dicts(text)
+    audio_dicts = [legacy_map(s) for s in score_lists]
+    audio = analyzer.map_audio(scores)
+    segment_scores = rng.dirichlet(np.ones(9), (batch_size, segments)).astype(np.float32)
+    durations = rng.uniform(0.5, 3.0, (batch_size, segments)).astype(np.float32)
+
+    legacy_fused = [legacy_fuse(t, a) for t, a in zip(text_dicts, audio_dicts)]
+    row = {
+        "batch_size": batch_size,
+        "map_legacy_ms": best_time(lambda: [legacy_map(s) for s in score_lists], repeat) * 1000,
+        "map_matrix_ms": best_time(lambda: analyzer.map_audio(scores), repeat) * 1000,
+        "fuse_legacy_ms": best_time(lambda: [legacy_fuse(t, a) for t, a in zip(text_dicts, audio_dicts)], repeat) * 1000,
+        "fuse_batch_dicts_ms": best_time(lambda: analyzer.fuse_batch(text_dicts, audio_dicts), repeat) * 1000,
+        "fuse_arrays_ms": best_time(lambda: analyzer.fuse(text, audio), repeat) * 1000,
+        "segments_per_audio": segments,
+        # 全部音频的片段分数一次映射，再按时长加权汇总
+        "pool_segments_ms": best_time(lambda: analyzer.pool_segments(segment_scores, durations), repeat) * 1000,
+        "map_max_error": max_error(audio_dicts, audio),
+        "fuse_max_error": max_error(legacy_fused, analyzer.fuse(text, audio)),
+    }
+    # 逐片段用原实现映射后按时长加权平均，与批量汇总比较
+    legacy_pooled = []
+    for scores_row, durations_row in zip(segment_scores.tolist(), durations.tolist()):
+        mapped = [legacy_map(s) for s in scores_row]
+        total = {label: sum(m[label] * d for m, d in zip(mapped, durations_row)) for label in EMOTION_LABELS}
+        legacy_pooled.append({label: value * 100 / sum(total.values()) for label, value in total.items()})
+    row["pool_max_error"] = max_error(legacy_pooled, analyzer.pool_segments(segment_scores, durations))
+    for key in list(row):
+        if key.endswith("_ms"):
+            row[key] = round(row[key], 4)
+    row["fuse_speedup"] = round(row["fuse_legacy_ms"] / max(row["fuse_arrays_ms"], 1e-6), 1)
+    row["map_speedup"] = round(row["map_legacy_ms"] / max(row["map_matrix_ms"], 1e-6), 1)
+    return row
+
+
+def synthetic_labeled(rng, n, text_noise=0.75, audio_noise=0.85):
+    """合成标注数据：真实情感带噪声地体现在文本和音频分布中，文本噪声较小"""
+    labels = rng.integers(0, 3, n)
+    onehot = np.eye(3, dtype=np.float32)[labels]
+    text = (1 - text_noise) * onehot + text_noise * rng.dirichlet(np.ones(3), n)
+    audio = (1 - audio_noise) * onehot + audio_noise * rng.dirichlet(np.ones(3), n)
+    return text * 100, audio * 100, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多模态情感融合的批量计算耗时")
+    parser.add_argument("--batch-sizes", default="1,10,100,1000,10000", help="逗号分隔的轮次数")
+    parser.add_argument("--segments", type=int, default=10, help="每条音频的片段数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量重复的次数，取最小值")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    analyzer = EmotionAnalyzer(0.6)
+    rows = []
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        row = measure(analyzer, rng, batch_size, args.segments, args.repeat)
+        print(json.dumps(row, ensure_ascii=False))
+        rows.append(row)
+
+    # 权重学习：训练集学习，测试集上与固定的0.6/0.4比较
+    text, audio, labels = synthetic_labeled(rng, 4000)
+    learned = EmotionAnalyzer().fit(text[:2000], audio[:2000], labels[:2000])
+
+    def accuracy(a):
+        return round(float(np.mean(np.argmax(a.fuse(text[2000:], audio[2000:]), axis=1) == labels[2000:])), 4)
+
+    fit_report = {
+        "labels": list(EMOTION_LABELS),
+        "learned_text_weight": round(learned.text_weight, 2),
+        "fixed_accuracy": accuracy(analyzer),
+        "learned_accuracy": accuracy(learned),
+        "fit_ms": round(best_time(lambda: EmotionAnalyzer().fit(text[:2000], audio[:2000], labels[:2000]), 3) * 1000, 3),
+    }
+    print(json.dumps({"fit": fit_report}, ensure_ascii=False))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"batch": rows, "fit": fit_report}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
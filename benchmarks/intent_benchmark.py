@@ -0,0 +1,105 @@
+"""意图分类基准：训练耗时、留出集准确率，以及单条延迟和不同批大小下的吞吐量
+
+训练数据与ModelManager相同：意图标注文件加上知识库问答的各个问法。
+准确率按k折交叉验证计算（只在标注文件的样本上评估，知识库问法始终用于训练）。
+
+用法:
+    python -m benchmarks.intent_benchmark
+    python -m benchmarks.intent_benchmark --batch-sizes 1,32,256,1024 --json results.json
+"""
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from models.intent_classifier import IntentClassifier
+from utils import config
+
+
+def load_training_data(intent_path, faq_path):
+    texts, labels = IntentClassifier.load_examples(intent_path)
+    extra_texts, extra_labels = [], []
+    if faq_path:
+        with open(faq_path, encoding="utf-8") as f:
+            for entry in json.load(f):
+                if entry.get("intent"):
+                    extra_texts.extend(entry["questions"])
+                    extra_labels.extend([entry["intent"]] * len(entry["questions"]))
+    return texts, labels, extra_texts, extra_labels
+
+
+def cross_validate(texts, labels, extra_texts, extra_labels, folds, seed=0):
+    order = np.random.default_rng(seed).permutation(len(texts))
+    correct = 0
+    for fold in range(folds):
+        test = set(order[fold::folds].tolist())
+        train = [i for i in range(len(texts)) if i not in test]
+        classifier = IntentClassifier().fit(
+            [texts[i] for i in train] + extra_texts, [labels[i] for i in train] + extra_labels
+        )
+        test = sorted(test)
+        predictions = classifier.predict_batch([texts[i] for i in test])
+        correct += sum(p["intent"] == labels[i] for p, i in zip(predictions, test))
+    return correct / len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="意图分类的准确率、延迟和批量吞吐量")
+    parser.add_argument("--intents", default=config.INTENT_DATA_PATH, help="意图标注文件")
+    parser.add_argument("--faq", default=config.KNOWLEDGE_BASE_PATH, help="知识库问答文件，为空时不加入训练")
+    parser.add_argument("--folds", type=int, default=5, help="交叉验证折数")
+    parser.add_argument("--batch-sizes", default="1,8,32,128,512", help="逗号分隔的批大小")
+    parser.add_argument("--rounds", type=int, default=20, help="每个批大小重复的次数")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    texts, labels, extra_texts, extra_labels = load_training_data(args.intents, args.faq)
+    start = time.perf_counter()
+    classifier = IntentClassifier().fit(texts + extra_texts, labels + extra_labels)
+    train_seconds = time.perf_counter() - start
+
+    report = {
+        "examples": len(texts) + len(extra_texts),
+        "intents": len(classifier.labels),
+        "train_seconds": round(train_seconds, 3),
+        "cv_accuracy": round(cross_validate(texts, labels, extra_texts, extra_labels, args.folds), 4),
+    }
+
+    # 单条预测延迟
+    times = []
+    for _ in range(args.rounds):
+        for text in texts:
+            start = time.perf_counter()
+            classifier.predict(text)
+            times.append(time.perf_counter() - start)
+    p50, p95 = np.percentile(np.array(times) * 1000, [50, 95])
+    report["single_p50_ms"] = round(float(p50), 4)
+    report["single_p95_ms"] = round(float(p95), 4)
+
+    # 批量吞吐量：从样本中循环取出批
+    throughput = []
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        batch = [texts[i % len(texts)] for i in range(batch_size)]
+        classifier.predict_batch(batch)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            classifier.predict_batch(batch)
+        elapsed = time.perf_counter() - start
+        throughput.append({
+            "batch_size": batch_size,
+            "ms_per_batch": round(elapsed / args.rounds * 1000, 3),
+            "texts_per_second": round(batch_size * args.rounds / elapsed, 1),
+        })
+    report["batch"] = throughput
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
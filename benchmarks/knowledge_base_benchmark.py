@@ -0,0 +1,161 @@
+"""知识库检索基准：索引构建耗时、查询延迟和命中率
+
+  - 命中率: 用FAQ问答的改写问法和无关问题评估
+    top1准确率、直接回复比例及其准确率、无关问题被误答的比例、参考资料的覆盖率
+  - 延迟: 在FAQ知识库和合成的大规模知识库（--scale个问法）上，
+    分别测量暴力检索和IVF近似检索的索引构建耗时、查询p50/p95，以及IVF相对暴力检索的top1召回率
+
+用法:
+    python -m benchmarks.knowledge_base_benchmark
+    python -m benchmarks.knowledge_base_benchmark --faq data/faq.json --scale 50000 --json results.json
+"""
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from models.knowledge_base import KnowledgeBase
+from utils import config
+
+# (客户问题, 期望命中的问答ID)，None表示知识库中没有答案
+EVAL_QUERIES = [
+    ("请问怎么修改收货地址？", "change_address"),
+    ("地址写错了能改吗", "change_address"),
+    ("能不能帮我看看退款到哪一步了", "refund_progress"),
+    ("退的钱什么时候能到账", "refund_progress"),
+    ("我的订单三天了还没发货，怎么回事？", "not_shipped"),
+    ("怎么还不给我发货", "not_shipped"),
+    ("快递好几天都没动静了", "logistics_stuck"),
+    ("发票怎么开", "invoice"),
+    ("可以开专票吗", "invoice"),
+    ("优惠券不能用", "coupon"),
+    ("密码忘了", "account_login"),
+    ("我要转人工", "human_agent"),
+    ("给我找个真人客服", "human_agent"),
+    ("收到的杯子是碎的", "damaged_goods"),
+    ("这个产品质量太差了，我要投诉", "complaint"),
+    ("衣服小了想换大一号", "exchange"),
+    ("不想要了怎么退货", "return_goods"),
+    ("退货邮费谁承担", "return_shipping_fee"),
+    ("刚买完就降价了", "price_protection"),
+    ("能用花呗付款吗", "payment_methods"),
+    ("钱扣了订单还是未付款", "payment_failed"),
+    ("会员有哪些好处", "membership"),
+    ("手机号换了怎么改绑定", "change_phone"),
+    ("多久能收到货", "delivery_time"),
+    ("能发顺丰吗", "courier_company"),
+    ("坏了怎么保修", "warranty"),
+    ("什么时候有货", "stock"),
+    ("你们客服几点下班", "business_hours"),
+    ("怎么注销我的账号", "privacy"),
+    ("订单能取消吗", "cancel_order"),
+    ("今天天气怎么样", None),
+    ("谢谢你们的帮助，问题已经解决了", None),
+    ("客服态度很好，非常满意", None),
+    ("你叫什么名字", None),
+    ("推荐一部好看的电影", None),
+    ("我想咨询一下你们公司的招聘", None),
+]
+
+
+def evaluate(kb, queries, k=config.KB_TOP_K):
+    """按ModelManager的阈值统计命中情况"""
+    top1 = answered = answered_correct = false_answers = covered = known = unknown = 0
+    for query, expected in queries:
+        hits = [hit for hit in kb.search(query, k) if hit["score"] >= config.KB_CONTEXT_THRESHOLD]
+        direct = bool(hits) and hits[0]["score"] >= config.KB_ANSWER_THRESHOLD
+        if expected is None:
+            unknown += 1
+            false_answers += direct
+            continue
+        known += 1
+        top1 += bool(hits) and hits[0]["id"] == expected
+        covered += any(hit["id"] == expected for hit in hits)
+        answered += direct
+        answered_correct += direct and hits[0]["id"] == expected
+    return {
+        "queries": len(queries),
+        "top1_accuracy": round(top1 / known, 4) if known else None,
+        "context_recall": round(covered / known, 4) if known else None,
+        "answer_rate": round(answered / known, 4) if known else None,
+        "answer_precision": round(answered_correct / answered, 4) if answered else None,
+        "false_answer_rate": round(false_answers / unknown, 4) if unknown else None,
+    }
+
+
+def synthetic_entries(entries, count, seed=0):
+    """合成大规模知识库：从已有问法中取片段拼接出新的问法"""
+    rng = np.random.default_rng(seed)
+    fragments = [q for entry in entries for q in entry["questions"]]
+    chars = sorted(set("".join(fragments)))
+    synthetic = []
+    for i in range(count):
+        a, b = rng.choice(len(fragments), 2)
+        noise = "".join(rng.choice(chars, rng.integers(1, 4)))
+        question = fragments[a][:len(fragments[a]) // 2 + 1] + noise + fragments[b][len(fragments[b]) // 2:]
+        synthetic.append({"id": f"synthetic-{i}", "questions": [question], "answer": question})
+    return synthetic
+
+
+def latency(kb, queries, repeat):
+    times = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            kb.search(query)
+            times.append(time.perf_counter() - start)
+    p50, p95 = np.percentile(np.array(times) * 1000, [50, 95])
+    return round(float(p50), 3), round(float(p95), 3)
+
+
+def measure(entries, queries, repeat, ann_min_docs):
+    start = time.perf_counter()
+    kb = KnowledgeBase(entries, ann_min_docs=ann_min_docs)
+    build = time.perf_counter() - start
+    p50, p95 = latency(kb, queries, repeat)
+    return kb, {
+        "index": kb.stats()["index"],
+        "questions": len(kb.questions),
+        "build_seconds": round(build, 3),
+        "query_p50_ms": p50,
+        "query_p95_ms": p95,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库索引构建耗时、查询延迟和命中率")
+    parser.add_argument("--faq", default=config.KNOWLEDGE_BASE_PATH, help="FAQ问答文件")
+    parser.add_argument("--scale", type=int, default=10000, help="合成知识库的问法数，0表示不测")
+    parser.add_argument("--repeat", type=int, default=20, help="每条查询重复测量的次数")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    with open(args.faq, encoding="utf-8") as f:
+        entries = json.load(f)
+    queries = [query for query, _ in EVAL_QUERIES]
+
+    kb, faq_row = measure(entries, queries, args.repeat, ann_min_docs=10 ** 9)
+    report = {"faq": {**faq_row, **evaluate(kb, EVAL_QUERIES)}}
+    print(json.dumps({"faq": report["faq"]}, ensure_ascii=False))
+
+    if args.scale:
+        large = entries + synthetic_entries(entries, args.scale)
+        brute, brute_row = measure(large, queries, max(1, args.repeat // 4), ann_min_docs=10 ** 9)
+        ivf, ivf_row = measure(large, queries, max(1, args.repeat // 4), ann_min_docs=0)
+        agree = sum(brute.search(q, 1)[0]["id"] == ivf.search(q, 1)[0]["id"] for q in queries)
+        ivf_row["top1_recall_vs_brute_force"] = round(agree / len(queries), 4)
+        ivf_row.update(evaluate(ivf, EVAL_QUERIES))
+        brute_row.update(evaluate(brute, EVAL_QUERIES))
+        report["scaled"] = {"brute_force": brute_row, "ivf": ivf_row}
+        print(json.dumps({"scaled": report["scaled"]}, ensure_ascii=False))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""大模型微批调度基准：多个并发客户端生成回复，对比逐条生成与微批合并生成
+
+每个客户端线程循环调用generate_response（关闭缓存），统计吞吐、延迟和调度器的批大小分布。
+--simulate 使用模拟耗时的假模型（固定开销 + 每条增量开销），不加载Qwen。
+
+用法:
+    python -m benchmarks.llm_batching_benchmark --clients 8 --requests 4 --max-batch 8
+    python -m benchmarks.llm_batching_benchmark --simulate --clients 16 --requests 10
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models.model_manager import ModelManager
+
+TEXTS = [
+    "我的订单三天了还没发货，怎么回事？",
+    "谢谢你们的帮助，问题已经解决了",
+    "退款什么时候能到账？",
+    "这个产品质量太差了，我要投诉",
+    "请问怎么修改收货地址？",
+    "客服态度很好，非常满意",
+]
+EMOTIONS = {"积极": 20.0, "消极": 50.0, "中性": 30.0}
+
+
+class SimulatedQwen:
+    """模拟生成耗时：一次生成的耗时 = fixed_ms + per_item_ms * 批大小
+
+    同一时刻只能进行一次生成，与真实模型占满计算资源时的情况一致。
+    """
+
+    def __init__(self, fixed_ms, per_item_ms):
+        self.fixed = fixed_ms / 1000.0
+        self.per_item = per_item_ms / 1000.0
+        self._lock = threading.Lock()
+
+    def chat(self, tokenizer, prompt, history=None):
+        with self._lock:
+            time.sleep(self.fixed + self.per_item)
+        return "模拟回复", None
+
+    def run_batch(self, prompts, max_new_tokens):
+        with self._lock:
+            time.sleep(self.fixed + self.per_item * len(prompts))
+        return ["模拟回复"] * len(prompts)
+
+
+def run(manager, clients, requests):
+    latencies = []
+
+    def client(index):
+        local = []
+        for i in range(requests):
+            text = f"{TEXTS[(index + i) % len(TEXTS)]}（客户{index}）"
+            start = time.perf_counter()
+            manager.generate_response(text, EMOTIONS)
+            local.append(time.perf_counter() - start)
+        return local
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for local in executor.map(client, range(clients)):
+            latencies.extend(local)
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "latency_p50_s": round(float(np.percentile(latencies, 50)), 3),
+        "latency_p95_s": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def build_manager(args, batching):
+    loaders = None
+    simulated = None
+    if args.simulate:
+        simulated = SimulatedQwen(args.fixed_ms, args.per_item_ms)
+        loaders = {"qwen": lambda: (simulated, None)}
+    manager = ModelManager(
+        loaders=loaders,
+        cache_size=0,
+        llm_batching=batching,
+        llm_max_batch=args.max_batch,
+        llm_max_wait_ms=args.max_wait_ms,
+    )
+    if simulated is not None and manager.llm_scheduler is not None:
+        manager.llm_scheduler.run_batch = simulated.run_batch
+    return manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大模型微批调度基准")
+    parser.add_argument("--clients", type=int, default=8, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=4, help="每个客户端的请求数")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--simulate", action="store_true", help="使用模拟耗时的假模型")
+    parser.add_argument("--fixed-ms", type=float, default=200, help="模拟模式下每次生成的固定耗时")
+    parser.add_argument("--per-item-ms", type=float, default=20, help="模拟模式下批中每条请求的增量耗时")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    results = {}
+    for batching in (False, True):
+        manager = build_manager(args, batching)
+        # 预先生成一次，排除模型加载和首次推理的开销
+        manager.generate_response("你好", EMOTIONS)
+        row = run(manager, args.clients, args.requests)
+        if manager.llm_scheduler is not None:
+            row["scheduler"] = manager.llm_scheduler.stats()
+            manager.llm_scheduler.close()
+        results["batched" if batching else "sequential"] = row
+        print(json.dumps({"batching": batching, **row}, ensure_ascii=False))
+
+    speedup = results["batched"]["requests_per_second"] / results["sequential"]["requests_per_second"]
+    results["speedup"] = round(speedup, 2)
+    print(f"吞吐提升: {speedup:.2f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""端到端流水线基准：不启动界面，按WorkerThread.run的流程驱动一轮轮客户对话
+
+  - 文本轮: 文本情感分析（词典优先，必要时大模型）+ 生成回复
+  - 语音轮: 语音识别与音频情感分析（默认并发）+ 生成回复
+统计每个阶段（asr、audio_emotion、text_emotion、generation、t2s、total）的
+p50/p95/p99延迟，以及吞吐量（轮/秒）和进程峰值内存，结果可写成JSON用于比较不同提交。
+t2s是识别结果和回复的繁简转换耗时，已包含在asr和generation之内。
+
+不提供WAV文件时用合成音频作为语音语料；配合替身模型可以在无模型的离线环境中运行。
+
+用法:
+    python -m benchmarks.pipeline_benchmark --standins all --turns 200 --json results.json
+    python -m benchmarks.pipeline_benchmark temp/*.wav --turns 50 --stream --json results.json
+    python -m benchmarks.pipeline_benchmark --standins all --baseline old.json   # 与之前的结果比较
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models.model_manager import ModelManager
+from utils.audio_data import AudioData
+
+STAGES = ["asr", "audio_emotion", "text_emotion", "generation", "t2s", "total"]
+
+TEXTS = [
+    "我的订单三天了还没发货，怎么回事？",
+    "谢谢你们的帮助，问题已经解决了",
+    "这个产品质量太差了，我要投诉",
+    "请问怎么修改收货地址？",
+    "客服态度很好，非常满意",
+    "等了一个小时都没人理我，太让人失望了",
+    "能不能帮我看看退款到哪一步了",
+    "你们的快递员把包裹弄坏了，我很生气",
+]
+
+
+def synthetic_corpus(count=4, sample_rate=16000, seed=0):
+    """合成的语音语料：静音中间夹着几段不同响度和音高的调幅音"""
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(count):
+        parts = [rng.normal(0.0, 0.001, sample_rate // 2)]
+        for _ in range(2 + i % 3):
+            t = np.arange(int(sample_rate * rng.uniform(0.8, 2.0))) / sample_rate
+            envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+            tone = rng.uniform(0.05, 0.4) * envelope * np.sin(2 * np.pi * rng.uniform(120, 300) * t)
+            parts += [tone, rng.normal(0.0, 0.001, sample_rate // 3)]
+        corpus.append(AudioData(np.concatenate(parts).astype(np.float32), sample_rate, source=f"synthetic-{i}"))
+    return corpus
+
+
+def run_turn(manager, session, text=None, audio=None, stream=False, parallel=True):
+    """与WorkerThread.run相同的一轮处理，返回各阶段耗时（秒）"""
+    start = time.perf_counter()
+    turn = session.new_turn()
+    response = None
+    if audio is not None:
+        text, emotions, _ = manager.process_audio(audio, parallel=parallel, turn=turn)
+    elif manager.single_pass_text:
+        generation_start = time.perf_counter()
+        emotions, response = manager.analyze_and_respond(text, turn)
+        turn.timings["generation"] = time.perf_counter() - generation_start
+    else:
+        emotion_start = time.perf_counter()
+        emotions = manager.analyze_emotion(text, turn)
+        turn.timings["text_emotion"] = time.perf_counter() - emotion_start
+
+    if response is None:
+        generation_start = time.perf_counter()
+        if stream:
+            response = "".join(manager.generate_response_stream(text, emotions, turn))
+        else:
+            response = manager.generate_response(text, emotions, turn)
+        turn.timings["generation"] = time.perf_counter() - generation_start
+    session.record(text, response, emotions)
+    timings = {stage: turn.timings[stage] for stage in STAGES if stage in turn.timings}
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def build_jobs(turns, voice_ratio, corpus, texts):
+    """按比例交错排列文本轮和语音轮"""
+    jobs = []
+    voice_turns = 0
+    for i in range(turns):
+        if corpus and voice_turns < round((i + 1) * voice_ratio):
+            jobs.append({"audio": corpus[voice_turns % len(corpus)]})
+            voice_turns += 1
+        else:
+            jobs.append({"text": texts[(i - voice_turns) % len(texts)]})
+    return jobs
+
+
+def summarize(samples):
+    """每个阶段的样本数和延迟分位数（毫秒）"""
+    summary = {}
+    for stage in STAGES:
+        values = np.array([s[stage] for s in samples if stage in s]) * 1000
+        if len(values) == 0:
+            continue
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary[stage] = {
+            "count": int(len(values)),
+            "mean_ms": round(float(values.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(values.max()), 3),
+        }
+    return summary
+
+
+def peak_rss_mb():
+    """进程的峰值常驻内存（MB），无法获取时返回None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux以KB为单位，macOS以字节为单位
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline):
+    """打印各阶段p50/p95相对基线的变化"""
+    print(f"==== 与基线 {baseline.get('revision')} 比较 ====")
+    for stage, row in result["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old:
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms"):
+            delta = (row[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            changes.append(f"{key} {old[key]:.2f} -> {row[key]:.2f} ({delta:+.1f}%)")
+        print(f"{stage}: " + ", ".join(changes))
+    old_tps = baseline.get("throughput_tps")
+    if old_tps:
+        print(f"throughput: {old_tps} -> {result['throughput_tps']} 轮/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端流水线各阶段延迟、吞吐量和峰值内存")
+    parser.add_argument("files", nargs="*", help="语音轮使用的16位PCM WAV文件，缺省时使用合成音频")
+    parser.add_argument("--turns", type=int, default=100, help="测量的总轮数")
+    parser.add_argument("--warmup", type=int, default=4, help="不计入统计的预热轮数")
+    parser.add_argument("--voice-ratio", type=float, default=0.5, help="语音轮所占比例")
+    parser.add_argument("--texts", help="文本轮语料，每行一条客户文本")
+    parser.add_argument("--concurrency", type=int, default=1, help="同时进行的会话数，每个会话串行处理自己的轮次")
+    parser.add_argument("--stream", action="store_true", help="流式生成回复")
+    parser.add_argument("--serial", action="store_true", help="语音识别与音频情感分析串行执行")
+    parser.add_argument("--single-pass", action="store_true", help="文本轮一次生成同时得到情感和回复")
+    parser.add_argument("--standins", help="使用替身模型，如 all 或 whisper,emotion,qwen=tiny")
+    parser.add_argument("--cache-size", type=int, default=0, help="情感和回复缓存大小，默认不缓存以测量模型本身")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    parser.add_argument("--baseline", help="之前的JSON结果，打印各阶段的变化")
+    args = parser.parse_args()
+
+    texts = TEXTS
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    corpus = [AudioData.from_file(path).resample(16000) for path in args.files] or synthetic_corpus()
+
+    manager = ModelManager(
+        standins=args.standins,
+        single_pass_text=args.single_pass,
+        cache_size=args.cache_size,
+    )
+    jobs = build_jobs(args.warmup + args.turns, args.voice_ratio, corpus, texts)
+    options = {"stream": args.stream, "parallel": not args.serial}
+
+    # 预热：首次使用时加载模型，不计入统计
+    warmup_session = manager.sessions.get()
+    for job in jobs[:args.warmup]:
+        run_turn(manager, warmup_session, **job, **options)
+    manager.sessions.close(warmup_session.session_id)
+    jobs = jobs[args.warmup:]
+
+    samples = []
+    lock = threading.Lock()
+
+    def worker(index):
+        session = manager.sessions.get()
+        local = [run_turn(manager, session, **job, **options) for job in jobs[index::args.concurrency]]
+        with lock:
+            samples.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "config": {
+            "turns": args.turns,
+            "voice_turns": sum(1 for job in jobs if "audio" in job),
+            "concurrency": args.concurrency,
+            "stream": args.stream,
+            "parallel": not args.serial,
+            "single_pass": args.single_pass,
+            "cache_size": args.cache_size,
+            "standins": manager.standins,
+            "backends": manager.active_backends,
+        },
+        "load_seconds": {name: round(t, 3) for name, t in manager.load_timings.items() if t is not None},
+        "stages": summarize(samples),
+        "throughput_tps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "elapsed_seconds": round(elapsed, 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(result, json.load(f))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
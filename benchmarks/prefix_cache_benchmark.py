@@ -0,0 +1,110 @@
+"""提示词前缀KV缓存基准：对比整段预填充与复用前缀缓存后只预填充后缀的耗时
+
+对每个提示词模板和每条测试文本，分别测量
+  - full: 不使用缓存，对完整提示词做一次前向计算
+  - cached: 复用加载时预填充的前缀KV缓存，只对后缀做一次前向计算
+输出每个模板的前缀/后缀token数和平均预填充耗时。
+
+用法:
+    python -m benchmarks.prefix_cache_benchmark --repeat 5
+"""
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import torch
+
+from models.model_manager import (
+    ModelManager, EMOTION_PROMPT_PREFIX, RESPONSE_PROMPT_PREFIX, SINGLE_PASS_PROMPT_PREFIX
+)
+
+TEXTS = [
+    "我的订单三天了还没发货，怎么回事？",
+    "谢谢你们的帮助，问题已经解决了",
+    "这个产品质量太差了，我要投诉，你们必须给我一个说法",
+    "请问怎么修改收货地址？",
+]
+EMOTIONS = {"积极": 10.0, "消极": 70.0, "中性": 20.0}
+
+
+def build_prompts(manager, text):
+    return {
+        "emotion": manager._build_emotion_prompt(text),
+        "response": manager._build_response_prompt(text, EMOTIONS),
+        "single_pass": SINGLE_PASS_PROMPT_PREFIX + f'客户说: "{text}"',
+    }
+
+
+def time_forward(model, ids, device, past=None, past_length=0):
+    start = time.perf_counter()
+    with torch.no_grad():
+        model(
+            input_ids=torch.tensor([ids], dtype=torch.long, device=device),
+            past_key_values=past,
+            attention_mask=torch.ones((1, past_length + len(ids)), dtype=torch.long, device=device),
+            use_cache=True
+        )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示词前缀KV缓存的预填充耗时")
+    parser.add_argument("--repeat", type=int, default=5, help="每条提示词重复测量的次数")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    manager = ModelManager(prefix_cache=True)
+    model, tokenizer = manager.qwen_model, manager.qwen_tokenizer
+    cache = manager.prefix_cache
+    if cache is None:
+        print("前缀缓存不可用")
+        return 1
+    device = cache.device
+
+    prefixes = {
+        "emotion": EMOTION_PROMPT_PREFIX,
+        "response": RESPONSE_PROMPT_PREFIX,
+        "single_pass": SINGLE_PASS_PROMPT_PREFIX,
+    }
+    # 预热一次前向计算
+    time_forward(model, tokenizer.encode("你好"), device)
+
+    rows = []
+    for name, prefix in prefixes.items():
+        full_times, cached_times, suffix_lengths = [], [], []
+        entry = cache.match(prefix)
+        for text in TEXTS:
+            prompt = build_prompts(manager, text)[name]
+            chat_prefix, chat_suffix = cache._split(prompt, prefix)
+            full_ids = tokenizer.encode(chat_prefix + chat_suffix)
+            suffix_ids = tokenizer.encode(chat_suffix)
+            suffix_lengths.append(len(suffix_ids))
+            for _ in range(args.repeat):
+                full_times.append(time_forward(model, full_ids, device))
+                cached_times.append(time_forward(
+                    model, suffix_ids, device, cache.decoder.fresh_past(entry["past"]), entry["length"]
+                ))
+        full_ms = float(np.mean(full_times)) * 1000
+        cached_ms = float(np.mean(cached_times)) * 1000
+        row = {
+            "template": name,
+            "prefix_tokens": entry["length"],
+            "avg_suffix_tokens": round(float(np.mean(suffix_lengths)), 1),
+            "full_prefill_ms": round(full_ms, 2),
+            "cached_prefill_ms": round(cached_ms, 2),
+            "saved_ms": round(full_ms - cached_ms, 2),
+            "saved_ratio": round(1.0 - cached_ms / full_ms, 3) if full_ms else 0.0,
+        }
+        rows.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""长录音音频情感分析基准：整段一次前向 vs 重叠窗口分批
+
+对不同时长的合成录音（或给定的WAV文件）分别测量：
+  - utterance: emotion2vec对整段音频做一次前向（原来的做法）
+  - windowed: analyze_audio_emotion_timeline，按窗口分批前向并生成时间线
+报告耗时、窗口数和峰值内存。峰值内存在GPU上为torch的显存峰值，
+在CPU上为tracemalloc统计的Python/NumPy分配峰值（不含torch CPU张量）。
+
+用法:
+    python -m benchmarks.ser_timeline_benchmark --standins all
+    python -m benchmarks.ser_timeline_benchmark --minutes 1,5,10,30 --skip-utterance --json results.json
+    python -m benchmarks.ser_timeline_benchmark call.wav
+"""
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from models.model_manager import ModelManager
+from utils.audio_data import AudioData
+
+
+def synthetic_call(seconds, seed=0):
+    """交替的3秒"语音"（响度不同的噪声）和1秒静音"""
+    rng = np.random.default_rng(seed)
+    parts, total = [], 0
+    while total < seconds * 16000:
+        amplitude = rng.choice([0.03, 0.1, 0.3])
+        parts.append((rng.standard_normal(3 * 16000) * amplitude).astype(np.float32))
+        parts.append(np.zeros(16000, dtype=np.float32))
+        total += 4 * 16000
+    return AudioData(np.concatenate(parts)[:seconds * 16000], 16000, source=f"synthetic-{seconds}s")
+
+
+def measure(func):
+    """返回(结果, 耗时秒数, 峰值内存MB)"""
+    try:
+        import torch
+        cuda = torch.cuda.is_available()
+    except ImportError:
+        cuda = False
+    if cuda:
+        torch.cuda.reset_peak_memory_stats()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if cuda:
+        peak = torch.cuda.max_memory_allocated()
+    return result, elapsed, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长录音整段与分窗口音频情感分析的耗时和内存")
+    parser.add_argument("files", nargs="*", help="WAV文件，缺省时使用合成录音")
+    parser.add_argument("--minutes", default="1,5,10", help="合成录音的时长（分钟），逗号分隔")
+    parser.add_argument("--window", type=float, help="窗口长度（秒），缺省取配置")
+    parser.add_argument("--hop", type=float, help="窗口步长（秒），缺省取配置")
+    parser.add_argument("--batch-size", type=int, default=8, help="每批窗口数")
+    parser.add_argument("--skip-utterance", action="store_true", help="不测整段前向（长录音可能内存不足）")
+    parser.add_argument("--standins", help="使用替身模型，如 all 或 emotion")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    manager = ModelManager(standins=args.standins)
+    manager.warmup(["emotion"])
+    manager.wait("emotion")
+    if args.files:
+        audios = [manager.decode_audio(path) for path in args.files]
+    else:
+        audios = [synthetic_call(int(float(m) * 60)) for m in args.minutes.split(",")]
+
+    rows = []
+    for audio in audios:
+        row = {"audio": audio.source, "seconds": round(audio.duration, 1)}
+        if not args.skip_utterance:
+            _, elapsed, peak = measure(lambda: manager.emotion_model.generate(
+                audio.samples, fs=16000, granularity="utterance", extract_embedding=False
+            ))
+            row.update({"utterance_seconds": round(elapsed, 3), "utterance_peak_mb": round(peak, 1)})
+        timeline, elapsed, peak = measure(lambda: manager.analyze_audio_emotion_timeline(
+            audio, window_seconds=args.window, hop_seconds=args.hop, batch_size=args.batch_size
+        ))
+        row.update({
+            "windows": len(timeline["windows"]),
+            "windowed_seconds": round(elapsed, 3),
+            "windowed_peak_mb": round(peak, 1),
+            "emotions": {k: round(v, 2) for k, v in timeline["emotions"].items()},
+        })
+        print(json.dumps(row, ensure_ascii=False))
+        rows.append(row)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
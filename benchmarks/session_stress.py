@@ -0,0 +1,150 @@
+"""多会话并发压力测试：多个会话在不同线程中同时使用同一个ModelManager
+
+使用假模型（不加载真实模型）：每个会话有固定的具体情感，假Qwen把回复提示词中的
+具体情感和客户文本原样写进回复，据此检查每轮回复是否只用到了本会话的情感上下文。
+文本会话走"情感分析 + 生成回复"两次调用，语音会话走"识别+音频情感 + 生成回复"。
+
+用法:
+    python -m benchmarks.session_stress --sessions 32 --turns 20 --threads 16
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models.model_manager import ModelManager, EMOTION_PROMPT_PREFIX, SUMMARY_PROMPT_PREFIX
+from utils.audio_data import AudioData
+
+# 文本会话使用的具体情感
+TEXT_EMOTIONS = ["愤怒", "感激", "失望", "担忧", "高兴", "惊讶"]
+# 语音会话：音频首个样本为正时假emotion2vec输出生气，否则输出悲伤
+ANGRY_SCORES = [0.7, 0.05, 0.05, 0.02, 0.1, 0.0, 0.08, 0.0, 0.0]
+SAD_SCORES = [0.08, 0.05, 0.05, 0.02, 0.1, 0.0, 0.7, 0.0, 0.0]
+
+
+class FakeQwen:
+    """按提示词类型返回情感JSON、对话摘要或回复，回复中带上提示词里的具体情感和客户文本"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def chat(self, tokenizer, prompt, history=None, **kwargs):
+        time.sleep(random.uniform(0, self.delay))
+        if prompt.startswith(EMOTION_PROMPT_PREFIX):
+            text = re.search(r'文本: "(.*?)"', prompt).group(1)
+            specific = re.search(r"#(\S+?)#", text).group(1)
+            result = {"情感分布": {"积极": 20, "消极": 60, "中性": 20}, "具体情感": specific}
+            return json.dumps(result, ensure_ascii=False), None
+        if prompt.startswith(SUMMARY_PROMPT_PREFIX):
+            # 摘要只保留客户原话，便于核对压缩后的上下文仍属于本会话
+            return "；".join(re.findall(r"客户: (.*)", prompt))[:100], None
+        text = re.search(r'客户说: "(.*?)"', prompt).group(1)
+        specific = re.search(r"注意客户表现出的(\S+?)情感", prompt).group(1)
+        return f"{specific}|{text}", None
+
+
+class FakeWhisper:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def transcribe(self, audio, **kwargs):
+        time.sleep(random.uniform(0, self.delay))
+        # 音频长度编码了会话编号
+        return {"text": f"语音会话{len(audio) - 16000}"}
+
+
+class FakeEmotion2vec:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def generate(self, audio, **kwargs):
+        time.sleep(random.uniform(0, self.delay))
+        return [{"scores": ANGRY_SCORES if audio[0] > 0 else SAD_SCORES}]
+
+
+def run_session(manager, index, turns, voice, latencies):
+    """运行一个会话的全部轮次，返回串话（回复与本会话上下文不符）的次数"""
+    session = manager.sessions.get(f"stress-{index}")
+    errors = 0
+    for t in range(turns):
+        start = time.perf_counter()
+        turn = session.new_turn()
+        if voice:
+            samples = np.full(16000 + index, 0.1 if index % 4 == 1 else -0.1, dtype=np.float32)
+            text, emotions, _ = manager.process_audio(AudioData(samples, 16000), turn=turn)
+            expected = ("愤怒" if index % 4 == 1 else "悲伤", f"语音会话{index}")
+        else:
+            specific = TEXT_EMOTIONS[index % len(TEXT_EMOTIONS)]
+            text = f"会话{index}第{t}轮 #{specific}#"
+            emotions = manager.analyze_emotion(text, turn)
+            expected = (specific, text)
+        response = manager.generate_response(text, emotions, turn)
+        session.record(text, response, emotions)
+        latencies.append(time.perf_counter() - start)
+        if tuple(response.split("|", 1)) != expected:
+            errors += 1
+            print(f"串话: 会话{index} 期望 {expected}，得到 {response}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多会话并发压力测试")
+    parser.add_argument("--sessions", type=int, default=32, help="并发会话数，奇数编号为语音会话")
+    parser.add_argument("--turns", type=int, default=20, help="每个会话的轮数")
+    parser.add_argument("--threads", type=int, default=16, help="工作线程数")
+    parser.add_argument("--delay", type=float, default=0.005, help="假模型每次调用的最大随机延迟（秒）")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    manager = ModelManager(
+        loaders={
+            "whisper": lambda: FakeWhisper(args.delay),
+            "emotion": lambda: FakeEmotion2vec(args.delay),
+            "qwen": lambda: (FakeQwen(args.delay), None),
+        },
+        fast_text_emotion=False,
+        cache_size=0,
+    )
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index):
+        local = []
+        errors = run_session(manager, index, args.turns, index % 2 == 1, local)
+        with lock:
+            latencies.extend(local)
+        return errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        errors = sum(executor.map(worker, range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    total = args.sessions * args.turns
+    result = {
+        "sessions": args.sessions,
+        "turns": total,
+        "threads": args.threads,
+        "cross_talk": errors,
+        "seconds": round(elapsed, 3),
+        "turns_per_second": round(total / elapsed, 1),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+        "recorded_turns": sum(len(manager.sessions.get(f"stress-{i}").history) for i in range(args.sessions)),
+    }
+    print(json.dumps(result, ensure_ascii=False))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
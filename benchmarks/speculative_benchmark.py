@@ -0,0 +1,135 @@
+"""推测解码基准：对比Qwen逐个token生成与带草稿的推测解码的生成速度
+
+对每个提示词模板和每条测试文本，分别用以下方式生成回复（均不使用前缀缓存）
+  - chat: 模型自带的chat方法
+  - greedy: 增量解码器逐个token贪心解码
+  - ngram: 增量解码器 + n-gram草稿（从上下文和之前的回复中查找）
+  - draft: 增量解码器 + 小模型草稿（--draft指定，self表示用Qwen自身作草稿，只用于检验正确性）
+输出每种方式的tokens/秒、草稿接受率，以及推测解码的输出是否与greedy逐token一致。
+
+用法:
+    python -m benchmarks.speculative_benchmark --rounds 3
+    python -m benchmarks.speculative_benchmark --draft Qwen/Qwen1.5-0.5B-Chat
+    python -m benchmarks.speculative_benchmark --standins qwen=tiny --draft self
+"""
+import sys
+import json
+import time
+import argparse
+
+from models.model_manager import ModelManager, SINGLE_PASS_PROMPT_PREFIX
+from models.prefix_cache import KVDecoder
+from models.qwen_utils import build_chat_prompt
+from models.speculative import NgramDraft, ModelDraft, build_draft
+
+TEXTS = [
+    "我的订单三天了还没发货，怎么回事？",
+    "谢谢你们的帮助，问题已经解决了",
+    "这个产品质量太差了，我要投诉，你们必须给我一个说法",
+    "请问怎么修改收货地址？",
+]
+EMOTIONS = {"积极": 10.0, "消极": 70.0, "中性": 20.0}
+
+
+def build_prompts(manager):
+    prompts = []
+    for text in TEXTS:
+        prompts.append(manager._build_emotion_prompt(text))
+        prompts.append(manager._build_response_prompt(text, EMOTIONS))
+        prompts.append(SINGLE_PASS_PROMPT_PREFIX + f'客户说: "{text}"')
+    return prompts
+
+
+def run_chat(model, tokenizer, prompts, max_new_tokens):
+    outputs, tokens, elapsed = [], 0, 0.0
+    for prompt in prompts:
+        start = time.perf_counter()
+        response, _ = model.chat(tokenizer, prompt, history=None)
+        elapsed += time.perf_counter() - start
+        outputs.append(response)
+        tokens += len(tokenizer.encode(response))
+    return outputs, {"tokens": tokens, "seconds": elapsed}
+
+
+def run_decoder(decoder, tokenizer, prompts, max_new_tokens):
+    # 按token比较输出，流式文本在多字节字符不完整时的产出时机与步长有关
+    outputs, tokens, elapsed, drafted, accepted = [], 0, 0.0, 0, 0
+    for prompt in prompts:
+        ids = tokenizer.encode(build_chat_prompt(prompt))
+        result = {}
+        start = time.perf_counter()
+        for _ in decoder.stream(ids, max_new_tokens=max_new_tokens, result=result):
+            pass
+        elapsed += time.perf_counter() - start
+        outputs.append(result["generated"])
+        tokens += len(result["generated"])
+        drafted += result["drafted"]
+        accepted += result["accepted"]
+    return outputs, {"tokens": tokens, "seconds": elapsed, "drafted": drafted, "accepted": accepted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推测解码与逐个token生成的速度对比")
+    parser.add_argument("--rounds", type=int, default=2, help="测试语料重复的轮数，n-gram草稿会利用之前轮次的回复")
+    parser.add_argument("--max-new-tokens", type=int, default=256, help="每条回复最多生成的token数")
+    parser.add_argument("--draft", help="小模型草稿的ID/路径，self表示用Qwen自身")
+    parser.add_argument("--draft-tokens", type=int, default=4, help="小模型每步提出的草稿token数")
+    parser.add_argument("--standins", help="使用替身模型，如 qwen=tiny")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    manager = ModelManager(standins=args.standins, prefix_cache=False, speculative="")
+    model, tokenizer = manager.qwen_model, manager.qwen_tokenizer
+    if manager.kv_decoder is None:
+        print("当前Qwen模型不支持直接前向计算，无法测试推测解码")
+        return 1
+    prompts = build_prompts(manager) * args.rounds
+
+    decoders = {
+        "greedy": KVDecoder(model, tokenizer),
+        "ngram": KVDecoder(model, tokenizer, draft=NgramDraft()),
+    }
+    if args.draft == "self":
+        decoders["draft"] = KVDecoder(model, tokenizer, draft=ModelDraft(model, args.draft_tokens))
+    elif args.draft:
+        draft = build_draft(args.draft, tokenizer)
+        if draft is None:
+            print(f"草稿模型 {args.draft} 不可用")
+            return 1
+        draft.max_tokens = args.draft_tokens
+        decoders["draft"] = KVDecoder(model, tokenizer, draft=draft)
+
+    # 预热一次前向计算
+    run_decoder(decoders["greedy"], tokenizer, prompts[:1], 8)
+
+    results = {}
+    outputs = {}
+    outputs["chat"], results["chat"] = run_chat(model, tokenizer, prompts, args.max_new_tokens)
+    for name, decoder in decoders.items():
+        outputs[name], results[name] = run_decoder(decoder, tokenizer, prompts, args.max_new_tokens)
+
+    greedy_tps = None
+    for name, row in results.items():
+        row["tokens_per_second"] = round(row["tokens"] / row["seconds"], 2) if row["seconds"] else None
+        row["seconds"] = round(row["seconds"], 3)
+        if name == "greedy":
+            greedy_tps = row["tokens_per_second"]
+        if row.get("drafted"):
+            row["acceptance_rate"] = round(row["accepted"] / row["drafted"], 4)
+        if name not in ("chat", "greedy"):
+            # 贪心解码下推测解码的输出应与逐个解码完全相同
+            row["matches_greedy"] = outputs[name] == outputs["greedy"]
+    for row in results.values():
+        if greedy_tps and row["tokens_per_second"]:
+            row["speedup_vs_greedy"] = round(row["tokens_per_second"] / greedy_tps, 3)
+
+    report = {"prompts": len(prompts), "max_new_tokens": args.max_new_tokens, "modes": results}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if all(row.get("matches_greedy", True) for row in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
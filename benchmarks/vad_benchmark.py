@@ -0,0 +1,99 @@
+"""静音裁剪基准：比较原始录音与去除静音后的语音识别+音频情感分析耗时
+
+在录音前后和中间插入静音，构造不同静音占比的测试音频，分别送入Whisper和emotion2vec。
+
+用法:
+    python -m benchmarks.vad_benchmark temp/*.wav --ratios 0.3 0.5 0.7
+    python -m benchmarks.vad_benchmark temp/*.wav --audio-only   # 不加载模型，只统计音频时长
+"""
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from utils.audio_data import AudioData
+from utils.vad import speech_segments, trim_silence
+
+
+def with_silence(samples, ratio, sample_rate=16000, seed=0):
+    """在首尾和中间插入低电平噪声，使静音约占总时长的ratio"""
+    speech = trim_silence(samples, sample_rate)
+    silence_total = int(len(speech) * ratio / (1.0 - ratio))
+    rng = np.random.default_rng(seed)
+
+    def silence(n):
+        return rng.normal(0.0, 0.0005, n).astype(np.float32)
+
+    third = silence_total // 3
+    middle = len(speech) // 2
+    return np.concatenate([
+        silence(third), speech[:middle], silence(third), speech[middle:], silence(silence_total - 2 * third)
+    ])
+
+
+def measured_silence_ratio(samples, sample_rate=16000):
+    speech = sum(e - s for s, e in speech_segments(samples, sample_rate))
+    return 1.0 - speech / float(len(samples)) if len(samples) else 0.0
+
+
+def time_models(manager, samples):
+    audio = AudioData(samples, 16000)
+    start = time.perf_counter()
+    manager.recognize_speech(audio)
+    manager.analyze_audio_emotion(audio)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="静音裁剪对ASR+SER耗时的影响")
+    parser.add_argument("files", nargs="+", help="16位PCM的WAV文件")
+    parser.add_argument("--ratios", type=float, nargs="+", default=[0.3, 0.5, 0.7], help="构造的静音占比")
+    parser.add_argument("--audio-only", action="store_true", help="不运行模型，只统计裁剪掉的音频时长")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    manager = None
+    if not args.audio_only:
+        from models.model_manager import ModelManager
+        manager = ModelManager(lazy=False)
+        # 预先运行一次，排除首次推理的初始化开销
+        time_models(manager, AudioData.from_file(args.files[0]).resample(16000).samples)
+
+    rows = []
+    for ratio in args.ratios:
+        original_seconds = trimmed_seconds = original_time = trimmed_time = 0.0
+        measured = []
+        for path in args.files:
+            samples = with_silence(AudioData.from_file(path).resample(16000).samples, ratio)
+            trimmed = trim_silence(samples)
+            measured.append(measured_silence_ratio(samples))
+            original_seconds += len(samples) / 16000.0
+            trimmed_seconds += len(trimmed) / 16000.0
+            if manager is not None:
+                original_time += time_models(manager, samples)
+                trimmed_time += time_models(manager, trimmed)
+        row = {
+            "silence_ratio": ratio,
+            "measured_silence_ratio": round(float(np.mean(measured)), 3),
+            "audio_seconds": round(original_seconds, 2),
+            "trimmed_seconds": round(trimmed_seconds, 2),
+        }
+        if manager is not None:
+            row.update({
+                "asr_ser_seconds": round(original_time, 3),
+                "asr_ser_trimmed_seconds": round(trimmed_time, 3),
+                "time_saved": round(1.0 - trimmed_time / original_time, 3) if original_time else 0.0,
+            })
+        rows.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,8 +19,8 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     app.setStyle('Fusion')  # 设置风格
     
-    # 加载模型管理器
-    model_manager = ModelManager()
+    # 加载模型管理器：后台并发预热模型，主窗口无需等待全部模型加载完成
+    model_manager = ModelManager(warmup=True)
     
     # 创建并显示主窗口
     window = MainWindow(model_manager)
@@ -0,0 +1,103 @@
+import os
+import logging
+
+from utils import config
+
+logger = logging.getLogger("backends")
+
+# 每个模型可选的推理后端
+#   fp32: 原始模型
+#   int8: torch动态量化，线性层权重量化为int8，只在CPU上生效
+#   ctranslate2: 通过faster-whisper使用CTranslate2的int8模型（仅Whisper）
+BACKENDS = {
+    "whisper": ("fp32", "int8", "ctranslate2"),
+    "emotion": ("fp32", "int8"),
+    "qwen": ("fp32", "int8"),
+}
+DEFAULT_BACKEND = "fp32"
+
+
+def _on_cpu(module):
+    return all(p.device.type == "cpu" for p in module.parameters())
+
+
+def quantize_int8(module):
+    """对模块中的线性层做原地动态int8量化"""
+    import torch
+    # Whisper等模型使用nn.Linear的子类，动态量化只接受nn.Linear本身；
+    # 这些子类只改写了fp16下的类型转换，在CPU的fp32推理中与nn.Linear等价
+    for child in module.modules():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            child.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _int8(name, model):
+    """按模型类型找到其中的torch模块并量化"""
+    if name == "qwen":
+        module = model[0]
+    elif name == "emotion":
+        module = model.model  # FunASR的AutoModel把网络保存在model属性中
+    else:
+        module = model
+    if not _on_cpu(module):
+        logger.warning(f"{name}模型不在CPU上，动态量化只支持CPU，保持原始精度")
+        return model, DEFAULT_BACKEND
+    quantize_int8(module)
+    return model, "int8"
+
+
+class FasterWhisperModel:
+    """把faster-whisper包装成与openai-whisper相同的transcribe接口"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio, language=None, task="transcribe", initial_prompt=None, **kwargs):
+        segments, _ = self.model.transcribe(audio, language=language, task=task, initial_prompt=initial_prompt)
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+
+def _load_faster_whisper(model_size):
+    from faster_whisper import WhisperModel
+    return FasterWhisperModel(WhisperModel(
+        model_size, device="cpu", compute_type="int8",
+        download_root=os.path.join(config.MODELS_DIR, "faster-whisper"),
+        local_files_only=config.MODELS_OFFLINE
+    ))
+
+
+def build_loader(name, backend, base_loader, whisper_size="small", report=None):
+    """返回按指定后端加载模型的无参函数
+
+    后端依赖未安装或加载、量化失败时记录警告并退回原始加载函数。
+    report: 可选的字典，加载完成后写入 {模型名称: 实际使用的后端}
+    """
+    if backend not in BACKENDS.get(name, ()):
+        if backend != DEFAULT_BACKEND:
+            logger.warning(f"{name}模型不支持后端 {backend}，使用{DEFAULT_BACKEND}")
+        backend = DEFAULT_BACKEND
+
+    def load():
+        model, used = None, DEFAULT_BACKEND
+        if backend == "ctranslate2":
+            try:
+                model, used = _load_faster_whisper(whisper_size), "ctranslate2"
+            except ImportError:
+                logger.warning("未安装faster-whisper，使用原始Whisper模型")
+            except Exception as e:
+                logger.warning(f"CTranslate2后端加载失败，使用原始Whisper模型: {str(e)}")
+        if model is None:
+            model = base_loader()
+            if backend == "int8":
+                try:
+                    model, used = _int8(name, model)
+                except Exception as e:
+                    logger.warning(f"{name}模型int8量化失败，保持原始精度: {str(e)}")
+        logger.info(f"{name}模型使用后端: {used}")
+        if report is not None:
+            report[name] = used
+        return model
+
+    return load
@@ -0,0 +1,162 @@
+import logging
+import itertools
+import numpy as np
+
+logger = logging.getLogger("batch_inference")
+
+WHISPER_SAMPLE_RATE = 16000
+WHISPER_WINDOW_SAMPLES = 30 * WHISPER_SAMPLE_RATE  # Whisper单次解码处理30秒
+
+
+def bucket_by_length(lengths, batch_size):
+    """按长度排序后切分批次，使同一批内的输入长度相近、填充最少
+
+    返回索引列表的列表，索引对应原始输入的位置。
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def batch_transcribe(whisper_model, waveforms, batch_size=8, language="zh", initial_prompt=None):
+    """批量转写16kHz波形
+
+    不超过30秒的音频填充到同一个30秒窗口，堆叠成一个批次的梅尔频谱后调用
+    whisper.decode做一次批量解码；更长的音频需要滑动窗口，仍逐条调用transcribe。
+    """
+    if not hasattr(whisper_model, "dims"):
+        # faster-whisper等其他后端没有whisper.decode可用的模型结构，逐条转写
+        return [
+            whisper_model.transcribe(w, language=language, task="transcribe", initial_prompt=initial_prompt)["text"]
+            for w in waveforms
+        ]
+
+    import torch
+    import whisper
+
+    results = [None] * len(waveforms)
+    short = [i for i, w in enumerate(waveforms) if len(w) <= WHISPER_WINDOW_SAMPLES]
+    long = [i for i, w in enumerate(waveforms) if len(w) > WHISPER_WINDOW_SAMPLES]
+
+    device = next(whisper_model.parameters()).device
+    n_mels = whisper_model.dims.n_mels
+    options = whisper.DecodingOptions(
+        language=language,
+        task="transcribe",
+        prompt=initial_prompt,
+        fp16=device.type == "cuda",
+        without_timestamps=True,
+    )
+    # 所有短音频都填充到30秒，按长度分桶只影响批次内的解码步数
+    for batch in bucket_by_length([len(waveforms[i]) for i in short], batch_size):
+        indices = [short[j] for j in batch]
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(torch.from_numpy(waveforms[i])), n_mels=n_mels
+            )
+            for i in indices
+        ]).to(device)
+        with torch.no_grad():
+            decoded = whisper.decode(whisper_model, mel, options)
+        for i, result in zip(indices, decoded):
+            results[i] = result.text
+
+    for i in long:
+        results[i] = whisper_model.transcribe(
+            waveforms[i], language=language, task="transcribe", initial_prompt=initial_prompt
+        )["text"]
+    return results
+
+
+def batch_emotion2vec_scores(emotion_model, waveforms, batch_size=8):
+    """批量计算emotion2vec的9类情感概率
+
+    FunASR的generate对列表输入仍逐条前向，这里直接调用底层模型：按长度分桶、
+    零填充并传入padding_mask，帧特征按有效帧做平均池化后经过分类头。
+    底层接口不可用时退回逐条generate。返回每条音频的分数列表。
+    """
+    model = getattr(emotion_model, "model", None)
+    if model is None or getattr(model, "proj", None) is None:
+        return [_generate_scores(emotion_model, w) for w in waveforms]
+
+    device = next(model.parameters()).device
+    normalize = getattr(getattr(model, "cfg", None), "normalize", False)
+    results = [None] * len(waveforms)
+    for batch in bucket_by_length([len(w) for w in waveforms], batch_size):
+        try:
+            results_batch = _emotion2vec_forward(model, [waveforms[i] for i in batch], device, normalize)
+        except Exception as e:
+            logger.warning(f"emotion2vec批量前向失败，改为逐条处理: {str(e)}")
+            results_batch = [_generate_scores(emotion_model, waveforms[i]) for i in batch]
+        for i, scores in zip(batch, results_batch):
+            results[i] = scores
+    return results
+
+
+def _emotion2vec_forward(model, waveforms, device, normalize):
+    import torch
+    import torch.nn.functional as F
+    max_len = max(len(w) for w in waveforms)
+    source = torch.zeros(len(waveforms), max_len)
+    padding_mask = torch.ones(len(waveforms), max_len, dtype=torch.bool)
+    for row, waveform in enumerate(waveforms):
+        wav = torch.from_numpy(np.ascontiguousarray(waveform, dtype=np.float32))
+        if normalize:
+            # 与逐条推理一致：每条音频单独做层归一化，不受填充影响
+            wav = F.layer_norm(wav, wav.shape)
+        source[row, :len(wav)] = wav
+        padding_mask[row, :len(wav)] = False
+
+    with torch.no_grad():
+        feats = model.extract_features(source.to(device), padding_mask=padding_mask.to(device))
+        x = feats["x"]
+        frame_mask = feats.get("padding_mask")
+        if frame_mask is not None:
+            valid = (~frame_mask).unsqueeze(-1).to(x.dtype)
+            pooled = (x * valid).sum(dim=1) / valid.sum(dim=1).clamp(min=1.0)
+        else:
+            pooled = x.mean(dim=1)
+        probs = torch.softmax(model.proj(pooled), dim=-1)
+    return probs.cpu().tolist()
+
+
+def _generate_scores(emotion_model, waveform):
+    rec_result = emotion_model.generate(
+        waveform, fs=WHISPER_SAMPLE_RATE, granularity="utterance", extract_embedding=False
+    )
+    if isinstance(rec_result, list) and rec_result and isinstance(rec_result[0], dict):
+        return list(rec_result[0].get("scores", []))
+    return []
+
+
+def sliding_windows(num_samples, window, hop):
+    """把num_samples个采样点切成长度为window、步长为hop的重叠窗口，逐个产出(起始, 结束)
+
+    最后一个窗口与结尾对齐，使所有窗口等长（不足一个窗口的音频只有一个窗口）。
+    """
+    if num_samples <= window:
+        yield 0, num_samples
+        return
+    start = 0
+    for start in range(0, num_samples - window + 1, hop):
+        yield start, start + window
+    if start + window < num_samples:
+        yield num_samples - window, num_samples
+
+
+def windowed_emotion2vec_scores(emotion_model, waveform, window, hop, batch_size=8):
+    """把长音频切成重叠窗口后分批计算emotion2vec分数
+
+    窗口是波形的切片视图，每次只有batch_size个窗口进入模型，
+    前向的显存/内存占用只取决于窗口长度和批大小，与音频总长无关；
+    注意力的计算量也从对整段音频的平方降为与时长成线性。
+    返回 ([(起始, 结束), ...], 每个窗口的分数列表)，位置以采样点计。
+    """
+    bounds, scores = [], []
+    windows = sliding_windows(len(waveform), window, hop)
+    while True:
+        chunk = list(itertools.islice(windows, batch_size))
+        if not chunk:
+            break
+        scores.extend(batch_emotion2vec_scores(emotion_model, [waveform[s:e] for s, e in chunk], batch_size))
+        bounds.extend(chunk)
+    return bounds, scores
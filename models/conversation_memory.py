@@ -0,0 +1,156 @@
+import weakref
+import threading
+from collections import OrderedDict
+
+
+class ConversationMemory:
+    """一个会话的多轮对话记忆
+
+    保存最近若干轮（送入模型的用户消息、模型回复、客户原文）和更早对话的摘要，
+    历史与摘要的token数不超过token_budget。超出预算时一次性取出最早的若干轮，
+    直到降到 token_budget * low_watermark 以下，由调用方把它们压缩进摘要，
+    这样摘要不必每轮都重新生成。
+
+    同时保存上一轮生成结束时的KV缓存及其对应的token，下一轮只需预填充新增的部分。
+    """
+
+    def __init__(self, token_budget=1024, keep_recent=2, low_watermark=0.5):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.low_watermark = low_watermark
+        self.turns = []  # [{"message", "reply", "text", "tokens"}, ...]
+        self.summary = ""
+        self.summary_tokens = 0
+        self.compactions = 0
+        self.kv_ids = None  # KV缓存覆盖的token序列
+        self.kv_past = None
+        self.kv_stale = False  # KV缓存池要求丢弃缓存时本会话正持有锁，由持有方稍后丢弃
+        # 同一会话的生成串行执行，保证KV缓存与历史一致
+        self.lock = threading.RLock()
+
+    @property
+    def token_count(self):
+        return self.summary_tokens + sum(turn["tokens"] for turn in self.turns)
+
+    @property
+    def empty(self):
+        return not self.turns and not self.summary
+
+    @property
+    def summary_limit(self):
+        """摘要最多占用预算的四分之一"""
+        return max(1, self.token_budget // 4)
+
+    def context(self):
+        """返回(摘要, [(用户消息, 回复), ...])"""
+        return self.summary, [(turn["message"], turn["reply"]) for turn in self.turns]
+
+    def add_turn(self, message, reply, tokens, text=None):
+        self.turns.append({"message": message, "reply": reply, "text": text or message, "tokens": tokens})
+        self._drop_if_stale()
+
+    def take_overflow(self):
+        """超出预算时取出需要压缩进摘要的最早若干轮，未超出时返回空列表"""
+        if self.token_count <= self.token_budget:
+            return []
+        target = self.token_budget * self.low_watermark
+        evicted = []
+        while self.turns and self.token_count > target:
+            # 最近的keep_recent轮尽量保留，除非只剩它们时仍然超出预算
+            if len(self.turns) <= self.keep_recent and self.token_count <= self.token_budget:
+                break
+            evicted.append(self.turns.pop(0))
+        return evicted
+
+    def set_summary(self, summary, tokens):
+        self.summary = summary
+        self.summary_tokens = tokens
+        self.compactions += 1
+
+    def reuse(self, ids):
+        """对新一轮的完整token序列，返回可复用的(KV缓存, 复用的token数)
+
+        取缓存token与新序列的最长公共前缀，并至少留下一个token做预填充；
+        历史被压缩或回复经过改写时公共前缀变短，缓存被相应截断。
+        """
+        self._drop_if_stale()
+        if self.kv_past is None:
+            return None, 0
+        common = 0
+        limit = min(len(self.kv_ids), len(ids) - 1)
+        while common < limit and self.kv_ids[common] == ids[common]:
+            common += 1
+        if common == 0:
+            self.drop_kv()
+            return None, 0
+        return self.kv_past, common
+
+    def store_kv(self, ids, past):
+        """保存新的KV缓存（调用方随后会在KV缓存池中登记为最近使用），此前的淘汰标记不再适用"""
+        self.kv_ids = list(ids)
+        self.kv_past = past
+        self.kv_stale = False
+
+    def drop_kv(self):
+        self.kv_ids = None
+        self.kv_past = None
+        self.kv_stale = False
+
+    def evict_kv(self):
+        """由KV缓存池调用：会话空闲时立即丢弃缓存；正在生成（持有锁）时只做标记，
+        由持有锁的一方在下次读取缓存或记录本轮时丢弃，不会在生成中途清掉缓存"""
+        if self.lock.acquire(blocking=False):
+            try:
+                self.drop_kv()
+            finally:
+                self.lock.release()
+        else:
+            self.kv_stale = True
+
+    def _drop_if_stale(self):
+        if self.kv_stale:
+            self.drop_kv()
+
+    def stats(self):
+        return {
+            "turns": len(self.turns),
+            "tokens": self.token_count,
+            "token_budget": self.token_budget,
+            "summary_tokens": self.summary_tokens,
+            "compactions": self.compactions,
+            "kv_tokens": len(self.kv_ids) if self.kv_ids else 0,
+        }
+
+
+class KVCachePool:
+    """限制同时保留KV缓存的会话数
+
+    每个会话的KV缓存可能占用数百MB，只为最近活跃的max_sessions个会话保留，
+    其余会话下一轮重新预填充历史。通过弱引用跟踪，会话被清理后不会因此常驻内存。
+    """
+
+    def __init__(self, max_sessions=4):
+        self.max_sessions = max_sessions
+        self._memories = OrderedDict()
+        self._lock = threading.Lock()
+
+    def touch(self, memory):
+        """记录memory刚刚保存了KV缓存，超出数量时丢弃最久未用会话的缓存
+
+        调用方通常持有memory.lock，因此在池的锁之外、以不阻塞的方式处理被淘汰的会话，避免两个会话互相等锁。
+        """
+        evicted = []
+        with self._lock:
+            key = id(memory)
+            self._memories.pop(key, None)
+            self._memories[key] = weakref.ref(memory)
+            while len(self._memories) > self.max_sessions:
+                _, ref = self._memories.popitem(last=False)
+                evicted.append(ref())
+        for other in evicted:
+            if other is not None:
+                other.evict_kv()
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for ref in self._memories.values() if ref() is not None)
@@ -0,0 +1,207 @@
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("emotion_analyzer")
+
+# 客服系统使用的三类情感，数组的列按此顺序排列
+EMOTION_LABELS = ("积极", "消极", "中性")
+
+# emotion2vec输出的情感标签顺序
+AUDIO_EMOTION_LABELS = [
+    "生气(angry)", "厌恶(disgusted)", "恐惧(fearful)",
+    "高兴(happy)", "中性(neutral)", "其他(other)",
+    "悲伤(sad)", "惊讶(surprised)", "未知(unknown)"
+]
+
+# emotion2vec的9类 -> 三类的映射矩阵，行对应AUDIO_EMOTION_LABELS，列对应EMOTION_LABELS
+# 其他、惊讶、未知不计入任何一类
+AUDIO_LABEL_MAP = np.array([
+    [0, 1, 0],  # angry
+    [0, 1, 0],  # disgusted
+    [0, 1, 0],  # fearful
+    [1, 0, 0],  # happy
+    [0, 0, 1],  # neutral
+    [0, 0, 0],  # other
+    [0, 1, 0],  # sad
+    [0, 0, 0],  # surprised
+    [0, 0, 0],  # unknown
+], dtype=np.float64)
+
+# 音频情感结果无法识别时使用的默认值
+DEFAULT_AUDIO_SCORES = [0.1, 0.1, 0.1, 0.2, 0.3, 0.0, 0.1, 0.1, 0.0]
+DEFAULT_AUDIO_EMOTIONS = {"积极": 20.0, "消极": 20.0, "中性": 60.0}
+
+
+class EmotionAnalyzer:
+    """多模态情感融合，情感分数以NumPy数组（float64）表示
+
+    三类情感分布是最后一维为3的数组（百分比，总和为100），emotion2vec分数是最后一维为9的数组，
+    前面的维度可以是批次（多轮）或片段（同一段音频的多个时间片），所有计算都一次完成。
+    融合结果为文本和音频分布的加权平均，权重可以配置，也可以用标注数据学习（fit）。
+    不依赖ModelManager，可以单独用于离线分析。
+    """
+
+    def __init__(self, text_weight=0.6, audio_weight=None, label_map=None):
+        """audio_weight缺省时为1 - text_weight；label_map: 可选，9x3的标签映射矩阵"""
+        audio_weight = 1.0 - text_weight if audio_weight is None else audio_weight
+        self.weights = self._normalize_weights([text_weight, audio_weight])
+        self.label_map = AUDIO_LABEL_MAP if label_map is None else np.asarray(label_map, dtype=np.float64)
+
+    @staticmethod
+    def _normalize_weights(weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (2,) or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError(f"融合权重必须是两个非负数且不全为0: {weights.tolist()}")
+        return weights / weights.sum()
+
+    @property
+    def text_weight(self):
+        return float(self.weights[0])
+
+    @property
+    def audio_weight(self):
+        return float(self.weights[1])
+
+    # 字典与数组互相转换
+    @staticmethod
+    def to_array(emotions):
+        """情感分布字典或字典列表 -> 形状为(3,)或(n, 3)的数组"""
+        if isinstance(emotions, dict):
+            return np.array([emotions[label] for label in EMOTION_LABELS], dtype=np.float64)
+        return np.array([[e[label] for label in EMOTION_LABELS] for e in emotions], dtype=np.float64).reshape(-1, 3)
+
+    @staticmethod
+    def to_dict(row):
+        return dict(zip(EMOTION_LABELS, np.asarray(row, dtype=np.float64).tolist()))
+
+    @staticmethod
+    def to_dicts(array):
+        """形状为(3,)的数组返回单个字典，(n, 3)的数组返回字典列表"""
+        array = np.asarray(array, dtype=np.float64)
+        if array.ndim == 1:
+            return dict(zip(EMOTION_LABELS, array.tolist()))
+        return [dict(zip(EMOTION_LABELS, row)) for row in array.tolist()]
+
+    @staticmethod
+    def _to_percent(values):
+        """每行归一化为总和100，总和为0的行保持为0"""
+        total = values.sum(axis=-1, keepdims=True)
+        return np.divide(values * 100.0, total, out=np.zeros_like(values), where=total > 0)
+
+    # 音频分数映射
+    def map_audio(self, scores):
+        """emotion2vec分数(..., 9) -> 三类情感分布(..., 3)，每行总和为100"""
+        scores = np.asarray(scores, dtype=np.float64)
+        return self._to_percent(scores[..., :len(self.label_map)] @ self.label_map[:scores.shape[-1]])
+
+    def map_audio_dict(self, scores):
+        """单条emotion2vec分数列表 -> 三类情感分布字典"""
+        return self.to_dict(self.map_audio(scores))
+
+    def pool_segments(self, segment_scores, durations=None):
+        """把片段级（或帧级）分数汇总成整段音频的三类情感分布
+
+        segment_scores: (..., 片段数, 9)的emotion2vec分数，前面的维度为批次
+        durations: 可选，(..., 片段数)的片段时长，作为加权平均的权重；缺省时等权
+        """
+        segments = self.map_audio(segment_scores)
+        if segments.shape[-2] == 0:
+            default = np.array([DEFAULT_AUDIO_EMOTIONS[label] for label in EMOTION_LABELS], dtype=np.float64)
+            return np.broadcast_to(default, segments.shape[:-2] + (3,)).copy()
+        if durations is None:
+            durations = np.ones(segments.shape[:-1], dtype=np.float64)
+        return self._to_percent(np.einsum("...s,...sk->...k", np.asarray(durations, dtype=np.float64), segments))
+
+    @staticmethod
+    def overlaps(sources, targets):
+        """两组时间区间的重叠时长矩阵，形状为(len(targets), len(sources))
+
+        sources / targets: [(起始秒, 结束秒), ...]，例如滑动窗口和Whisper的分段
+        """
+        sources = np.asarray(sources, dtype=np.float64).reshape(-1, 2)
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+        start = np.maximum(targets[:, None, 0], sources[None, :, 0])
+        end = np.minimum(targets[:, None, 1], sources[None, :, 1])
+        return np.clip(end - start, 0.0, None)
+
+    @staticmethod
+    def pool_scores(scores, weights):
+        """按权重矩阵对emotion2vec原始分数加权平均，返回(len(weights), 9)
+
+        scores: (片段数, 9)；weights: (输出数, 片段数)，例如overlaps的结果。
+        权重全为0的行（没有覆盖到任何片段）使用默认分数。
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        weights = np.asarray(weights, dtype=np.float64)
+        total = weights.sum(axis=1, keepdims=True)
+        pooled = np.tile(np.asarray(DEFAULT_AUDIO_SCORES[:scores.shape[-1]], dtype=np.float64), (len(weights), 1))
+        np.divide(weights @ scores, total, out=pooled, where=total > 0)
+        return pooled
+
+    @staticmethod
+    def audio_specific(emotions, scores=None):
+        """音频的具体情感：按主导情感判断，消极时用emotion2vec原始分数区分愤怒和悲伤"""
+        dominant = max(emotions, key=emotions.get)
+        if dominant == "积极":
+            return "高兴"
+        if dominant == "消极":
+            if scores:
+                return "愤怒" if scores.get("生气(angry)", 0) > scores.get("悲伤(sad)", 0) else "悲伤"
+            return "不满"
+        return "平静"
+
+    # 融合
+    def fuse(self, text, audio, weights=None):
+        """融合文本和音频的三类情感分布
+
+        text / audio: 形状相同的(..., 3)数组，可以是一轮、一批轮次或一条音频的各个片段
+        weights: 可选，覆盖融合权重 [文本, 音频]
+        """
+        w = self.weights if weights is None else self._normalize_weights(weights)
+        return np.asarray(text, dtype=np.float64) * w[0] + np.asarray(audio, dtype=np.float64) * w[1]
+
+    def fuse_dicts(self, text_emotions, audio_emotions):
+        """融合一轮的文本和音频情感分布字典，返回融合后的字典"""
+        return self.to_dict(self.fuse(self.to_array(text_emotions), self.to_array(audio_emotions)))
+
+    def fuse_batch(self, text_emotions, audio_emotions):
+        """批量融合多轮的情感分布字典列表，返回顺序一致的字典列表"""
+        if not text_emotions:
+            return []
+        return self.to_dicts(self.fuse(self.to_array(text_emotions), self.to_array(audio_emotions)))
+
+    # 权重学习与保存
+    def fit(self, text, audio, labels, steps=101):
+        """用标注数据学习文本权重：在[0, 1]上网格搜索，取融合结果准确率最高的权重，准确率相同时取交叉熵较小的
+
+        text / audio: (n, 3)的情感分布；labels: 真实情感，EMOTION_LABELS中的标签或列下标
+        """
+        text = self._to_percent(np.asarray(text, dtype=np.float64)) / 100.0
+        audio = self._to_percent(np.asarray(audio, dtype=np.float64)) / 100.0
+        index = np.array([EMOTION_LABELS.index(l) if isinstance(l, str) else int(l) for l in labels])
+        rows = np.arange(len(index))
+        candidates = np.linspace(0.0, 1.0, steps, dtype=np.float64)
+        # (候选权重数, n, 3)：所有候选权重下的融合分布一次算出
+        fused = candidates[:, None, None] * text + (1 - candidates[:, None, None]) * audio
+        accuracies = (np.argmax(fused, axis=2) == index).mean(axis=1)
+        losses = -np.log(np.clip(fused[:, rows, index], 1e-6, None)).mean(axis=1)
+        best = int(np.lexsort((losses, -accuracies))[0])
+        self.weights = self._normalize_weights([candidates[best], 1 - candidates[best]])
+        logger.info(
+            f"融合权重学习完成: {len(index)} 条样本，文本 {self.text_weight:.2f} / 音频 {self.audio_weight:.2f}，"
+            f"准确率 {accuracies[best]:.1%}，交叉熵 {losses[best]:.4f}"
+        )
+        return self
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"text_weight": self.text_weight, "audio_weight": self.audio_weight}, f, indent=2)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """读取save保存的融合权重"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["text_weight"], data["audio_weight"], **kwargs)
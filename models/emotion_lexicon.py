@@ -0,0 +1,144 @@
+import math
+
+# 情感词典：词 -> (权重, 具体情感)。正权重为积极，负权重为消极
+EMOTION_LEXICON = {
+    # 积极
+    "满意": (2.0, "满意"), "喜欢": (2.0, "喜爱"), "感谢": (2.0, "感激"), "谢谢": (1.5, "感激"),
+    "好": (0.8, "满意"), "很好": (1.5, "满意"), "优秀": (2.0, "满意"),
+    "棒": (2.0, "高兴"), "赞": (1.5, "高兴"), "方便": (1.2, "满意"), "效率": (0.8, "满意"),
+    "不错": (1.5, "满意"), "可以": (0.5, "平静"), "帮助": (0.8, "感激"), "满足": (1.5, "满意"),
+    "高兴": (2.0, "高兴"), "开心": (2.0, "高兴"), "太好了": (2.5, "惊喜"), "惊喜": (2.0, "惊喜"),
+    "放心": (1.5, "安心"), "耐心": (1.2, "感激"), "专业": (1.2, "满意"), "及时": (1.2, "满意"),
+    # 消极
+    "不满": (-2.0, "不满"), "差": (-1.5, "不满"), "慢": (-1.2, "焦虑"), "退款": (-0.8, "不满"),
+    "投诉": (-2.5, "愤怒"), "不行": (-1.5, "不满"), "垃圾": (-3.0, "愤怒"), "骗": (-2.5, "愤怒"),
+    "失望": (-2.5, "失望"), "不快": (-1.5, "不满"), "麻烦": (-1.0, "烦躁"), "问题": (-0.5, "担忧"), "错误": (-1.2, "不满"),
+    "难用": (-2.0, "不满"), "糟糕": (-2.5, "失望"), "生气": (-2.5, "愤怒"), "恼火": (-2.5, "愤怒"),
+    "气死": (-3.0, "愤怒"), "着急": (-1.8, "焦虑"), "担心": (-1.5, "担忧"), "害怕": (-1.8, "恐惧"),
+    "难过": (-2.0, "悲伤"), "伤心": (-2.0, "悲伤"), "烦": (-1.5, "烦躁"), "坑": (-2.0, "愤怒"),
+    "欺骗": (-3.0, "愤怒"), "破损": (-1.5, "不满"), "坏了": (-1.5, "不满"), "没收到": (-1.2, "焦虑"),
+    "还没到": (-1.2, "焦虑"), "等了": (-1.0, "焦虑"), "无语": (-2.0, "无语"), "离谱": (-2.5, "愤怒"),
+    # 中性：含"好"的问候、应答和虚词，最长匹配时整体吞掉，不计为"好"的积极证据
+    "你好": (0.0, "平静"), "您好": (0.0, "平静"), "好的": (0.0, "平静"), "好吧": (0.0, "平静"),
+    "好像": (0.0, "平静"), "好久": (0.0, "平静"), "好多": (0.0, "平静"), "只好": (0.0, "平静"),
+    "还好": (0.0, "平静"), "不好意思": (0.0, "平静"),
+}
+
+# 否定词：翻转其后窗口内情感词的极性
+NEGATIONS = ["没有", "不是", "并不", "不", "没", "别", "未", "无", "非"]
+
+# 程度副词 -> 放大系数
+INTENSIFIERS = {
+    "非常": 1.8, "特别": 1.8, "十分": 1.6, "极其": 2.0, "超级": 1.8, "太": 1.6,
+    "很": 1.4, "真": 1.3, "有点": 0.7, "有些": 0.7, "稍微": 0.6,
+}
+
+
+class LexiconEmotionClassifier:
+    """基于加权情感词典的快速文本情感分类器
+
+    最长匹配情感词，并考虑前方窗口内的否定词和程度副词。输出积极/消极/中性分布、
+    具体情感和置信度；置信度低（正负证据冲突或证据过弱）时由调用方交给大模型处理。
+
+    问候语不计为积极证据:
+    >>> result = LexiconEmotionClassifier().predict("你好，我的订单还没到")
+    >>> result["distribution"]["积极"], result["specific"]
+    (0.0, '焦虑')
+    """
+
+    def __init__(self, lexicon=None, negations=None, intensifiers=None,
+                 window=3, neutral_confidence=0.3):
+        self.lexicon = lexicon or EMOTION_LEXICON
+        self.negations = negations or NEGATIONS
+        self.intensifiers = intensifiers or INTENSIFIERS
+        self.window = window  # 否定词/程度副词的作用范围（字符数）
+        # 没有任何情感词时判定为中性的置信度，低于ModelManager的默认升级阈值：
+        # 没有词典证据不代表中性（如"我要你们经理出来！"），交给大模型判断
+        self.neutral_confidence = neutral_confidence
+        self._max_word_len = max(len(w) for w in self.lexicon)
+        # 否定词和程度副词合并后统一做最长匹配，避免"非常"被拆成否定词"非"
+        self._modifiers = {word: ("int", factor) for word, factor in self.intensifiers.items()}
+        self._modifiers.update({word: ("neg", -1.0) for word in self.negations})
+        self._max_modifier_len = max(len(w) for w in self._modifiers)
+
+    def _match(self, text, pos, words, max_len):
+        """在pos处做最长匹配，返回匹配到的词或None"""
+        for length in range(min(max_len, len(text) - pos), 0, -1):
+            word = text[pos:pos + length]
+            if word in words:
+                return word
+        return None
+
+    def score(self, text):
+        """扫描文本，返回[(情感词, 加权得分, 具体情感), ...]"""
+        hits = []
+        modifiers = []  # [(结束位置, 类型, 系数)]
+        pos = 0
+        while pos < len(text):
+            # 情感词优先，保证"不满""不错"等不会被拆成否定词
+            word = self._match(text, pos, self.lexicon, self._max_word_len)
+            if word is not None:
+                weight, specific = self.lexicon[word]
+                for end, kind, factor in modifiers:
+                    if pos - end > self.window:
+                        continue
+                    if kind == "neg":
+                        # 否定后的情感弱于原词，具体情感也不再适用
+                        weight = -weight * 0.8
+                        specific = "不满" if weight < 0 else "平静"
+                    else:
+                        weight *= factor
+                hits.append((word, weight, specific))
+                modifiers = []
+                pos += len(word)
+                continue
+
+            word = self._match(text, pos, self._modifiers, self._max_modifier_len)
+            if word is not None:
+                kind, factor = self._modifiers[word]
+                modifiers.append((pos + len(word), kind, factor))
+                pos += len(word)
+                continue
+
+            # 标点会截断否定和程度副词的作用范围
+            if text[pos] in "，。！？,.!?；;":
+                modifiers = []
+            pos += 1
+        return hits
+
+    def predict(self, text):
+        """返回 {"distribution": {积极, 消极, 中性}, "specific": 具体情感, "confidence": 0~1}"""
+        hits = self.score(text)
+        positive = sum(w for _, w, _ in hits if w > 0)
+        negative = -sum(w for _, w, _ in hits if w < 0)
+        evidence = positive + negative
+
+        if evidence == 0:
+            return {
+                "distribution": {"积极": 20.0, "消极": 20.0, "中性": 60.0},
+                "specific": "平静",
+                "confidence": self.neutral_confidence,
+                "hits": hits,
+            }
+
+        # 情感强度：证据越多越偏离中性；极性差距：正负证据越一致越可信
+        strength = 1.0 - math.exp(-evidence / 2.0)
+        margin = abs(positive - negative) / evidence
+        emotional = 80.0 * strength
+        distribution = {
+            "积极": emotional * positive / evidence,
+            "消极": emotional * negative / evidence,
+        }
+        distribution["中性"] = 100.0 - distribution["积极"] - distribution["消极"]
+
+        # 具体情感取与主导极性一致、绝对权重最大的情感词
+        dominant_sign = 1 if positive >= negative else -1
+        same_sign = [h for h in hits if h[1] * dominant_sign > 0]
+        specific = max(same_sign, key=lambda h: abs(h[1]))[2] if same_sign else "平静"
+
+        return {
+            "distribution": distribution,
+            "specific": specific,
+            "confidence": margin * strength,
+            "hits": hits,
+        }
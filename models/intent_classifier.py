@@ -0,0 +1,115 @@
+import json
+import time
+import logging
+
+import numpy as np
+
+from models.knowledge_base import HashedTfidfVectorizer
+
+logger = logging.getLogger("intent_classifier")
+
+
+class IntentClassifier:
+    """字符n-gram哈希TF-IDF + softmax回归的意图分类器，纯NumPy实现
+
+    训练数据为本地的标注文件，每行一个 {"text": 文本, "intent": 意图}。
+    单条预测只有一次稀疏特征提取和一次矩阵乘法，CPU上不到1毫秒；批量预测合并为一次矩阵乘法。
+    最高概率低于confidence_threshold时判为fallback_intent。
+    """
+
+    def __init__(self, dim=4096, l2=1e-4, epochs=200, learning_rate=0.5,
+                 confidence_threshold=0.3, fallback_intent="other"):
+        self.vectorizer = HashedTfidfVectorizer(dim)
+        self.l2 = l2
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.confidence_threshold = confidence_threshold
+        self.fallback_intent = fallback_intent
+        self.labels = []
+        self.weights = None
+        self.bias = None
+        self.train_seconds = None
+
+    @staticmethod
+    def load_examples(path):
+        """读取标注文件，返回(文本列表, 意图列表)"""
+        texts, labels = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    example = json.loads(line)
+                    texts.append(example["text"])
+                    labels.append(example["intent"])
+        return texts, labels
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        texts, labels = cls.load_examples(path)
+        return cls(**kwargs).fit(texts, labels)
+
+    def fit(self, texts, labels):
+        """全批量梯度下降（Adam）最小化带L2正则的交叉熵"""
+        start = time.perf_counter()
+        self.labels = sorted(set(labels))
+        index = {label: i for i, label in enumerate(self.labels)}
+        x = self.vectorizer.fit_transform(texts)
+        y = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        y[np.arange(len(texts)), [index[label] for label in labels]] = 1.0
+        # 训练样本中从未出现的特征维度权重始终为0，只在出现过的维度上训练
+        active = np.flatnonzero(x.any(axis=0))
+        x = x[:, active]
+
+        params = [np.zeros((len(active), len(self.labels)), dtype=np.float32),
+                  np.zeros(len(self.labels), dtype=np.float32)]
+        moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, self.epochs + 1):
+            probs = self._softmax(x @ params[0] + params[1])
+            error = (probs - y) / len(texts)
+            grads = [x.T @ error + self.l2 * params[0], error.sum(axis=0)]
+            for param, grad, (m, v) in zip(params, grads, moments):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                m_hat = m / (1 - beta1 ** step)
+                v_hat = v / (1 - beta2 ** step)
+                param -= self.learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+        self.weights = np.zeros((self.vectorizer.dim, len(self.labels)), dtype=np.float32)
+        self.weights[active] = params[0]
+        self.bias = params[1]
+        self.train_seconds = time.perf_counter() - start
+        accuracy = float(np.mean(np.argmax(self._softmax(x @ params[0] + self.bias), axis=1) == y.argmax(axis=1)))
+        logger.info(
+            f"意图分类器训练完成: {len(texts)} 条样本，{len(self.labels)} 个意图，"
+            f"训练集准确率 {accuracy:.1%}，耗时 {self.train_seconds:.3f}s"
+        )
+        return self
+
+    @staticmethod
+    def _softmax(logits):
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, texts):
+        """返回(len(texts), 意图数)的概率矩阵，列顺序与self.labels一致"""
+        if self.weights is None:
+            raise RuntimeError("意图分类器尚未训练")
+        return self._softmax(self.vectorizer.transform(texts) @ self.weights + self.bias)
+
+    def predict_batch(self, texts):
+        """批量预测，返回 [{"intent", "confidence"}, ...]"""
+        if not texts:
+            return []
+        probs = self.predict_proba(texts)
+        best = np.argmax(probs, axis=1)
+        results = []
+        for row, i in enumerate(best):
+            confidence = float(probs[row, i])
+            intent = self.labels[i] if confidence >= self.confidence_threshold else self.fallback_intent
+            results.append({"intent": intent, "confidence": round(confidence, 4)})
+        return results
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
@@ -0,0 +1,251 @@
+import json
+import time
+import zlib
+import logging
+import threading
+
+import numpy as np
+
+from utils.cache import normalize_text
+
+logger = logging.getLogger("knowledge_base")
+
+# 本地FAQ知识库：每条问答的各个问法分别建立索引
+#   向量索引: 字符n-gram的哈希TF-IDF向量，NumPy矩阵乘法暴力检索，条目较多时可用IVF近似检索
+#   关键词索引: 同样的字符n-gram上的BM25
+# 两者的得分加权合并，高相似度的命中可以直接给出答案，其余作为参考资料放进提示词。
+
+
+def char_ngrams(text, ngram_range=(1, 2)):
+    """归一化后的字符n-gram，中文不需要分词"""
+    text = normalize_text(text)
+    low, high = ngram_range
+    return [text[i:i + n] for n in range(low, high + 1) for i in range(len(text) - n + 1)]
+
+
+def _feature(token, dim):
+    # 内置hash每次启动不同，用crc32保证索引可以复现
+    return zlib.crc32(token.encode("utf-8")) % dim
+
+
+class HashedTfidfVectorizer:
+    """字符n-gram哈希到dim维后计算TF-IDF，输出L2归一化的float32稠密向量
+
+    不需要保存词表，新文本的n-gram即使没出现过也能映射到固定的维度。
+    """
+
+    def __init__(self, dim=4096, ngram_range=(1, 2), sublinear_tf=True):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.sublinear_tf = sublinear_tf
+        self.idf = None
+
+    def _counts(self, text):
+        features = np.array([_feature(t, self.dim) for t in char_ngrams(text, self.ngram_range)], dtype=np.int64)
+        return np.unique(features, return_counts=True)
+
+    def fit(self, texts):
+        df = np.zeros(self.dim, dtype=np.float64)
+        for text in texts:
+            features, _ = self._counts(text)
+            df[features] += 1
+        # 平滑的idf，与sklearn相同
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1.0).astype(np.float32)
+        return self
+
+    def transform(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features, counts = self._counts(text)
+            tf = 1.0 + np.log(counts) if self.sublinear_tf else counts
+            matrix[row, features] = tf * self.idf[features]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def fit_transform(self, texts):
+        return self.fit(texts).transform(texts)
+
+
+class IVFIndex:
+    """倒排文件近似检索：用球面k-means把向量分成nlist簇，查询时只比较最近的nprobe个簇"""
+
+    def __init__(self, vectors, nlist=None, nprobe=4, iterations=10, seed=0):
+        n = len(vectors)
+        self.nlist = nlist or max(1, int(np.sqrt(n)))
+        self.nprobe = nprobe
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, self.nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = vectors[assign == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+        self.centroids = centroids
+        self.vectors = vectors
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        self.lists = [np.flatnonzero(assign == c) for c in range(self.nlist)]
+
+    def search(self, query, k):
+        """返回(文档序号, 余弦相似度)，按相似度降序"""
+        probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        candidates = np.concatenate([self.lists[c] for c in probes])
+        if len(candidates) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        scores = self.vectors[candidates] @ query
+        order = np.argsort(-scores)[:k]
+        return candidates[order], scores[order]
+
+
+class BM25Index:
+    """字符n-gram上的BM25，倒排表的每项预先乘好idf和长度归一化"""
+
+    def __init__(self, documents, ngram_range=(1, 2), k1=1.5, b=0.75):
+        self.ngram_range = ngram_range
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+        tokenized = [char_ngrams(doc, ngram_range) for doc in documents]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float64)
+        self.avgdl = float(lengths.mean()) if self.size else 1.0
+        postings = {}
+        for doc, tokens in enumerate(tokenized):
+            unique, counts = np.unique(tokens, return_counts=True) if tokens else ([], [])
+            for token, tf in zip(unique, counts):
+                postings.setdefault(str(token), []).append((doc, tf))
+        self.idf = {}
+        self.postings = {}
+        for token, entries in postings.items():
+            docs = np.array([doc for doc, _ in entries], dtype=np.int64)
+            tf = np.array([tf for _, tf in entries], dtype=np.float64)
+            idf = np.log(1.0 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[docs] / self.avgdl)
+            self.idf[token] = idf
+            self.postings[token] = (docs, (idf * tf * (self.k1 + 1.0) / (tf + norm)).astype(np.float32))
+
+    def scores(self, query):
+        """返回(每个文档的BM25得分, 查询与自身的得分)，后者用于把得分归一化到0~1"""
+        tokens = char_ngrams(query, self.ngram_range)
+        scores = np.zeros(self.size, dtype=np.float32)
+        if not tokens:
+            return scores, 0.0
+        unique, counts = np.unique(tokens, return_counts=True)
+        norm = self.k1 * (1.0 - self.b + self.b * len(tokens) / self.avgdl)
+        # 知识库中没有出现过的n-gram按最高的idf计入自身得分，只命中少数常见片段时归一化得分很低
+        unseen_idf = np.log(1.0 + (self.size + 0.5) / 0.5)
+        best = 0.0
+        for token, tf in zip(unique, counts):
+            token = str(token)
+            best += self.idf.get(token, unseen_idf) * tf * (self.k1 + 1.0) / (tf + norm)
+            posting = self.postings.get(token)
+            if posting is not None:
+                docs, weights = posting
+                scores[docs] += weights
+        return scores, best
+
+
+class KnowledgeBase:
+    """FAQ问答的混合检索
+
+    entries: [{"id", "intent", "questions": [问法, ...], "answer"}, ...]
+    vector_weight: 合并得分中向量相似度的权重，其余为归一化的BM25得分
+    ann_min_docs: 问法数达到该值时用IVF近似检索代替暴力检索
+    """
+
+    def __init__(self, entries, dim=4096, vector_weight=0.5, ann_min_docs=5000, nprobe=8):
+        self.entries = list(entries)
+        self.vector_weight = vector_weight
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.search_seconds = 0.0
+
+        start = time.perf_counter()
+        self.questions = []
+        self.doc_entry = []  # 问法序号 -> 条目序号
+        for i, entry in enumerate(self.entries):
+            for question in entry["questions"]:
+                self.questions.append(question)
+                self.doc_entry.append(i)
+        self.doc_entry = np.array(self.doc_entry, dtype=np.int64)
+        self.vectorizer = HashedTfidfVectorizer(dim)
+        self.vectors = self.vectorizer.fit_transform(self.questions)
+        self.bm25 = BM25Index(self.questions)
+        self.ann = None
+        if len(self.questions) >= ann_min_docs:
+            self.ann = IVFIndex(self.vectors, nprobe=nprobe)
+        self.build_seconds = time.perf_counter() - start
+        logger.info(
+            f"知识库索引完成: {len(self.entries)} 条问答，{len(self.questions)} 个问法，"
+            f"{'IVF' if self.ann else '暴力'}检索，耗时 {self.build_seconds:.3f}s"
+        )
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """从JSON数组或每行一个JSON对象的文件加载"""
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        if content.lstrip().startswith("["):
+            entries = json.loads(content)
+        else:
+            entries = [json.loads(line) for line in content.splitlines() if line.strip()]
+        return cls(entries, **kwargs)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, query, k=3):
+        """返回最相关的k条问答 [{"id", "intent", "question", "answer", "score", "vector", "bm25"}, ...]
+
+        score为向量相似度和归一化BM25得分的加权和，范围0~1；同一条问答只保留得分最高的问法。
+        """
+        start = time.perf_counter()
+        query_vector = self.vectorizer.transform([query])[0]
+        bm25, best = self.bm25.scores(query)
+        bm25 = np.minimum(bm25 / best, 1.0) if best > 0 else bm25
+        if self.ann is not None:
+            # 近似检索只给出候选问法，BM25得分按候选取出
+            candidates, cosine = self.ann.search(query_vector, k * 8)
+            keyword = bm25[candidates]
+        else:
+            candidates = np.arange(len(self.questions))
+            cosine = self.vectors @ query_vector
+            keyword = bm25
+        scores = self.vector_weight * cosine + (1.0 - self.vector_weight) * keyword
+
+        results = []
+        seen = set()
+        for position in np.argsort(-scores):
+            doc = int(candidates[position])
+            entry_index = int(self.doc_entry[doc])
+            if entry_index in seen:
+                continue
+            seen.add(entry_index)
+            entry = self.entries[entry_index]
+            results.append({
+                "id": entry.get("id", str(entry_index)),
+                "intent": entry.get("intent"),
+                "question": self.questions[doc],
+                "answer": entry["answer"],
+                "score": round(float(scores[position]), 4),
+                "vector": round(float(cosine[position]), 4),
+                "bm25": round(float(keyword[position]), 4),
+            })
+            if len(results) >= k:
+                break
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.searches += 1
+            self.search_seconds += elapsed
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "questions": len(self.questions),
+                "index": "ivf" if self.ann is not None else "brute_force",
+                "build_seconds": round(self.build_seconds, 4),
+                "searches": self.searches,
+                "avg_search_ms": round(self.search_seconds / self.searches * 1000, 3) if self.searches else None,
+            }
@@ -0,0 +1,93 @@
+import json
+import re
+
+EMOTION_KEYS = ["积极", "消极", "中性"]
+
+# 大模型常见的非标准JSON写法 -> 修正方式
+_FULLWIDTH = str.maketrans({"“": '"', "”": '"', "：": ":", "，": ","})
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CODE_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+
+
+def _balanced_objects(text):
+    """按括号配对依次找出文本中的顶层{...}片段，忽略字符串内部的括号"""
+    depth = 0
+    start = None
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                yield text[start:i + 1]
+
+
+def _loads_lenient(fragment):
+    """先按标准JSON解析，失败后修正全角标点和多余逗号再试"""
+    for candidate in (fragment, _TRAILING_COMMA.sub(r"\1", fragment.translate(_FULLWIDTH))):
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+def extract_json(text):
+    """从大模型输出中提取第一个可解析的JSON对象，失败返回None"""
+    if not text:
+        return None
+    text = _CODE_FENCE.sub("", text)
+    for fragment in _balanced_objects(text):
+        data = _loads_lenient(fragment)
+        if isinstance(data, dict):
+            return data
+    # 回复中可能只有全角引号，括号配对时会把整段当作字符串，统一替换后再找一次
+    normalized = text.translate(_FULLWIDTH)
+    if normalized != text:
+        for fragment in _balanced_objects(normalized):
+            data = _loads_lenient(fragment)
+            if isinstance(data, dict):
+                return data
+    return None
+
+
+def _to_percent(value):
+    """将 30.5 / "30.5%" / 0.305 等形式统一为浮点数，无法解析返回None"""
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_emotion_result(data):
+    """从解析后的JSON中提取(情感分布, 具体情感)，情感分布无效时返回None"""
+    emotions = data.get("情感分布")
+    if not isinstance(emotions, dict):
+        # 兼容把情感类别直接放在顶层的格式
+        emotions = {key: data[key] for key in EMOTION_KEYS if key in data}
+    values = {key: _to_percent(emotions.get(key, 0)) for key in EMOTION_KEYS}
+    if any(v is None or v < 0 for v in values.values()):
+        return None
+    total = sum(values.values())
+    if total <= 0:
+        return None
+    # 按总和归一化，模型返回0~1的概率或总和不为100时同样适用
+    values = {key: v * 100.0 / total for key, v in values.items()}
+    specific = data.get("具体情感") or "未知"
+    return values, str(specific)
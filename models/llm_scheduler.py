@@ -0,0 +1,152 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+logger = logging.getLogger("llm_scheduler")
+
+
+class _Request:
+    __slots__ = ("prompt", "max_new_tokens", "future", "enqueued")
+
+    def __init__(self, prompt, max_new_tokens):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatchScheduler:
+    """大模型请求的动态微批调度器
+
+    多个线程（界面的WorkerThread、服务端的推理线程）同时调用submit时，请求先进入队列；
+    调度线程取出第一个请求后最多再等待max_wait_ms，把期间到达的请求凑成不超过max_batch
+    条的一批，一次左填充批量生成后把结果分别交还给各调用方。只有max_new_tokens相同的请求
+    才会合并（情感分析和回复生成的长度上限不同），其余请求留在队列中等下一批。
+
+    run_batch: 函数 (提示词列表, max_new_tokens) -> 回复列表
+    """
+
+    def __init__(self, run_batch, max_batch=8, max_wait_ms=10):
+        self.run_batch = run_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        # 统计
+        self.requests = 0
+        self.batches = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = {}  # 批大小 -> 次数
+        self._wait_total = 0.0
+
+    def submit(self, prompt, max_new_tokens=512, timeout=None):
+        """提交一条单轮对话并阻塞等待回复"""
+        return self.submit_async(prompt, max_new_tokens).result(timeout)
+
+    def submit_async(self, prompt, max_new_tokens=512):
+        """提交一条单轮对话，返回concurrent.futures.Future"""
+        request = _Request(prompt, max_new_tokens)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("调度器已关闭")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="llm-scheduler", daemon=True)
+                self._thread.start()
+            self._queue.append(request)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            self._cond.notify()
+        return request.future
+
+    def close(self):
+        """停止调度线程，队列中尚未执行的请求以异常结束"""
+        with self._cond:
+            self._closed = True
+            pending = list(self._queue)
+            self._queue.clear()
+            self._cond.notify_all()
+        for request in pending:
+            request.future.set_exception(RuntimeError("调度器已关闭"))
+        if self._thread is not None:
+            self._thread.join()
+
+    def _next_batch(self):
+        """等待第一个请求，再在max_wait内收集同长度上限的请求，返回一批请求（关闭时返回None）"""
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            deadline = time.perf_counter() + self.max_wait
+            key = self._queue[0].max_new_tokens
+            while True:
+                matching = sum(1 for r in self._queue if r.max_new_tokens == key)
+                remaining = deadline - time.perf_counter()
+                if matching >= self.max_batch or remaining <= 0 or self._closed:
+                    break
+                self._cond.wait(remaining)
+
+            batch, rest = [], deque()
+            while self._queue:
+                request = self._queue.popleft()
+                if request.max_new_tokens == key and len(batch) < self.max_batch:
+                    batch.append(request)
+                else:
+                    rest.append(request)
+            self._queue = rest
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            # 调用方可能已经取消（例如等待超时）
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                outputs = self.run_batch([r.prompt for r in batch], batch[0].max_new_tokens)
+            except Exception as e:
+                logger.error(f"批量生成出错: {str(e)}")
+                with self._cond:
+                    self.failed += len(batch)
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            for request, output in zip(batch, outputs):
+                request.future.set_result(output)
+            self._record(batch, start)
+
+    def _record(self, batch, start):
+        with self._cond:
+            self.requests += len(batch)
+            self.batches += 1
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            self._wait_total += sum(start - r.enqueued for r in batch)
+        logger.info(f"批量生成 {len(batch)} 条，耗时 {time.perf_counter() - start:.2f}s")
+
+    @property
+    def queue_depth(self):
+        with self._cond:
+            return len(self._queue)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "requests": self.requests,
+                "batches": self.batches,
+                "failed": self.failed,
+                "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "avg_wait_ms": round(self._wait_total / self.requests * 1000, 2) if self.requests else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            }
@@ -0,0 +1,71 @@
+import time
+import threading
+import logging
+
+from utils.metrics import metrics
+
+logger = logging.getLogger("model_loader")
+
+
+class LazyModel:
+    """延迟加载的模型容器：首次使用时加载，可在后台线程中预热"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._model = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self.load_time = None  # 加载耗时（秒），未加载时为None
+
+    def ready(self):
+        """模型是否已加载成功"""
+        return self._ready.is_set() and self._error is None
+
+    def failed(self):
+        """模型是否加载失败"""
+        return self._error is not None
+
+    def wait(self, timeout=None):
+        """等待模型加载完成，超时返回False"""
+        if not self._ready.wait(timeout):
+            return False
+        return self._error is None
+
+    def get(self):
+        """获取模型，未加载时在当前线程中同步加载"""
+        if not self._ready.is_set():
+            self._load()
+        if self._error is not None:
+            raise RuntimeError(f"{self.name}模型加载失败: {self._error}") from self._error
+        return self._model
+
+    def warmup(self):
+        """在后台线程中加载模型，立即返回"""
+        with self._lock:
+            if self._ready.is_set() or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._load, name=f"warmup-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        # 加锁保证同一模型只加载一次，其他调用方阻塞等待结果
+        with self._lock:
+            if self._ready.is_set():
+                return
+            logger.info(f"加载{self.name}模型...")
+            start = time.perf_counter()
+            try:
+                self._model = self._loader()
+                self.load_time = time.perf_counter() - start
+                metrics.model_load_seconds.set(self.load_time, model=self.name)
+                logger.info(f"{self.name}模型加载完成，耗时 {self.load_time:.2f}s")
+            except Exception as e:
+                self.load_time = time.perf_counter() - start
+                self._error = e
+                metrics.model_load_failures.inc(model=self.name)
+                logger.error(f"{self.name}模型加载失败: {str(e)}")
+            finally:
+                self._ready.set()
@@ -1,21 +1,115 @@
 import os
-import torch
+import time
+import threading
 import numpy as np
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import whisper
+import wave
 import logging
-# 导入FunASR
-from funasr import AutoModel
+from concurrent.futures import ThreadPoolExecutor
+from models.model_loader import LazyModel
+from models.backends import build_loader
+from models.registry import MODEL_LOADERS, parse_standins, standin_loader
+from models.emotion_lexicon import LexiconEmotionClassifier
+from models.emotion_analyzer import EmotionAnalyzer, AUDIO_EMOTION_LABELS, DEFAULT_AUDIO_SCORES, DEFAULT_AUDIO_EMOTIONS
+from models.knowledge_base import KnowledgeBase
+from models.intent_classifier import IntentClassifier
+from models.response_generator import compose_answer, intent_reply
+from models.llm_output import extract_json, parse_emotion_result
+from models.batch_inference import (
+    bucket_by_length, batch_transcribe, batch_emotion2vec_scores, windowed_emotion2vec_scores
+)
+from models.qwen_utils import DEFAULT_SYSTEM, batch_chat, build_chat_prompt
+from models.streaming_asr import StreamingRecognizer
+from models.session import SessionRegistry, TurnContext
+from models.llm_scheduler import MicroBatchScheduler
+from models.conversation_memory import KVCachePool
+from utils.cache import TTLCache, normalize_text, emotion_bucket
+from utils.audio_data import AudioData
+from utils.text_stream import IncrementalConverter
+from utils.metrics import metrics, debug_print
+from utils import config
 
 # 设置日志
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=config.LOG_LEVEL)
 logger = logging.getLogger("model_manager")
 
+# 提示词模板的固定前缀，加载Qwen时预先计算其KV缓存，每次请求只需预填充客户相关的后缀
+EMOTION_PROMPT_PREFIX = """请分析文本的情感，只返回JSON格式的结果，包含以下情感类别的百分比(总和为100):
+积极、消极、中性
+
+同时分析出可能存在的具体情感，例如：高兴、愤怒、悲伤、厌恶、恐惧、惊讶等。
+
+JSON格式回答示例:
+{
+  "情感分布": {
+    "积极": 30.5,
+    "消极": 20.0,
+    "中性": 49.5
+  },
+  "主导情感": "中性",
+  "具体情感": "平静"
+}
+
+仅返回JSON格式，不要多余文字。需要分析的文本如下:
+"""
+
+RESPONSE_PROMPT_PREFIX = """请根据客户的情绪状态生成一段专业、有同理心的客服回复。
+表现出对客户情绪的理解，并提供专业、积极的帮助。使用简体中文回复。
+
+"""
+
+SINGLE_PASS_PROMPT_PREFIX = """请先分析客户的情感，再以客服身份回复。只返回JSON格式的结果，不要多余文字:
+{
+  "情感分布": {"积极": 百分比, "消极": 百分比, "中性": 百分比},
+  "具体情感": "高兴、愤怒、悲伤、厌恶、恐惧、惊讶、平静等中的一个",
+  "回复": "一段专业、有同理心的客服回复，表现出对客户情绪的理解，并提供专业、积极的帮助，使用简体中文"
+}
+
+"""
+
+SUMMARY_PROMPT_PREFIX = """请把下面的客服对话压缩成一段简短的摘要，保留客户的问题、诉求、情绪变化和客服已经给出的答复或承诺，不超过100字，只返回摘要。
+
+"""
+
+PROMPT_PREFIXES = [EMOTION_PROMPT_PREFIX, RESPONSE_PROMPT_PREFIX, SINGLE_PASS_PROMPT_PREFIX, SUMMARY_PROMPT_PREFIX]
+
 
 class ModelManager:
-    def __init__(self):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        logger.info(f"使用设备: {self.device}")
+    # 模型名称 -> 默认加载函数，按utils/config.py定位模型（见models/registry.py）
+    MODEL_LOADERS = MODEL_LOADERS
+
+    def __init__(self, lazy=True, warmup=False, loaders=None,
+                 fast_text_emotion=True, emotion_confidence_threshold=0.6,
+                 single_pass_text=False, cache_size=1024, cache_ttl=3600, cache_path=None,
+                 llm_batching=False, llm_max_batch=8, llm_max_wait_ms=10, prefix_cache=False,
+                 conversation_memory=True, memory_token_budget=1024, max_kv_sessions=4, backends=None, standins=None,
+                 speculative=None, knowledge_base=None, intents=None, intent_template_threshold=0.7, fusion=None):
+        """
+        lazy: 为True时模型在首次使用时才加载；为False时在构造函数中同步加载全部模型
+        warmup: 为True时立即在后台线程中并发预热全部模型
+        loaders: 可选，覆盖默认加载函数的字典 {模型名称: 无参加载函数}
+        fast_text_emotion: 为True时文本情感先由词典分类器判断，置信度不足才调用大模型
+        emotion_confidence_threshold: 词典分类器直接返回结果所需的最低置信度
+        single_pass_text: 为True时文本输入使用analyze_and_respond，一次生成同时得到情感和回复
+        cache_size / cache_ttl: 情感和回复缓存的最大条目数与过期时间（秒），cache_size为0时不缓存
+        cache_path: 可选的SQLite文件路径，缓存持久化后重启仍然有效
+        llm_batching: 为True时并发的非流式大模型请求经微批调度器合并成批量生成；
+            批量生成不带会话历史，开启后conversation_memory不生效（构造时会输出警告）
+        llm_max_batch / llm_max_wait_ms: 每批最多请求数，以及凑批时最多等待的毫秒数
+        prefix_cache: 为True时加载Qwen后预先计算提示词固定前缀的KV缓存，生成时只预填充后缀；
+            命中前缀的提示词改用贪心解码，不再使用chat()的采样参数，输出与默认生成不同，因此默认关闭
+        conversation_memory: 为True时回复生成带上所属会话的历史（超出预算的早期对话压缩为摘要），
+            与llm_batching同时开启时不生效
+        memory_token_budget: 每个会话的历史和摘要最多占用的token数
+        max_kv_sessions: 最多为多少个最近活跃的会话保留跨轮复用的KV缓存
+        backends: 可选，覆盖utils/config.py中推理后端的字典 {模型名称: "fp32"/"int8"/"ctranslate2"}
+        standins: 可选，使用替身模型的配置，如 "all" 或 {"qwen": "tiny"}，缺省时取utils/config.py中的STANDIN_MODELS
+        speculative: 可选，推测解码的草稿（"ngram"或小模型ID/路径，""为不使用），缺省时取utils/config.py中的SPECULATIVE_DRAFT
+        knowledge_base: 可选，FAQ知识库文件路径或KnowledgeBase对象（""为不使用），缺省时取utils/config.py中的KNOWLEDGE_BASE_PATH
+        intents: 可选，意图标注文件路径或已训练的IntentClassifier（""为不做意图识别），缺省时取utils/config.py中的INTENT_DATA_PATH
+        intent_template_threshold: 简单意图直接用模板回复所需的最低意图置信度，高于分类器判定意图的阈值，
+            置信度不足时仍记录意图，但回复交给知识库或大模型
+        fusion: 可选，多模态融合的EmotionAnalyzer或融合权重文件路径，缺省时取utils/config.py中的融合配置
+        """
 
         # 初始化简繁转换器
         try:
@@ -27,54 +121,239 @@ class ModelManager:
             logger.warning("未安装opencc，无法进行繁体到简体的转换")
             self.has_converter = False
 
-        # 初始化模型
-        self._init_models()
-
-    def _init_models(self):
-        try:
-            # 1. 加载Whisper模型
-            logger.info("加载Whisper模型...")
-            self.whisper_model = whisper.load_model("small")
-            logger.info("Whisper模型加载完成")
-
-            # 2. 加载emotion2vec模型（使用FunASR）
-            logger.info("加载emotion2vec情感分析模型...")
-            self.emotion_model = AutoModel(
-                model="iic/emotion2vec_plus_base",  # 使用官方支持的模型ID
-                hub="hf"  # 国内用户可以使用"ms"或"modelscope"，海外用户使用"hf"或"huggingface"
-            )
-            logger.info("情感分析模型加载完成")
-
-            # 3. 加载Qwen模型
-            logger.info("加载Qwen模型...")
-            model_name = "Qwen/Qwen-1_8B-Chat"
-            self.qwen_tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
-            self.qwen_model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                device_map="auto",
-                trust_remote_code=True
+        # 分级文本情感分析
+        self.text_classifier = LexiconEmotionClassifier()
+        self.fast_text_emotion = fast_text_emotion
+        self.emotion_confidence_threshold = emotion_confidence_threshold
+        self.emotion_route_counts = {"fast": 0, "escalated": 0}
+        self.single_pass_text = single_pass_text
+
+        # 多模态情感融合和emotion2vec分数映射
+        self.emotion_analyzer = self._load_emotion_analyzer(fusion)
+
+        # 情感分析和回复缓存，键为归一化后的客户文本
+        self.emotion_cache = TTLCache(cache_size, cache_ttl, cache_path, namespace="emotion")
+        self.response_cache = TTLCache(cache_size, cache_ttl, cache_path, namespace="response")
+        self._stats_lock = threading.Lock()
+
+        # 会话表：每个会话的对话历史和每轮情感上下文，ModelManager本身不保存对话状态
+        self.sessions = SessionRegistry(memory_budget=memory_token_budget)
+        self.conversation_memory = conversation_memory
+        self._kv_pool = KVCachePool(max_kv_sessions)
+
+        # FAQ知识库：高相似度的问题直接用模板答案回复，其余把相关问答放进提示词
+        self.knowledge_base = self._load_knowledge_base(
+            config.KNOWLEDGE_BASE_PATH if knowledge_base is None else knowledge_base
+        )
+        self.kb_route_counts = {"answered": 0, "context": 0, "miss": 0}
+
+        # 意图识别：问候、感谢等简单意图直接用模板回复，分类器在首次使用时训练
+        self._intent_source = config.INTENT_DATA_PATH if intents is None else intents
+        self._intent_classifier = None
+        self._intent_lock = threading.Lock()
+        self.intent_cache = TTLCache(cache_size, cache_ttl, cache_path, namespace="intent")
+        self.intent_template_threshold = intent_template_threshold
+        self.intent_counts = {}
+        self.template_replies = 0
+
+        # 大模型请求微批调度，多个会话同时请求时合并为一次批量生成
+        self.llm_scheduler = None
+        if llm_batching:
+            self.llm_scheduler = MicroBatchScheduler(
+                self._batch_chat,
+                max_batch=llm_max_batch,
+                max_wait_ms=llm_max_wait_ms
             )
-            logger.info("Qwen模型加载完成")
+            if conversation_memory:
+                # 批量生成的请求不带会话历史，两者同时开启时对话记忆不生效
+                logger.warning("已启用大模型微批调度，多轮对话记忆（历史、摘要和跨轮KV缓存复用）不会生效")
+
+        # 语音流水线线程池
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        # 增量解码器和提示词前缀KV缓存，在Qwen加载完成时创建
+        self.use_prefix_cache = prefix_cache
+        self.prefix_cache = None
+        self.kv_decoder = None
+        self.speculative = config.SPECULATIVE_DRAFT if speculative is None else speculative
+
+        # 推理后端，active_backends记录加载后实际使用的后端
+        self.backends = {
+            "whisper": config.WHISPER_BACKEND,
+            "emotion": config.EMOTION_BACKEND,
+            "qwen": config.QWEN_BACKEND,
+        }
+        self.backends.update(backends or {})
+        self.active_backends = {}
+        self.standins = parse_standins(config.STANDIN_MODELS if standins is None else standins)
 
-        except Exception as e:
-            logger.error(f"模型加载失败: {str(e)}")
-            raise
+        # 缓存命中、分析路径等现成统计在导出指标时读取
+        metrics.add_collector(self._collect_metrics)
 
-    def recognize_speech(self, audio_path):
-        """使用Whisper识别语音"""
-        logger.info(f"识别音频: {audio_path}")
+        # 初始化模型
+        self._init_models(loaders)
+
+        if warmup:
+            self.warmup()
+        elif not lazy:
+            for name in self._models:
+                self._models[name].get()
+
+    def _init_models(self, loaders=None):
+        # 仅登记加载函数，实际加载推迟到首次使用或预热
+        merged = {
+            name: build_loader(
+                name, self.backends.get(name, "fp32"), loader,
+                whisper_size=config.WHISPER_MODEL_SIZE, report=self.active_backends
+            )
+            for name, loader in self.MODEL_LOADERS.items()
+        }
+        # 替身模型和外部传入的加载函数不经过后端选择
+        for name, kind in self.standins.items():
+            merged[name] = standin_loader(name, kind)
+            self.active_backends[name] = f"standin-{kind}"
+            logger.info(f"{name}模型使用替身: {kind}")
+        if loaders:
+            merged.update(loaders)
+        merged["qwen"] = self._with_kv_cache(merged["qwen"])
+        self._models = {name: LazyModel(name, loader) for name, loader in merged.items()}
+
+    def _with_kv_cache(self, loader):
+        """包装Qwen加载函数：模型加载完成后创建增量解码器，并预填充各提示词模板的固定前缀"""
+        def load():
+            model, tokenizer = loader()
+            if not hasattr(model, "parameters"):
+                # 规则替身等非torch模型不需要KV缓存，也不必导入torch
+                return model, tokenizer
+            from models.prefix_cache import KVDecoder, PrefixKVCache
+            if PrefixKVCache.supported(model):
+                try:
+                    self.kv_decoder = KVDecoder(model, tokenizer, draft=self._load_draft(tokenizer))
+                    if self.use_prefix_cache:
+                        self.prefix_cache = PrefixKVCache(
+                            model, tokenizer, PROMPT_PREFIXES, decoder=self.kv_decoder
+                        )
+                except Exception as e:
+                    logger.warning(f"KV缓存创建失败，使用普通生成: {str(e)}")
+                    metrics.fallback("kv_cache_init_error", error=str(e))
+            return model, tokenizer
+        return load
+
+    def _load_draft(self, tokenizer):
+        """创建推测解码的草稿，失败时不使用推测解码"""
+        if not self.speculative:
+            return None
+        from models.speculative import build_draft
+        try:
+            draft = build_draft(self.speculative, tokenizer)
+        except Exception as e:
+            logger.warning(f"草稿模型加载失败，不使用推测解码: {str(e)}")
+            draft = None
+        if draft is None:
+            metrics.fallback("speculative_draft_unavailable", draft=self.speculative)
+        else:
+            logger.info(f"已启用推测解码，草稿: {self.speculative}")
+        return draft
+
+    def _speculative(self):
+        """已启用推测解码时，不匹配前缀缓存的提示词也经增量解码器生成"""
+        return self.kv_decoder is not None and self.kv_decoder.draft is not None
+
+    def _decode_stream(self, prompt, max_new_tokens=512):
+        ids = self.qwen_tokenizer.encode(build_chat_prompt(prompt))
+        return self.kv_decoder.stream(ids, max_new_tokens=max_new_tokens)
+
+    def warmup(self, names=None):
+        """在后台线程中并发加载模型，names为None时预热全部模型"""
+        for name in (names or self._models):
+            self._models[name].warmup()
+
+    def ready(self, name):
+        """指定模型是否已可用"""
+        return self._models[name].ready()
+
+    def wait(self, name, timeout=None):
+        """阻塞等待指定模型加载完成，超时或加载失败返回False"""
+        return self._models[name].wait(timeout)
+
+    @property
+    def device(self):
+        import torch
+        return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    @property
+    def load_timings(self):
+        """各模型加载耗时（秒），未加载的模型为None"""
+        return {name: model.load_time for name, model in self._models.items()}
+
+    @property
+    def whisper_model(self):
+        return self._models["whisper"].get()
+
+    @property
+    def emotion_model(self):
+        return self._models["emotion"].get()
+
+    @property
+    def qwen_model(self):
+        return self._models["qwen"].get()[0]
+
+    @property
+    def qwen_tokenizer(self):
+        return self._models["qwen"].get()[1]
+
+    @staticmethod
+    def _load_audio(audio):
+        """将音频输入统一为AudioData；WAV文件在进程内解码，其他格式保留路径交给ffmpeg"""
+        if isinstance(audio, AudioData):
+            return audio
+        if audio.lower().endswith(".wav"):
+            try:
+                return AudioData.from_file(audio)
+            except (wave.Error, ValueError) as e:
+                logger.warning(f"无法直接解码WAV文件，交由模型读取: {str(e)}")
+        return audio
+
+    def _to_simplified(self, text, turn=None):
+        """繁体转简体，耗时累计到turn.timings["t2s"]"""
+        if not self.has_converter:
+            return text
+        start = time.perf_counter()
+        text = self.converter.convert(text)
+        self._record_t2s(time.perf_counter() - start, turn)
+        return text
+
+    @staticmethod
+    def _record_t2s(seconds, turn=None):
+        metrics.stage_seconds.observe(seconds, stage="t2s")
+        if turn is not None:
+            turn.timings["t2s"] = turn.timings.get("t2s", 0.0) + seconds
+
+    @metrics.traced("asr")
+    def recognize_speech(self, audio, turn=None):
+        """使用Whisper识别语音，audio可以是文件路径或AudioData"""
+        logger.debug(f"识别音频: {audio}")
 
         # 检查文件是否存在
-        if not os.path.exists(audio_path):
-            error_msg = f"音频文件不存在: {audio_path}"
+        if not isinstance(audio, AudioData) and not os.path.exists(audio):
+            error_msg = f"音频文件不存在: {audio}"
             logger.error(error_msg)
-            print(f"错误: {error_msg}")
+            metrics.fallback("asr_missing_file")
+            debug_print(f"错误: {error_msg}")
             return "【语音识别失败：未找到录音文件】"
 
         try:
+            audio = self._load_audio(audio)
+            if isinstance(audio, AudioData):
+                # Whisper直接接受16kHz的float32波形，无需ffmpeg解码
+                audio_input = audio.resample(16000).samples
+            else:
+                audio_input = audio
+
             # 明确指定language="zh"，确保使用中文识别
             result = self.whisper_model.transcribe(
-                audio_path,
+                audio_input,
                 language="zh",  # 指定语言为中文
                 task="transcribe",  # 指定任务为转写
                 initial_prompt="以下是简体中文的语音识别。"  # 添加引导提示，偏向简体输出
@@ -83,252 +362,451 @@ class ModelManager:
             text = result["text"]
 
             # 繁体转简体
-            if self.has_converter:
-                text = self.converter.convert(text)
+            text = self._to_simplified(text, turn)
 
-            logger.info(f"识别结果: {text}")
+            logger.debug(f"识别结果: {text}")
             return text
         except Exception as e:
             error_msg = f"语音识别出错: {str(e)}"
             logger.error(error_msg)
+            metrics.fallback("asr_error", error=str(e))
             return f"【语音识别失败：{str(e)}】"
 
-    # 新增方法：使用大模型分析文本情感
-    def analyze_text_with_llm(self, text):
-        """使用大模型进行文本情感分析"""
+    def _chat(self, prompt, max_new_tokens=512):
+        """单轮对话，启用微批调度时与其他会话的请求合并生成，否则尽量复用提示词前缀缓存"""
+        if self.llm_scheduler is not None:
+            return self.llm_scheduler.submit(prompt, max_new_tokens)
+        # 先取模型：首次访问会加载Qwen，前缀缓存随之创建
+        model = self.qwen_model
+        if self.prefix_cache is not None and self.prefix_cache.match(prompt) is not None:
+            try:
+                return self.prefix_cache.generate(prompt, max_new_tokens)
+            except Exception as e:
+                logger.warning(f"前缀缓存生成出错，改用普通生成: {str(e)}")
+                metrics.fallback("prefix_cache_error", error=str(e))
+        if self._speculative():
+            response = ""
+            for response in self._decode_stream(prompt, max_new_tokens):
+                pass
+            return response
+        response, _ = model.chat(self.qwen_tokenizer, prompt, history=None)
+        return response
+
+    def _batch_chat(self, prompts, max_new_tokens=512):
+        """批量单轮对话；模型不是torch模型（如规则替身）或批量生成出错时逐条调用chat"""
+        model = self.qwen_model
+        if hasattr(model, "parameters") and hasattr(model, "generate"):
+            try:
+                return batch_chat(model, self.qwen_tokenizer, prompts, max_new_tokens=max_new_tokens)
+            except Exception as e:
+                logger.warning(f"批量生成出错，改为逐条生成: {str(e)}")
+                metrics.fallback("llm_batch_error", error=str(e))
+        return [model.chat(self.qwen_tokenizer, prompt, history=None)[0] for prompt in prompts]
+
+    def _chat_stream(self, prompt):
+        """流式单轮对话，产出截至当前的完整回复"""
+        # 先取模型：首次访问会加载Qwen，前缀缓存随之创建
+        model = self.qwen_model
+        if self.prefix_cache is not None and self.prefix_cache.match(prompt) is not None:
+            return self.prefix_cache.generate_stream(prompt)
+        if self._speculative():
+            return self._decode_stream(prompt)
+        return model.chat_stream(self.qwen_tokenizer, prompt, history=None)
+
+    # 多轮对话记忆
+    def _memory_of(self, turn):
+        """本轮使用的对话记忆；未启用多轮记忆、启用微批调度或没有所属会话时返回None"""
+        if not self.conversation_memory or self.llm_scheduler is not None or turn is None:
+            return None
+        return turn.memory
+
+    def _count_tokens(self, text):
+        tokenizer = self.qwen_tokenizer
+        if hasattr(tokenizer, "encode"):
+            return len(tokenizer.encode(text))
+        return len(text)
+
+    @staticmethod
+    def _split_instructions(prompt):
+        """把提示词拆成(固定说明, 本轮消息)，多轮对话时固定说明放在system中，历史只保留消息部分"""
+        for prefix in PROMPT_PREFIXES:
+            if prompt.startswith(prefix):
+                return prefix.strip(), prompt[len(prefix):]
+        return "", prompt
+
+    @staticmethod
+    def _memory_system(instructions, summary):
+        parts = [DEFAULT_SYSTEM]
+        if instructions:
+            parts.append(instructions)
+        if summary:
+            parts.append(f"此前对话摘要: {summary}")
+        return "\n\n".join(parts)
+
+    def _remember(self, memory, prompt, reply, text):
+        """把一轮对话加入记忆"""
+        _, message = self._split_instructions(prompt)
+        with memory.lock:
+            memory.add_turn(message, reply, self._count_tokens(message) + self._count_tokens(reply), text)
+
+    def _summarize(self, previous, turns):
+        """把被挤出预算的早期对话压缩进摘要，大模型失败时保留客户原话"""
+        dialogue = "\n".join(f"客户: {turn['text']}\n客服: {turn['reply']}" for turn in turns)
+        prompt = SUMMARY_PROMPT_PREFIX + (f"已有摘要: {previous}\n" if previous else "") + f"新的对话:\n{dialogue}"
         try:
-            print("\n==== 大模型文本情感分析 ====")
-            print(f"输入文本: {text}")
-
-            # 构建提示词，让大模型进行情感分析
-            prompt = f"""请分析以下文本的情感，只返回JSON格式的结果，包含以下情感类别的百分比(总和为100):
-积极、消极、中性
+            summary = self._chat(prompt, max_new_tokens=128).strip()
+            if summary:
+                return summary
+        except Exception as e:
+            logger.warning(f"对话摘要生成出错: {str(e)}")
+        metrics.fallback("summary_extractive")
+        parts = ([previous] if previous else []) + [turn["text"] for turn in turns]
+        return "；".join(parts)
+
+    def _compact_memory(self, memory):
+        """历史超出token预算时，把最早的若干轮压缩进摘要"""
+        evicted = memory.take_overflow()
+        if not evicted:
+            return
+        summary = self._summarize(memory.summary, evicted)
+        tokens = self._count_tokens(summary)
+        if tokens > memory.summary_limit:
+            summary = summary[:max(1, len(summary) * memory.summary_limit // tokens)]
+            tokens = self._count_tokens(summary)
+        memory.set_summary(summary, tokens)
+        logger.info(f"压缩了 {len(evicted)} 轮早期对话，摘要 {tokens} 个token，当前历史 {memory.token_count} 个token")
+
+    def _memory_chat_stream(self, prompt, memory, text=None, max_new_tokens=512, record=True):
+        """带会话历史的流式对话，产出截至当前的完整回复
+
+        直接使用前向计算时，上一轮生成结束后的KV缓存与本轮的token序列取公共前缀，
+        只预填充新增的部分（上一轮回复之后的新消息）；历史被压缩时重新预填充一次。
+        record为False时不把本轮加入记忆，由调用方解析输出后自行记录。
+        """
+        instructions, message = self._split_instructions(prompt)
+        model, tokenizer = self.qwen_model, self.qwen_tokenizer
+        with memory.lock:
+            self._compact_memory(memory)
+            summary, history = memory.context()
+            system = self._memory_system(instructions, summary)
+            if self.kv_decoder is None:
+                # 替身模型等不支持直接前向计算时交给chat处理历史
+                reply, _ = model.chat(tokenizer, message, history=history, system=system)
+                yield reply
+            else:
+                ids = tokenizer.encode(build_chat_prompt(message, history, system))
+                past, reused = memory.reuse(ids)
+                if past is not None:
+                    past = self.kv_decoder.crop_past(past, reused, len(memory.kv_ids), self.kv_decoder.seq_dim)
+                # 生成过程会改动缓存，完成后再保存新的缓存
+                memory.drop_kv()
+                result = {}
+                reply = ""
+                for reply in self.kv_decoder.stream(
+                    ids[reused:], past, reused, max_new_tokens, result, context=ids[:reused]
+                ):
+                    yield reply
+                memory.store_kv(ids + result["generated"], result["past"])
+                self._kv_pool.touch(memory)
+                logger.debug(
+                    f"多轮对话: 历史 {len(history)} 轮，复用 {reused} 个token，"
+                    f"预填充 {len(ids) - reused} 个token，耗时 {result['prefill_seconds']:.3f}s"
+                )
+            if record:
+                memory.add_turn(message, reply, self._count_tokens(message) + self._count_tokens(reply), text)
+
+    @staticmethod
+    def _build_emotion_prompt(text):
+        """构建让大模型返回情感分析JSON的提示词（固定说明在前，便于复用前缀缓存）"""
+        return EMOTION_PROMPT_PREFIX + f'文本: "{text}"'
+
+    def create_stream_recognizer(self, **kwargs):
+        """创建流式识别器，边录音边输出部分和最终转写，参数见StreamingRecognizer"""
+        def transcribe(samples):
+            return self.recognize_speech(AudioData(samples, 16000))
+        return StreamingRecognizer(transcribe, sample_rate=16000, **kwargs)
 
-同时分析出可能存在的具体情感，例如：高兴、愤怒、悲伤、厌恶、恐惧、惊讶等。
-文本: "{text}"
+    # 新增方法：使用大模型分析文本情感
+    @metrics.traced("llm_text_emotion")
+    def analyze_text_with_llm(self, text, turn=None):
+        """使用大模型进行文本情感分析，具体情感记录在turn中"""
+        try:
+            debug_print("\n==== 大模型文本情感分析 ====")
+            debug_print(f"输入文本: {text}")
 
-JSON格式回答示例:
-{{
-  "情感分布": {{
-    "积极": 30.5,
-    "消极": 20.0,
-    "中性": 49.5
-  }},
-  "主导情感": "中性",
-  "具体情感": "平静"
-}}
+            cache_key = self._normalize(text)
+            cached = self.emotion_cache.get(cache_key)
+            if cached is not None:
+                debug_print("命中情感分析缓存")
+                self._record_text_emotion(cached["distribution"], cached["specific"], turn)
+                return cached["distribution"]
 
-仅返回JSON格式，不要多余文字。"""
+            # 构建提示词，让大模型进行情感分析
+            prompt = self._build_emotion_prompt(text)
 
             # 使用大模型分析
-            response, _ = self.qwen_model.chat(self.qwen_tokenizer, prompt, history=None)
-            print(f"大模型情感分析原始返回: {response}")
+            response = self._chat(prompt, max_new_tokens=128)
+            debug_print(f"大模型情感分析原始返回: {response}")
 
             # 解析JSON结果
-            import json
-            import re
-
-            # 提取JSON部分
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                emotions_data = json.loads(json_str)
-
-                # 提取情感分布
-                emotions = emotions_data.get("情感分布", {})
-                if not emotions:  # 兼容可能的不同JSON格式
-                    emotions = {
-                        "积极": emotions_data.get("积极", 0),
-                        "消极": emotions_data.get("消极", 0),
-                        "中性": emotions_data.get("中性", 0)
-                    }
-
-                # 确保有主要情感类别
-                for key in ["积极", "消极", "中性"]:
-                    if key not in emotions:
-                        emotions[key] = 0
-
-                # 提取具体情感
-                specific_emotion = emotions_data.get("具体情感", "未知")
-
-                # 打印分析结果
-                print("情感分析结果:")
-                print(f"积极: {emotions['积极']:.2f}%")
-                print(f"消极: {emotions['消极']:.2f}%")
-                print(f"中性: {emotions['中性']:.2f}%")
-                print(f"主导情感: {max(emotions, key=emotions.get)}")
-                print(f"具体情感: {specific_emotion}")
-
-                # 记录具体情感以便后续使用
-                self.last_text_emotions = {
-                    "distribution": emotions,
-                    "specific": specific_emotion
-                }
-
+            emotions_data = extract_json(response)
+            parsed = parse_emotion_result(emotions_data) if emotions_data else None
+            if parsed:
+                emotions, specific_emotion = parsed
+                self._record_text_emotion(emotions, specific_emotion, turn)
+                self.emotion_cache.set(cache_key, {"distribution": emotions, "specific": specific_emotion})
                 return emotions
             else:
-                print("无法解析大模型返回的情感分析结果，使用备用方法")
+                debug_print("无法解析大模型返回的情感分析结果，使用备用方法")
+                metrics.fallback("llm_emotion_unparsable")
                 # 使用备用方法
-                return self._analyze_emotion_fallback(text)
+                return self._analyze_emotion_fallback(text, turn)
 
         except Exception as e:
-            print(f"大模型情感分析出错: {str(e)}")
-            print("使用备用情感分析方法")
+            debug_print(f"大模型情感分析出错: {str(e)}")
+            metrics.fallback("llm_emotion_error", error=str(e))
+            debug_print("使用备用情感分析方法")
             # 使用备用方法
-            return self._analyze_emotion_fallback(text)
+            return self._analyze_emotion_fallback(text, turn)
+
+    def _record_text_emotion(self, emotions, specific_emotion, turn=None):
+        """打印文本情感分析结果，并把具体情感记录到turn中以便生成回复时使用"""
+        debug_print("情感分析结果:")
+        debug_print(f"积极: {emotions['积极']:.2f}%")
+        debug_print(f"消极: {emotions['消极']:.2f}%")
+        debug_print(f"中性: {emotions['中性']:.2f}%")
+        debug_print(f"主导情感: {max(emotions, key=emotions.get)}")
+        debug_print(f"具体情感: {specific_emotion}")
+
+        if turn is not None:
+            turn.text_emotions = {
+                "distribution": emotions,
+                "specific": specific_emotion
+            }
 
-    # 修改原来的方法为备用方法
-    def _analyze_emotion_fallback(self, text):
-        """基于规则的文本情感分析（作为备用）"""
-        # 情感词典
-        positive_words = ["满意", "喜欢", "感谢", "好", "优秀", "快", "棒", "赞", "方便", "效率",
-                          "不错", "可以", "很好", "帮助", "满足", "高兴"]
-        negative_words = ["不满", "差", "慢", "退款", "投诉", "不行", "垃圾", "骗", "失望", "麻烦",
-                          "问题", "错误", "难用", "糟糕", "生气", "恼火"]
+    @metrics.traced("single_pass")
+    def analyze_and_respond(self, text, turn=None):
+        """单次生成同时得到文本情感和客服回复
+
+        词典分类器有把握时只需一次回复生成；否则让大模型在一次生成中输出
+        情感分布和回复，解析失败时退回"情感分析 + 生成回复"两次调用。
+        返回 (情感分布, 回复)
+        """
+        turn = turn if turn is not None else TurnContext()
+        memory = self._memory_of(turn)
+        # 已有对话历史时单次生成同样带上历史，回复依赖上下文因此不写回复缓存
+        history = memory is not None and not memory.empty
+        emotions = self._fast_text_emotion(text, turn)
+        if emotions is None:
+            # 情感已有缓存时无需单次生成，回复同样可能命中缓存
+            cached = self.emotion_cache.get(self._normalize(text))
+            if cached is not None:
+                self._record_text_emotion(cached["distribution"], cached["specific"], turn)
+                emotions = cached["distribution"]
+        if emotions is None and self._can_answer_directly(text, turn):
+            # 模板或知识库可以直接回答时大模型只需分析情感
+            emotions = self.analyze_text_with_llm(text, turn)
+        if emotions is not None:
+            return emotions, self.generate_response(text, emotions, turn)
+
+        debug_print("\n==== 大模型情感分析与回复（单次生成） ====")
+        debug_print(f"输入文本: {text}")
+        prompt = SINGLE_PASS_PROMPT_PREFIX + f'客户说: "{text}"'
+        try:
+            if history:
+                # 固定说明放在system中，历史复用会话的KV缓存；记忆中记录解析出的回复而不是JSON
+                output = ""
+                for output in self._memory_chat_stream(prompt, memory, text, record=False):
+                    pass
+            else:
+                output = self._chat(prompt)
+            debug_print(f"大模型原始返回: {output}")
+            data = extract_json(output)
+            parsed = parse_emotion_result(data) if data else None
+            reply = data.get("回复") if data else None
+            if parsed and isinstance(reply, str) and reply.strip():
+                emotions, specific_emotion = parsed
+                self._record_text_emotion(emotions, specific_emotion, turn)
+                reply = self._to_simplified(reply, turn).strip()
+                self.emotion_cache.set(self._normalize(text), {"distribution": emotions, "specific": specific_emotion})
+                if not history:
+                    self.response_cache.set(self._response_cache_key(text, emotions, turn), reply)
+                if memory is not None:
+                    self._remember(memory, self._build_response_prompt(text, emotions, turn), reply, text)
+                logger.debug(f"生成的回复: {reply}")
+                return emotions, reply
+            debug_print("无法解析单次生成的结果，改为分别分析情感和生成回复")
+            metrics.fallback("single_pass_unparsable")
+        except Exception as e:
+            logger.error(f"单次生成出错: {str(e)}")
+            metrics.fallback("single_pass_error", error=str(e))
 
-        # 计算积极和消极词的出现次数
-        positive_matches = [word for word in positive_words if word in text]
-        negative_matches = [word for word in negative_words if word in text]
+        emotions = self.analyze_text_with_llm(text, turn)
+        return emotions, self.generate_response(text, emotions, turn)
 
-        positive_count = len(positive_matches)
-        negative_count = len(negative_matches)
+    # 修改原来的方法为备用方法
+    def _analyze_emotion_fallback(self, text, turn=None):
+        """基于规则的文本情感分析（作为备用）"""
+        result = self.text_classifier.predict(text)
+        emotions = result["distribution"]
+        if turn is not None:
+            turn.text_emotions = {"distribution": emotions, "specific": result["specific"]}
 
         # 打印匹配到的情感词
-        print("\n==== 备用文本情感分析 ====")
-        print(f"输入文本: {text}")
-        print(f"识别到的积极词: {positive_matches if positive_matches else '无'}")
-        print(f"识别到的消极词: {negative_matches if negative_matches else '无'}")
-
-        # 计算情感得分
-        if positive_count == 0 and negative_count == 0:
-            # 没有明显情感词，默认中性占主导
-            emotions = {
-                "积极": 20.0,
-                "消极": 20.0,
-                "中性": 60.0
-            }
-            print("未检测到明显情感，使用默认中性情感")
-        else:
-            total = positive_count + negative_count
-            if total == 0:
-                total = 1  # 避免除以零
-
-            positive_score = (positive_count / total) * 80  # 最高80分
-            negative_score = (negative_count / total) * 80  # 最高80分
-            neutral_score = 100 - positive_score - negative_score
-
-            emotions = {
-                "积极": positive_score,
-                "消极": negative_score,
-                "中性": neutral_score
-            }
+        debug_print("\n==== 备用文本情感分析 ====")
+        debug_print(f"输入文本: {text}")
+        positive_matches = [word for word, weight, _ in result["hits"] if weight > 0]
+        negative_matches = [word for word, weight, _ in result["hits"] if weight < 0]
+        debug_print(f"识别到的积极词: {positive_matches if positive_matches else '无'}")
+        debug_print(f"识别到的消极词: {negative_matches if negative_matches else '无'}")
+        if not result["hits"]:
+            debug_print("未检测到明显情感，使用默认中性情感")
 
         # 打印情感分析结果
-        print("情感分析结果:")
-        print(f"积极: {emotions['积极']:.2f}%")
-        print(f"消极: {emotions['消极']:.2f}%")
-        print(f"中性: {emotions['中性']:.2f}%")
-        print(f"主导情感: {max(emotions, key=emotions.get)}")
-        print("====================\n")
+        debug_print("情感分析结果:")
+        debug_print(f"积极: {emotions['积极']:.2f}%")
+        debug_print(f"消极: {emotions['消极']:.2f}%")
+        debug_print(f"中性: {emotions['中性']:.2f}%")
+        debug_print(f"主导情感: {max(emotions, key=emotions.get)}")
+        debug_print("====================\n")
 
         return emotions
 
-    # 修改主要的analyze_emotion方法，调用大模型分析
-    def analyze_emotion(self, text):
-        """分析文本情感，使用大模型"""
-        logger.info(f"分析情感: {text}")
+    # 分级分析：词典分类器有把握时直接返回，否则交给大模型
+    @metrics.traced("text_emotion")
+    def analyze_emotion(self, text, turn=None):
+        """分析文本情感，快速分类器置信度不足时使用大模型；具体情感记录在turn中"""
+        logger.debug(f"分析情感: {text}")
+
+        emotions = self._fast_text_emotion(text, turn)
+        if emotions is not None:
+            return emotions
 
         # 使用大模型进行分析
-        emotions = self.analyze_text_with_llm(text)
+        emotions = self.analyze_text_with_llm(text, turn)
 
-        logger.info(f"情感分析结果: {emotions}")
+        logger.debug(f"情感分析结果: {emotions}")
         return emotions
 
-    def analyze_audio_emotion(self, audio_path):
-        """使用emotion2vec分析音频情感"""
+    def _fast_text_emotion(self, text, turn=None):
+        """词典分类器有把握时返回情感分布，否则返回None表示需要交给大模型"""
+        if not self.fast_text_emotion:
+            return None
+
+        result = self.text_classifier.predict(text)
+        if result["confidence"] >= self.emotion_confidence_threshold:
+            emotions = result["distribution"]
+            if turn is not None:
+                turn.text_emotions = {
+                    "distribution": emotions,
+                    "specific": result["specific"]
+                }
+            self._count_emotion_route("fast")
+            logger.debug(f"情感分析结果(词典, 置信度 {result['confidence']:.2f}): {emotions}")
+            return emotions
+
+        self._count_emotion_route("escalated")
+        logger.debug(
+            f"词典分类器置信度不足({result['confidence']:.2f})，交由大模型分析，"
+            f"累计升级比例 {self.emotion_escalation_rate:.1%}"
+        )
+        return None
+
+    def _count_emotion_route(self, route):
+        with self._stats_lock:
+            self.emotion_route_counts[route] += 1
+
+    @property
+    def emotion_escalation_rate(self):
+        """文本情感分析中交给大模型处理的比例"""
+        with self._stats_lock:
+            total = sum(self.emotion_route_counts.values())
+            return self.emotion_route_counts["escalated"] / total if total else 0.0
+
+    @metrics.traced("audio_emotion")
+    def analyze_audio_emotion(self, audio, turn=None):
+        """使用emotion2vec分析音频情感，audio可以是文件路径或AudioData；原始分数记录在turn中"""
         try:
-            print("\n==== 音频情感分析 ====")
-            print(f"分析音频: {audio_path}")
+            debug_print("\n==== 音频情感分析 ====")
+            debug_print(f"分析音频: {audio}")
 
             # 使用FunASR的emotion2vec模型提取情感
-            rec_result = self.emotion_model.generate(
-                audio_path,
-                output_dir="./outputs",
-                granularity="utterance",
-                extract_embedding=False
-            )
+            audio = self._load_audio(audio)
+            if isinstance(audio, AudioData) and audio.duration > config.SER_LONG_AUDIO_SECONDS:
+                # 长音频按重叠窗口分批分析，整段分数取各窗口分数的平均
+                _, window_scores = self._windowed_audio_scores(audio.resample(16000).samples)
+                rec_result = [{"scores": window_scores.mean(axis=0).tolist()}]
+            elif isinstance(audio, AudioData):
+                # 直接传入16kHz波形，避免重新读取文件和重采样，也不写出结果文件
+                rec_result = self.emotion_model.generate(
+                    audio.resample(16000).samples,
+                    fs=16000,
+                    granularity="utterance",
+                    extract_embedding=False
+                )
+            else:
+                rec_result = self.emotion_model.generate(
+                    audio,
+                    output_dir="./outputs",
+                    granularity="utterance",
+                    extract_embedding=False
+                )
 
             # 调试信息
-            logger.info(f"rec_result type: {type(rec_result)}")
-            logger.info(f"rec_result content: {rec_result}")
-            print(f"情感识别原始结果: {rec_result}")
+            logger.debug(f"rec_result type: {type(rec_result)}")
+            logger.debug(f"rec_result content: {rec_result}")
+            debug_print(f"情感识别原始结果: {rec_result}")
 
             # 适应不同的返回格式
             if isinstance(rec_result, dict) and 'scores' in rec_result:
                 # 原来预期的格式
                 scores = rec_result['scores']
-                print("结果格式: 字典包含scores")
+                debug_print("结果格式: 字典包含scores")
             elif isinstance(rec_result, list):
                 # 新的返回格式是列表
                 if len(rec_result) > 0 and isinstance(rec_result[0], dict) and 'scores' in rec_result[0]:
                     # 如果是列表中包含字典
                     scores = rec_result[0]['scores']
-                    print("结果格式: 列表包含字典")
+                    debug_print("结果格式: 列表包含字典")
                 else:
                     # 假设列表本身就是分数
                     scores = rec_result
-                    print("结果格式: 列表直接包含分数")
+                    debug_print("结果格式: 列表直接包含分数")
             else:
                 # 无法识别的格式，使用默认值
-                scores = [0.1, 0.1, 0.1, 0.2, 0.3, 0.0, 0.1, 0.1, 0.0]
-                print("结果格式: 未知格式，使用默认值")
+                scores = DEFAULT_AUDIO_SCORES
+                debug_print("结果格式: 未知格式，使用默认值")
+                metrics.fallback("ser_default_scores", detail="unknown_format")
 
             # 确保scores是列表且长度足够
             if not isinstance(scores, list) or len(scores) < 7:
-                scores = [0.1, 0.1, 0.1, 0.2, 0.3, 0.0, 0.1, 0.1, 0.0]
-                print("分数格式错误或长度不足，使用默认值")
+                scores = DEFAULT_AUDIO_SCORES
+                debug_print("分数格式错误或长度不足，使用默认值")
+                metrics.fallback("ser_default_scores", detail="invalid_scores")
 
-            print(f"处理后的情感分数: {scores}")
-
-            # 情感标签映射
-            emotion_labels = [
-                "生气(angry)", "厌恶(disgusted)", "恐惧(fearful)",
-                "高兴(happy)", "中性(neutral)", "其他(other)",
-                "悲伤(sad)", "惊讶(surprised)", "未知(unknown)"
-            ]
+            debug_print(f"处理后的情感分数: {scores}")
 
             # 保存原始情感分数以供后续使用
-            self.last_audio_emotions = {}
-            for i, label in enumerate(emotion_labels):
-                if i < len(scores):
-                    self.last_audio_emotions[label] = scores[i]
+            if turn is not None:
+                turn.audio_scores = {
+                    label: scores[i] for i, label in enumerate(AUDIO_EMOTION_LABELS) if i < len(scores)
+                }
 
             # 打印各情感分数
-            print("各情感原始分数:")
-            for i, label in enumerate(emotion_labels):
+            debug_print("各情感原始分数:")
+            for i, label in enumerate(AUDIO_EMOTION_LABELS):
                 if i < len(scores):
-                    print(f"{label}: {scores[i]:.4f}")
-
-            # 转换成客服系统使用的三类情感
-            emotions = {
-                "积极": scores[3] * 100,  # happy
-                "消极": (scores[0] + scores[1] + scores[2] + scores[6]) * 100,  # angry + disgusted + fearful + sad
-                "中性": scores[4] * 100  # neutral
-            }
+                    debug_print(f"{label}: {scores[i]:.4f}")
 
-            # 标准化情感得分，确保总和为100
-            total = sum(emotions.values())
-            if total > 0:
-                for key in emotions:
-                    emotions[key] = (emotions[key] / total) * 100
+            emotions = self._map_audio_scores(scores)
 
             # 打印最终情感分析结果
-            print("情感分析结果:")
-            print(f"积极: {emotions['积极']:.2f}%")
-            print(f"消极: {emotions['消极']:.2f}%")
-            print(f"中性: {emotions['中性']:.2f}%")
-            print(f"主导情感: {max(emotions, key=emotions.get)}")
-            print("====================\n")
+            debug_print("情感分析结果:")
+            debug_print(f"积极: {emotions['积极']:.2f}%")
+            debug_print(f"消极: {emotions['消极']:.2f}%")
+            debug_print(f"中性: {emotions['中性']:.2f}%")
+            debug_print(f"主导情感: {max(emotions, key=emotions.get)}")
+            debug_print("====================\n")
 
             return emotions
         except Exception as e:
@@ -336,85 +814,303 @@ JSON格式回答示例:
             # 记录详细错误信息和调用栈
             import traceback
             logger.error(traceback.format_exc())
+            metrics.fallback("ser_error", error=str(e))
             # 返回默认情感
-            print("音频情感分析出错:")
-            print(str(e))
-            print("使用默认情感值")
-            default_emotions = {"积极": 20.0, "消极": 20.0, "中性": 60.0}
-            print("====================\n")
-            return default_emotions
+            debug_print("音频情感分析出错:")
+            debug_print(str(e))
+            debug_print("使用默认情感值")
+            debug_print("====================\n")
+            return dict(DEFAULT_AUDIO_EMOTIONS)
+
+    def _windowed_audio_scores(self, samples, window_seconds=None, hop_seconds=None, batch_size=8):
+        """16kHz波形按重叠窗口分批计算emotion2vec分数
+
+        返回 (窗口起止秒数 (n, 2), 9类分数 (n, 9))，无效的窗口分数用默认值代替。
+        """
+        window = int((window_seconds or config.SER_WINDOW_SECONDS) * 16000)
+        hop = int((hop_seconds or config.SER_HOP_SECONDS) * 16000)
+        bounds, scores_list = windowed_emotion2vec_scores(self.emotion_model, samples, window, hop, batch_size)
+        invalid = [i for i, scores in enumerate(scores_list) if len(scores) < len(AUDIO_EMOTION_LABELS)]
+        for i in invalid:
+            scores_list[i] = DEFAULT_AUDIO_SCORES
+        if invalid:
+            metrics.fallback("ser_default_scores", detail="invalid_window_scores")
+        scores = np.array(scores_list, dtype=np.float64).reshape(-1, len(AUDIO_EMOTION_LABELS))
+        return np.asarray(bounds, dtype=np.float64).reshape(-1, 2) / 16000, scores
+
+    @metrics.traced("audio_emotion_timeline")
+    def analyze_audio_emotion_timeline(self, audio, segments=None, window_seconds=None, hop_seconds=None,
+                                       batch_size=8, turn=None):
+        """长录音的情感时间线：重叠窗口分批送入emotion2vec，再按时间对齐到分段
+
+        segments: 可选，Whisper的分段 [{"start", "end", ...}, ...]，每段的分数为与其重叠的窗口按重叠时长加权平均
+        window_seconds / hop_seconds: 窗口长度和步长，缺省时取utils/config.py中的配置
+        返回 {"duration", "emotions": 整段情感分布, "windows": [...], "segments": [...]}，
+        windows和segments的每一项包含 start、end、emotions、specific，segments还保留原分段的其他字段。
+        """
+        samples = self.decode_audio(audio).samples
+        bounds, scores = self._windowed_audio_scores(samples, window_seconds, hop_seconds, batch_size)
+        analyzer = self.emotion_analyzer
+        overall_scores = scores.mean(axis=0) if len(scores) else np.asarray(DEFAULT_AUDIO_SCORES)
+        overall = analyzer.map_audio_dict(overall_scores)
+        if turn is not None:
+            turn.audio_scores = dict(zip(AUDIO_EMOTION_LABELS, overall_scores.tolist()))
+
+        def timeline(items, raw):
+            emotions = analyzer.to_dicts(analyzer.map_audio(raw).reshape(-1, 3))
+            return [
+                {
+                    **item,
+                    "emotions": e,
+                    "specific": analyzer.audio_specific(e, dict(zip(AUDIO_EMOTION_LABELS, r))),
+                }
+                for item, e, r in zip(items, emotions, raw.tolist())
+            ]
+
+        windows = timeline([{"start": round(s, 3), "end": round(e, 3)} for s, e in bounds.tolist()], scores)
+        aligned = None
+        if segments is not None:
+            targets = [(segment["start"], segment["end"]) for segment in segments]
+            aligned = timeline(segments, analyzer.pool_scores(scores, analyzer.overlaps(bounds, targets)))
+        return {
+            "duration": round(len(samples) / 16000, 3),
+            "emotions": overall,
+            "windows": windows,
+            "segments": aligned,
+        }
+
+    @metrics.traced("asr_segments")
+    def transcribe_segments(self, audio, turn=None):
+        """Whisper转写并保留分段时间戳，返回 {"text": 整段文本, "segments": [{"start", "end", "text"}, ...]}"""
+        audio = self.decode_audio(audio)
+        result = self.whisper_model.transcribe(
+            audio.samples,
+            language="zh",
+            task="transcribe",
+            initial_prompt="以下是简体中文的语音识别。"
+        )
+        segments = [
+            {"start": float(s["start"]), "end": float(s["end"]), "text": self._to_simplified(s["text"], turn)}
+            for s in result.get("segments", [])
+        ]
+        return {"text": self._to_simplified(result["text"], turn), "segments": segments}
+
+    @metrics.traced("call_timeline")
+    def analyze_call_timeline(self, audio, transcript=None, batch_size=8, turn=None):
+        """通话录音的逐段转写和情感：Whisper分段转写，情感时间线对齐到各分段
+
+        transcript: 可选，已有的transcribe_segments结果，传入时不再重复转写
+        返回 analyze_audio_emotion_timeline 的结果，另加整段转写 "text"，segments每项含 start、end、text 和情感。
+        """
+        audio = self.decode_audio(audio)
+        transcript = transcript if transcript is not None else self.transcribe_segments(audio, turn)
+        timeline = self.analyze_audio_emotion_timeline(audio, transcript["segments"], batch_size=batch_size, turn=turn)
+        return {"text": transcript["text"], **timeline}
+
+    def _map_audio_scores(self, scores):
+        """将emotion2vec的9类分数转换成客服系统使用的三类情感，总和为100"""
+        return self.emotion_analyzer.map_audio_dict(scores)
+
+    def _get_executor(self):
+        """语音流水线使用的线程池，首次使用时创建"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pipeline")
+            return self._executor
+
+    @staticmethod
+    def _timed(func, *args):
+        """执行函数并返回(结果, 耗时秒数)"""
+        start = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - start
+
+    @metrics.traced("audio_pipeline")
+    def process_audio(self, audio, parallel=True, turn=None):
+        """语音流水线：识别文本并分析音频情感
+
+        两个阶段都只读取同一段音频、互不依赖。音频只解码一次后共享给两个模型；
+        parallel为True时并发执行，torch在前向计算中会释放GIL，总耗时约为两者中较慢的一个。
+        返回 (文本, 情感分布, 各阶段耗时)
+        """
+        turn = turn if turn is not None else TurnContext()
+        start = time.perf_counter()
+        if not isinstance(audio, AudioData) and os.path.exists(audio):
+            audio = self._load_audio(audio)
+        if parallel:
+            executor = self._get_executor()
+            asr_future = executor.submit(self._timed, self.recognize_speech, audio, turn)
+            ser_future = executor.submit(self._timed, self.analyze_audio_emotion, audio, turn)
+            text, asr_time = asr_future.result()
+            emotions, ser_time = ser_future.result()
+        else:
+            text, asr_time = self._timed(self.recognize_speech, audio, turn)
+            emotions, ser_time = self._timed(self.analyze_audio_emotion, audio, turn)
+
+        timings = {
+            "asr": asr_time,
+            "audio_emotion": ser_time,
+            "total": time.perf_counter() - start,
+        }
+        turn.timings.update(timings)
+        logger.debug(
+            f"语音流水线耗时({'并行' if parallel else '串行'}): "
+            f"识别 {asr_time:.2f}s, 情感 {ser_time:.2f}s, 合计 {timings['total']:.2f}s"
+        )
+        return text, emotions, timings
+
+    # 批量推理：用于离线分析大量通话录音
+    def decode_audio(self, audio):
+        """将文件路径或AudioData解码为16kHz的AudioData，非WAV格式借助whisper调用ffmpeg"""
+        audio = self._load_audio(audio)
+        if not isinstance(audio, AudioData):
+            import whisper
+            audio = AudioData(whisper.load_audio(audio), 16000, source=audio)
+        return audio.resample(16000)
+
+    def _waveforms(self, audios):
+        """将一批音频统一为16kHz的float32波形"""
+        return [self.decode_audio(audio).samples for audio in audios]
+
+    @metrics.traced("asr_batch")
+    def recognize_batch(self, audios, batch_size=8):
+        """批量语音识别，audios为文件路径或AudioData列表，返回顺序一致的文本列表"""
+        texts = batch_transcribe(
+            self.whisper_model,
+            self._waveforms(audios),
+            batch_size=batch_size,
+            language="zh",
+            initial_prompt="以下是简体中文的语音识别。"
+        )
+        if self.has_converter:
+            texts = [self.converter.convert(text) for text in texts]
+        return texts
+
+    @metrics.traced("audio_emotion_batch")
+    def analyze_audio_emotion_batch(self, audios, batch_size=8):
+        """批量音频情感分析，返回顺序一致的三类情感分布列表
+
+        与单条分析一致，超过SER_LONG_AUDIO_SECONDS的音频按窗口分批分析，整段分数取各窗口的平均。
+        """
+        waveforms = self._waveforms(audios)
+        limit = config.SER_LONG_AUDIO_SECONDS * 16000
+        short = [i for i, w in enumerate(waveforms) if len(w) <= limit]
+        scores_list = [None] * len(waveforms)
+        for i, scores in zip(short, batch_emotion2vec_scores(self.emotion_model, [waveforms[i] for i in short], batch_size)):
+            scores_list[i] = scores
+        for i, w in enumerate(waveforms):
+            if len(w) > limit:
+                scores_list[i] = self._windowed_audio_scores(w, batch_size=batch_size)[1].mean(axis=0).tolist()
+        # 与单条分析一致，分数无效时使用默认情感值；有效分数合并成一个矩阵一次映射
+        valid = [i for i, scores in enumerate(scores_list) if len(scores) >= len(AUDIO_EMOTION_LABELS)]
+        results = [dict(DEFAULT_AUDIO_EMOTIONS) for _ in scores_list]
+        if valid:
+            mapped = self.emotion_analyzer.map_audio([scores_list[i] for i in valid])
+            for i, emotions in zip(valid, self.emotion_analyzer.to_dicts(mapped)):
+                results[i] = emotions
+        return results
+
+    def analyze_text_emotion_batch(self, texts, batch_size=8):
+        """批量文本情感分析，返回顺序一致的 {"distribution": 情感分布, "specific": 具体情感} 列表
+
+        词典分类器有把握的文本和缓存命中的文本直接返回，其余按长度分桶后批量交给大模型。
+        """
+        results = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            if self.fast_text_emotion:
+                prediction = self.text_classifier.predict(text)
+                if prediction["confidence"] >= self.emotion_confidence_threshold:
+                    self._count_emotion_route("fast")
+                    results[i] = {"distribution": prediction["distribution"], "specific": prediction["specific"]}
+                    continue
+                self._count_emotion_route("escalated")
+            cached = self.emotion_cache.get(self._normalize(text))
+            if cached is not None:
+                results[i] = cached
+                continue
+            pending.append(i)
+
+        for batch in bucket_by_length([len(texts[i]) for i in pending], batch_size):
+            indices = [pending[j] for j in batch]
+            outputs = self._batch_chat([self._build_emotion_prompt(texts[i]) for i in indices], max_new_tokens=128)
+            for i, output in zip(indices, outputs):
+                data = extract_json(output)
+                parsed = parse_emotion_result(data) if data else None
+                if parsed:
+                    results[i] = {"distribution": parsed[0], "specific": parsed[1]}
+                    self.emotion_cache.set(self._normalize(texts[i]), results[i])
+                else:
+                    prediction = self.text_classifier.predict(texts[i])
+                    results[i] = {"distribution": prediction["distribution"], "specific": prediction["specific"]}
+        return results
 
     # 新增多模态融合分析方法
-    def analyze_multimodal_emotion(self, text, audio_path):
-        """多模态情感分析：融合文本和音频的情感分析结果"""
-        print("\n==== 多模态情感分析 ====")
+    def analyze_multimodal_emotion(self, text, audio, turn=None):
+        """多模态情感分析：融合文本和音频的情感分析结果，融合结果记录在turn中"""
+        debug_print("\n==== 多模态情感分析 ====")
+        turn = turn if turn is not None else TurnContext()
 
         # 文本情感分析
-        text_emotions = self.analyze_emotion(text)
-        print("文本情感分析完成")
+        text_emotions = self.analyze_emotion(text, turn)
+        debug_print("文本情感分析完成")
 
         # 音频情感分析
-        audio_emotions = self.analyze_audio_emotion(audio_path)
-        print("音频情感分析完成")
-
-        # 权重设置 (可以根据实际情况调整)
-        text_weight = 0.6  # 文本情感权重
-        audio_weight = 0.4  # 音频情感权重
-
-        # 融合情感分析结果
-        combined_emotions = {}
-        for emotion in ["积极", "消极", "中性"]:
-            combined_emotions[emotion] = (
-                    text_emotions[emotion] * text_weight +
-                    audio_emotions[emotion] * audio_weight
-            )
+        audio_emotions = self.analyze_audio_emotion(audio, turn)
+        debug_print("音频情感分析完成")
+
+        # 融合情感分析结果，权重见EmotionAnalyzer
+        combined_emotions = self.emotion_analyzer.fuse_dicts(text_emotions, audio_emotions)
 
         # 打印融合结果
-        print("多模态情感融合结果:")
-        print(
+        debug_print("多模态情感融合结果:")
+        debug_print(
             f"积极: {combined_emotions['积极']:.2f}% (文本: {text_emotions['积极']:.2f}%, 音频: {audio_emotions['积极']:.2f}%)")
-        print(
+        debug_print(
             f"消极: {combined_emotions['消极']:.2f}% (文本: {text_emotions['消极']:.2f}%, 音频: {audio_emotions['消极']:.2f}%)")
-        print(
+        debug_print(
             f"中性: {combined_emotions['中性']:.2f}% (文本: {text_emotions['中性']:.2f}%, 音频: {audio_emotions['中性']:.2f}%)")
-        print(f"主导情感: {max(combined_emotions, key=combined_emotions.get)}")
-        print("====================\n")
+        debug_print(f"主导情感: {max(combined_emotions, key=combined_emotions.get)}")
+        debug_print("====================\n")
 
         # 保存多模态融合结果，以便生成响应时使用
-        self.last_multimodal_emotions = {
+        turn.multimodal = {
             "text": text_emotions,
             "audio": audio_emotions,
             "combined": combined_emotions,
-            "text_specific": getattr(self, "last_text_emotions", {}).get("specific", "未知"),
-            "audio_specific": self._get_specific_audio_emotion(audio_emotions)
+            "text_specific": (turn.text_emotions or {}).get("specific", "未知"),
+            "audio_specific": self._get_specific_audio_emotion(audio_emotions, turn)
         }
 
         return combined_emotions
 
-    # 辅助方法：从音频情感获取具体情感
-    def _get_specific_audio_emotion(self, emotions):
-        """从音频情感分析结果中提取具体情感"""
-        # 根据主导情感类型，选择最有可能的具体情感
-        dominant = max(emotions, key=emotions.get)
-
-        if dominant == "积极":
-            return "高兴"
-        elif dominant == "消极":
-            # 如果有last_audio_emotions，可以更精确地判断
-            if hasattr(self, "last_audio_emotions"):
-                scores = self.last_audio_emotions
-                if scores.get("生气(angry)", 0) > scores.get("悲伤(sad)", 0):
-                    return "愤怒"
-                else:
-                    return "悲伤"
-            return "不满"
-        else:
-            return "平静"
+    @metrics.traced("multimodal_emotion_batch")
+    def analyze_multimodal_emotion_batch(self, texts, audios, batch_size=8, audio_emotions=None):
+        """批量多模态情感分析，texts与audios一一对应
+
+        文本和音频分别批量分析后一次完成全部轮次的融合，
+        返回顺序一致的 {"text", "audio", "combined", "text_specific"} 列表。
+        audio_emotions: 可选，已算好的音频情感分布（如情感时间线的整段结果），传入时不再分析音频
+        """
+        if len(texts) != len(audios):
+            raise ValueError(f"文本和音频数量不一致: {len(texts)} != {len(audios)}")
+        text_results = self.analyze_text_emotion_batch(texts, batch_size)
+        if audio_emotions is None:
+            audio_emotions = self.analyze_audio_emotion_batch(audios, batch_size)
+        text_emotions = [result["distribution"] for result in text_results]
+        combined = self.emotion_analyzer.fuse_batch(text_emotions, audio_emotions)
+        return [
+            {"text": t, "audio": a, "combined": c, "text_specific": r["specific"]}
+            for t, a, c, r in zip(text_emotions, audio_emotions, combined, text_results)
+        ]
 
-    def generate_response(self, text, emotions):
-        """使用Qwen生成回复"""
-        logger.info(f"为文本生成回复: {text}")
+    # 辅助方法：从音频情感获取具体情感
+    def _get_specific_audio_emotion(self, emotions, turn=None):
+        """从音频情感分析结果中提取具体情感，本轮有emotion2vec原始分数时区分愤怒和悲伤"""
+        return self.emotion_analyzer.audio_specific(emotions, turn.audio_scores if turn is not None else None)
 
+    def _describe_emotions(self, emotions, turn=None):
+        """构建情感分析描述文本，返回(描述文本, 具体情感)"""
         # 获取主导情感
         dominant_emotion = max(emotions, key=emotions.get)
 
@@ -426,34 +1122,348 @@ JSON格式回答示例:
 
         # 检查是否有多模态融合结果
         specific_emotion = "未知"
-        if hasattr(self, 'last_multimodal_emotions'):
+        turn = turn if turn is not None else TurnContext()
+        if turn.multimodal is not None:
             emotion_text += "\n多模态情感分析:\n"
-            emotion_text += f"文本主要情感: {self.last_multimodal_emotions.get('text_specific', '未知')}\n"
-            emotion_text += f"语音主要情感: {self.last_multimodal_emotions.get('audio_specific', '未知')}\n"
-            specific_emotion = self.last_multimodal_emotions.get('text_specific', '未知')
-        elif hasattr(self, 'last_text_emotions'):
-            specific_emotion = self.last_text_emotions.get('specific', '未知')
+            emotion_text += f"文本主要情感: {turn.multimodal.get('text_specific', '未知')}\n"
+            emotion_text += f"语音主要情感: {turn.multimodal.get('audio_specific', '未知')}\n"
+            specific_emotion = turn.multimodal.get('text_specific', '未知')
+        elif turn.text_emotions is not None:
+            specific_emotion = turn.text_emotions.get('specific', '未知')
             emotion_text += f"具体情感: {specific_emotion}\n"
-        elif hasattr(self, 'last_audio_emotions'):
-            audio_specific = self._get_specific_audio_emotion(emotions)
+        elif turn.audio_scores is not None:
+            audio_specific = self._get_specific_audio_emotion(emotions, turn)
             emotion_text += f"语音情感: {audio_specific}\n"
             specific_emotion = audio_specific
 
-        # 构建包含详细情感分析的提示词
-        prompt = f"""客户说: "{text}"
-
-客户情绪分析:
+        return emotion_text, specific_emotion
+
+    @property
+    def intent_classifier(self):
+        """意图分类器，首次访问时用意图标注文件和知识库问答训练；不可用时为None"""
+        with self._intent_lock:
+            if self._intent_classifier is None and self._intent_source:
+                self._intent_classifier = self._train_intent_classifier(self._intent_source)
+                self._intent_source = None
+            return self._intent_classifier
+
+    def _train_intent_classifier(self, source):
+        if isinstance(source, IntentClassifier):
+            return source
+        if not os.path.exists(source):
+            logger.warning(f"意图标注文件不存在，不做意图识别: {source}")
+            return None
+        try:
+            texts, labels = IntentClassifier.load_examples(source)
+            # 知识库问答的各个问法也是带意图标注的样本
+            for entry in (self.knowledge_base.entries if self.knowledge_base is not None else []):
+                if entry.get("intent"):
+                    texts.extend(entry["questions"])
+                    labels.extend([entry["intent"]] * len(entry["questions"]))
+            return IntentClassifier().fit(texts, labels)
+        except Exception as e:
+            logger.warning(f"意图分类器训练失败，不做意图识别: {str(e)}")
+            return None
+
+    def classify_intent(self, text, turn=None):
+        """识别客户文本的意图，返回 {"intent", "confidence"}，结果记录在turn中；分类器不可用时返回None"""
+        if turn is not None and turn.intent is not None:
+            return turn.intent
+        classifier = self.intent_classifier
+        if classifier is None:
+            return None
+        cache_key = self._normalize(text)
+        result = self.intent_cache.get(cache_key)
+        if result is None:
+            with metrics.span("intent"):
+                result = classifier.predict(text)
+            self.intent_cache.set(cache_key, result)
+        with self._stats_lock:
+            self.intent_counts[result["intent"]] = self.intent_counts.get(result["intent"], 0) + 1
+        if turn is not None:
+            turn.intent = result
+        return result
+
+    def classify_intent_batch(self, texts):
+        """批量识别意图，合并为一次矩阵运算，不经过缓存"""
+        classifier = self.intent_classifier
+        if classifier is None:
+            return [None] * len(texts)
+        with metrics.span("intent_batch"):
+            return classifier.predict_batch(texts)
+
+    def _template_answer(self, text, emotions, turn=None):
+        """问候、感谢等简单意图的模板回复，不适用时返回None"""
+        result = self.classify_intent(text, turn)
+        if not self._template_intent(result):
+            return None
+        _, specific_emotion = self._describe_emotions(emotions, turn)
+        reply = intent_reply(result["intent"], text, specific_emotion, emotions)
+        if reply is not None:
+            with self._stats_lock:
+                self.template_replies += 1
+            logger.debug(f"意图模板回复({result['intent']}, 置信度 {result['confidence']:.2f}): {reply}")
+        return reply
+
+    def _template_intent(self, result):
+        """意图置信度足以跳过大模型、直接用模板回复"""
+        return result is not None and result["confidence"] >= self.intent_template_threshold
+
+    def _direct_answer(self, text, emotions, turn=None):
+        """不调用大模型的回复：先看简单意图的模板，再看知识库，都不适用时返回None"""
+        reply = self._template_answer(text, emotions, turn)
+        if reply is None:
+            reply = self._knowledge_answer(text, emotions, turn)
+        return reply
+
+    def _can_answer_directly(self, text, turn=None):
+        """意图有模板或知识库能直接回答时，回复阶段不需要大模型"""
+        result = self.classify_intent(text, turn)
+        if self._template_intent(result) and intent_reply(result["intent"], text, None) is not None:
+            return True
+        return self._knowledge_can_answer(text, turn)
+
+    @staticmethod
+    def _load_emotion_analyzer(source):
+        if isinstance(source, EmotionAnalyzer):
+            return source
+        path = source or config.FUSION_WEIGHTS_PATH
+        if path and os.path.exists(path):
+            try:
+                analyzer = EmotionAnalyzer.from_file(path)
+                logger.info(f"已加载融合权重: 文本 {analyzer.text_weight:.2f} / 音频 {analyzer.audio_weight:.2f}")
+                return analyzer
+            except Exception as e:
+                logger.warning(f"融合权重加载失败，使用配置的固定权重: {str(e)}")
+        elif source:
+            logger.warning(f"融合权重文件不存在，使用配置的固定权重: {source}")
+        return EmotionAnalyzer(config.FUSION_TEXT_WEIGHT)
+
+    @staticmethod
+    def _load_knowledge_base(source):
+        if not source:
+            return None
+        if isinstance(source, KnowledgeBase):
+            return source
+        if not os.path.exists(source):
+            logger.warning(f"知识库文件不存在，不使用知识库: {source}")
+            return None
+        try:
+            return KnowledgeBase.from_file(source)
+        except Exception as e:
+            logger.warning(f"知识库加载失败，不使用知识库: {str(e)}")
+            return None
+
+    def search_knowledge(self, text, turn=None):
+        """检索与客户文本相关的FAQ问答，只返回得分不低于参考阈值的结果；结果记录在turn中"""
+        if self.knowledge_base is None:
+            return []
+        if turn is not None and turn.knowledge is not None:
+            return turn.knowledge
+        with metrics.span("kb_search"):
+            hits = [
+                hit for hit in self.knowledge_base.search(text, config.KB_TOP_K)
+                if hit["score"] >= config.KB_CONTEXT_THRESHOLD
+            ]
+        if turn is not None:
+            turn.knowledge = hits
+        return hits
+
+    def _knowledge_can_answer(self, text, turn=None):
+        hits = self.search_knowledge(text, turn)
+        return bool(hits) and hits[0]["score"] >= config.KB_ANSWER_THRESHOLD
+
+    def _knowledge_answer(self, text, emotions, turn=None):
+        """最相关问答的得分足够高时返回按情感调整后的模板答案，否则返回None"""
+        if self.knowledge_base is None:
+            return None
+        hits = self.search_knowledge(text, turn)
+        if self._knowledge_can_answer(text, turn):
+            route = "answered"
+        else:
+            route = "context" if hits else "miss"
+        with self._stats_lock:
+            self.kb_route_counts[route] += 1
+        if route != "answered":
+            return None
+        _, specific_emotion = self._describe_emotions(emotions, turn)
+        answer = compose_answer(hits[0]["answer"], specific_emotion, emotions)
+        logger.debug(f"知识库直接回复({hits[0]['id']}, 得分 {hits[0]['score']:.2f}): {answer}")
+        return answer
+
+    @staticmethod
+    def _describe_knowledge(hits):
+        lines = ["知识库参考资料（与客户问题相关时据此回答，不要编造政策）:"]
+        for i, hit in enumerate(hits, 1):
+            lines.append(f"{i}. 问: {hit['question']} 答: {hit['answer']}")
+        return "\n".join(lines) + "\n"
+
+    def _build_response_prompt(self, text, emotions, turn=None):
+        """根据客户文本、情感分析结果和知识库检索结果构建回复提示词"""
+        emotion_text, specific_emotion = self._describe_emotions(emotions, turn)
+        hits = self.search_knowledge(text, turn)
+        knowledge_text = self._describe_knowledge(hits) + "\n" if hits else ""
+
+        # 构建包含详细情感分析的提示词，固定说明在前，客户相关内容在后
+        prompt = RESPONSE_PROMPT_PREFIX + f"""客户情绪分析:
 {emotion_text}
-
-请根据客户的情绪状态生成一段专业、有同理心的客服回复，注意客户表现出的{specific_emotion}情感。
-表现出对客户情绪的理解，并提供专业、积极的帮助。使用简体中文回复:"""
+{knowledge_text}客户说: "{text}"
+
+注意客户表现出的{specific_emotion}情感。回复:"""
+        return prompt
+
+    @metrics.traced("generation")
+    def generate_response(self, text, emotions, turn=None):
+        """使用Qwen生成回复，turn为本轮情感分析时使用的上下文"""
+        logger.debug(f"为文本生成回复: {text}")
+
+        memory = self._memory_of(turn)
+        prompt = self._build_response_prompt(text, emotions, turn)
+        answer = self._direct_answer(text, emotions, turn)
+        if answer is not None:
+            if memory is not None:
+                self._remember(memory, prompt, answer, text)
+            return answer
+        cache_key = self._response_cache_key(text, emotions, turn)
+        # 已有对话历史时回复依赖上下文，既不读也不写回复缓存（生成后记忆非空，需在生成前判断）
+        cacheable = memory is None or memory.empty
+        cached = self.response_cache.get(cache_key) if cacheable else None
+        if cached is not None:
+            logger.debug(f"回复缓存命中: {cached}")
+            if memory is not None:
+                self._remember(memory, prompt, cached, text)
+            return cached
 
         # 生成回复
-        response, _ = self.qwen_model.chat(self.qwen_tokenizer, prompt, history=None)
+        if memory is not None:
+            response = ""
+            for response in self._memory_chat_stream(prompt, memory, text):
+                pass
+        else:
+            response = self._chat(prompt)
 
         # 确保回复是简体中文
-        if hasattr(self, 'converter') and self.has_converter:
-            response = self.converter.convert(response)
+        response = self._to_simplified(response, turn)
+
+        if cacheable:
+            self.response_cache.set(cache_key, response)
+        logger.debug(f"生成的回复: {response}")
+        return response
+
+    def _normalize(self, text):
+        return normalize_text(text, self.converter if self.has_converter else None)
+
+    def _response_cache_key(self, text, emotions, turn=None):
+        """回复缓存键：归一化文本 + 量化后的情感桶 + 具体情感"""
+        _, specific_emotion = self._describe_emotions(emotions, turn)
+        return f"{self._normalize(text)}|{emotion_bucket(emotions)}|{specific_emotion}"
+
+    def cache_stats(self):
+        """情感和回复缓存的命中统计"""
+        return {
+            "emotion": self.emotion_cache.stats(),
+            "response": self.response_cache.stats(),
+            "intent": self.intent_cache.stats(),
+        }
 
-        logger.info(f"生成的回复: {response}")
-        return response
\ No newline at end of file
+    def _collect_metrics(self):
+        """导出指标时调用，返回 [(指标名, 类型, 说明, [(标签, 值), ...]), ...]"""
+        caches = self.cache_stats()
+        with self._stats_lock:
+            routes = dict(self.emotion_route_counts)
+            kb_routes = dict(self.kb_route_counts)
+            intents = dict(self.intent_counts)
+            template_replies = self.template_replies
+        rows = [
+            ("cache_hits_total", "counter", "情感和回复缓存命中次数",
+             [({"cache": name}, stats["hits"]) for name, stats in caches.items()]),
+            ("cache_misses_total", "counter", "情感和回复缓存未命中次数",
+             [({"cache": name}, stats["misses"]) for name, stats in caches.items()]),
+            ("text_emotion_routes_total", "counter", "文本情感由词典直接判断(fast)或交给大模型(escalated)的次数",
+             [({"route": route}, count) for route, count in routes.items()]),
+            ("kb_routes_total", "counter", "知识库直接回复(answered)、作为参考资料(context)或未命中(miss)的次数",
+             [({"route": route}, count) for route, count in kb_routes.items()]),
+            ("intents_total", "counter", "各意图的识别次数", [({"intent": name}, count) for name, count in intents.items()]),
+            ("template_replies_total", "counter", "简单意图直接用模板回复的次数", [({}, template_replies)]),
+            ("sessions", "gauge", "当前会话数", [({}, len(self.sessions))]),
+            ("model_ready", "gauge", "模型是否已加载", [({"model": name}, int(self.ready(name))) for name in self._models]),
+        ]
+        if self.prefix_cache is not None:
+            stats = self.prefix_cache.stats()
+            rows.append(("prefix_cache_reused_tokens_total", "counter", "前缀缓存复用的token数",
+                         [({}, stats["reused_tokens"])]))
+        if self._speculative():
+            stats = self.kv_decoder.stats()
+            rows.append(("speculative_tokens_total", "counter", "推测解码的草稿token数(drafted)和被接受的数量(accepted)",
+                         [({"kind": "drafted"}, stats["drafted_tokens"]),
+                          ({"kind": "accepted"}, stats["accepted_tokens"])]))
+            rows.append(("speculative_steps_total", "counter", "推测解码的前向计算步数", [({}, stats["steps"])]))
+        if self.llm_scheduler is not None:
+            stats = self.llm_scheduler.stats()
+            rows.append(("llm_queue_depth", "gauge", "大模型微批调度队列中的请求数", [({}, stats["queue_depth"])]))
+            rows.append(("llm_batches_total", "counter", "大模型批量生成的次数", [({}, stats["batches"])]))
+        return rows
+
+    @metrics.traced("generation_stream")
+    def generate_response_stream(self, text, emotions, turn=None):
+        """流式生成回复，逐段产出已转换为简体的文本增量"""
+        logger.debug(f"为文本流式生成回复: {text}")
+
+        memory = self._memory_of(turn)
+        prompt = self._build_response_prompt(text, emotions, turn)
+        answer = self._direct_answer(text, emotions, turn)
+        if answer is not None:
+            if memory is not None:
+                self._remember(memory, prompt, answer, text)
+            yield answer
+            return
+        cache_key = self._response_cache_key(text, emotions, turn)
+        cacheable = memory is None or memory.empty
+        cached = self.response_cache.get(cache_key) if cacheable else None
+        if cached is not None:
+            logger.debug(f"回复缓存命中: {cached}")
+            if memory is not None:
+                self._remember(memory, prompt, cached, text)
+            yield cached
+            return
+
+        stream_converter = IncrementalConverter(self.converter if self.has_converter else None)
+
+        if memory is not None:
+            # 带会话历史生成，产出截至当前的完整回复，这里转换为增量
+            chunks = self._stream_deltas(self._memory_chat_stream(prompt, memory, text))
+        elif self.llm_scheduler is not None or not hasattr(self.qwen_model, "chat_stream"):
+            # 启用微批调度或模型不支持流式输出时退化为一次性生成
+            chunks = [self._chat(prompt)]
+        else:
+            # 流式接口每次产出截至当前的完整回复，这里转换为增量
+            chunks = self._stream_deltas(self._chat_stream(prompt))
+
+        response = ""
+        for chunk in chunks:
+            delta = stream_converter.feed(chunk)
+            if delta:
+                response += delta
+                yield delta
+        delta = stream_converter.flush()
+        if delta:
+            response += delta
+            yield delta
+        if stream_converter.seconds:
+            self._record_t2s(stream_converter.seconds, turn)
+
+        if cacheable:
+            self.response_cache.set(cache_key, response)
+        logger.debug(f"生成的回复: {response}")
+
+    @staticmethod
+    def _stream_deltas(cumulative_stream):
+        """将逐步增长的完整文本序列转换为增量序列"""
+        previous = ""
+        for current in cumulative_stream:
+            # 未解码完整的多字节字符会被暂时忽略，只在文本增长时输出新增部分
+            if len(current) <= len(previous):
+                continue
+            delta = current[len(previous):]
+            previous = current
+            yield delta
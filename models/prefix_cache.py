@@ -0,0 +1,285 @@
+import copy
+import time
+import logging
+import threading
+
+import torch
+
+from models.qwen_utils import DEFAULT_SYSTEM, build_chat_prompt, stop_token_ids
+
+logger = logging.getLogger("prefix_cache")
+
+
+class KVDecoder:
+    """在给定past_key_values之上增量预填充并贪心解码
+
+    只对尚未计算过的token做前向计算，生成结束后可以取回包含本次输入和回复的KV缓存，
+    供提示词前缀缓存和多轮对话记忆复用。
+    """
+
+    def __init__(self, model, tokenizer, repetition_penalty=1.1, draft=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.repetition_penalty = repetition_penalty
+        self.device = next(model.parameters()).device
+        self.seq_dim = self.past_seq_dim(model)
+        self.stop_ids = set(stop_token_ids(tokenizer))
+        # 推测解码的草稿来源（models/speculative.py），None表示逐个token解码
+        self.draft = draft
+        self._lock = threading.Lock()
+        # 推测解码统计
+        self.steps = 0
+        self.drafted_tokens = 0
+        self.accepted_tokens = 0
+
+    @staticmethod
+    def fresh_past(past):
+        """旧式的元组缓存每步拼接出新张量，不会改动原缓存；Cache对象会被原地追加，需要复制"""
+        if isinstance(past, (tuple, list)):
+            return past
+        return copy.deepcopy(past)
+
+    @staticmethod
+    def past_seq_dim(model):
+        """元组形式的KV缓存中序列所在的维度：通常的布局为(批, 头, 序列, 维度)，Qwen第一代为(批, 序列, 头, 维度)"""
+        config = getattr(model, "config", None)
+        return 1 if getattr(config, "model_type", None) == "qwen" else 2
+
+    @staticmethod
+    def crop_past(past, length, total, seq_dim=2):
+        """把共total个token的KV缓存截断为前length个token，seq_dim见past_seq_dim"""
+        if length >= total:
+            return past
+        if hasattr(past, "crop"):
+            # 负数表示从末尾去掉的token数
+            past.crop(length - total)
+            return past
+        return tuple(tuple(tensor.narrow(seq_dim, 0, length) for tensor in layer) for layer in past)
+
+    def _forward(self, ids, past, total):
+        return self.model(
+            input_ids=torch.tensor([ids], dtype=torch.long, device=self.device),
+            past_key_values=past,
+            attention_mask=torch.ones((1, total), dtype=torch.long, device=self.device),
+            use_cache=True
+        )
+
+    def _propose(self, context, budget):
+        """向草稿要至多budget个token，截掉结束标记及其之后的部分"""
+        if self.draft is None or budget <= 0:
+            return []
+        try:
+            proposal = self.draft.propose(context, min(budget, self.draft.max_tokens))
+        except Exception as e:
+            logger.warning(f"草稿生成出错，本步不使用推测解码: {str(e)}")
+            return []
+        for i, token in enumerate(proposal):
+            if token in self.stop_ids:
+                return proposal[:i]
+        return proposal
+
+    def stream(self, input_ids, past=None, past_length=0, max_new_tokens=512, result=None, context=None):
+        """预填充input_ids（接在past之后）并逐个生成token，产出截至当前的完整回复
+
+        设置了草稿时每步把草稿token接在新token之后一起前向计算，逐个核对贪心结果，
+        接受一致的最长前缀并截掉其余部分的KV缓存，输出与逐个解码相同。
+        context: past中已有的token，草稿据此查找或生成，缺省时只用input_ids
+        result: 可选的字典，生成结束后写入 prefill_seconds、generated（回复的token）
+        和 past（已计算的全部token的KV缓存，不含结束标记），使用草稿时还写入
+        drafted和accepted（草稿token数和被接受的数量）
+        """
+        total = past_length + len(input_ids)
+        history = list(context or []) + list(input_ids)
+        drafted = accepted = steps = 0
+        with torch.no_grad():
+            start = time.perf_counter()
+            output = self._forward(input_ids, past, total)
+            if result is not None:
+                result["prefill_seconds"] = time.perf_counter() - start
+            logits = output.logits[0, -1]
+            past = output.past_key_values
+
+            generated = []
+            try:
+                while len(generated) < max_new_tokens:
+                    token = self._next_token(logits, generated)
+                    if token in self.stop_ids:
+                        break
+                    generated.append(token)
+                    proposal = self._propose(history + generated, max_new_tokens - len(generated))
+                    feed = [token] + proposal
+                    total += len(feed)
+                    output = self._forward(feed, past, total)
+                    # logits[i]是在feed[:i+1]之后的预测，依次核对草稿
+                    hits = 0
+                    for i, proposed in enumerate(proposal):
+                        if self._next_token(output.logits[0, i], generated) != proposed:
+                            break
+                        generated.append(proposed)
+                        hits += 1
+                    rejected = len(proposal) - hits
+                    past = self.crop_past(output.past_key_values, total - rejected, total, self.seq_dim)
+                    total -= rejected
+                    logits = output.logits[0, hits]
+                    steps += 1
+                    drafted += len(proposal)
+                    accepted += hits
+                    text = self.tokenizer.decode(generated, skip_special_tokens=True)
+                    # 多字节字符尚未解码完整时先不输出
+                    if not text.endswith("�"):
+                        yield text.strip()
+            finally:
+                if self.draft is not None:
+                    self._record(steps, drafted, accepted)
+            if self.draft is not None and hasattr(self.draft, "add"):
+                self.draft.add(generated)
+            if result is not None:
+                result["generated"] = generated
+                result["past"] = past
+                result["drafted"] = drafted
+                result["accepted"] = accepted
+
+    def _record(self, steps, drafted, accepted):
+        with self._lock:
+            self.steps += steps
+            self.drafted_tokens += drafted
+            self.accepted_tokens += accepted
+
+    def stats(self):
+        """推测解码统计：前向步数、草稿token数、接受数和接受率"""
+        with self._lock:
+            return {
+                "steps": self.steps,
+                "drafted_tokens": self.drafted_tokens,
+                "accepted_tokens": self.accepted_tokens,
+                "acceptance_rate": round(self.accepted_tokens / self.drafted_tokens, 4) if self.drafted_tokens else None,
+            }
+
+    def _next_token(self, logits, generated):
+        """贪心选择下一个token，对已生成的token施加重复惩罚"""
+        logits = logits.float().clone()
+        if generated and self.repetition_penalty != 1.0:
+            seen = torch.tensor(sorted(set(generated)), dtype=torch.long, device=logits.device)
+            scores = logits[seen]
+            logits[seen] = torch.where(
+                scores > 0, scores / self.repetition_penalty, scores * self.repetition_penalty
+            )
+        return int(torch.argmax(logits))
+
+
+class PrefixKVCache:
+    """提示词固定前缀的KV缓存
+
+    情感分析、回复生成等提示词模板以固定的说明文字开头，客户相关的内容放在末尾。
+    加载模型时对每个固定前缀（连同ChatML的system部分）预填充一次并保存past_key_values，
+    之后的请求只需预填充客户相关的后缀，再用贪心解码逐个生成token。
+
+    前缀和后缀分别分词后拼接，与整段分词在边界处可能略有差异，因此前缀应以换行结尾。
+    """
+
+    def __init__(self, model, tokenizer, prefixes=(), system=DEFAULT_SYSTEM, repetition_penalty=1.1, decoder=None):
+        self.decoder = decoder or KVDecoder(model, tokenizer, repetition_penalty)
+        self.model = model
+        self.tokenizer = tokenizer
+        self.system = system
+        self.device = self.decoder.device
+        self._entries = []
+        self._lock = threading.Lock()
+        # 统计
+        self.calls = 0
+        self.reused_tokens = 0
+        self.prefilled_tokens = 0
+        self.prefill_seconds = 0.0
+        self.saved_seconds = 0.0
+        for prefix in prefixes:
+            self.register(prefix)
+
+    @staticmethod
+    def supported(model):
+        """只有torch模型才能直接调用前向计算，测试用的替身模型不使用前缀缓存"""
+        return isinstance(model, torch.nn.Module)
+
+    def _split(self, prompt, prefix):
+        """把单轮对话的完整ChatML文本在前缀末尾处切开，返回(前缀部分, 后缀部分)"""
+        chat = build_chat_prompt(prompt, system=self.system)
+        cut = chat.index(prompt) + len(prefix)
+        return chat[:cut], chat[cut:]
+
+    def register(self, prefix):
+        """预填充一个固定前缀并保存其KV缓存"""
+        chat_prefix, _ = self._split(prefix, prefix)
+        ids = self.tokenizer.encode(chat_prefix)
+        start = time.perf_counter()
+        with torch.no_grad():
+            output = self.model(
+                input_ids=torch.tensor([ids], dtype=torch.long, device=self.device),
+                use_cache=True
+            )
+        elapsed = time.perf_counter() - start
+        self._entries.append({
+            "prefix": prefix,
+            "length": len(ids),
+            "ids": ids,
+            "past": output.past_key_values,
+            "prefill_seconds": elapsed,
+        })
+        # 优先匹配较长的前缀
+        self._entries.sort(key=lambda entry: len(entry["prefix"]), reverse=True)
+        logger.info(f"已缓存提示词前缀: {len(ids)} 个token，预填充耗时 {elapsed:.3f}s")
+
+    def match(self, prompt):
+        """返回提示词以之开头的已缓存前缀，没有则返回None"""
+        for entry in self._entries:
+            if prompt.startswith(entry["prefix"]):
+                return entry
+        return None
+
+    def generate(self, prompt, max_new_tokens=512):
+        """复用前缀缓存生成回复，提示词不匹配任何前缀时返回None"""
+        if self.match(prompt) is None:
+            return None
+        text = ""
+        for text in self.generate_stream(prompt, max_new_tokens):
+            pass
+        return text
+
+    def generate_stream(self, prompt, max_new_tokens=512):
+        """复用前缀缓存流式生成，每次产出截至当前的完整回复（与chat_stream一致）"""
+        entry = self.match(prompt)
+        if entry is None:
+            raise ValueError("提示词不以任何已缓存的前缀开头")
+        _, chat_suffix = self._split(prompt, entry["prefix"])
+        suffix_ids = self.tokenizer.encode(chat_suffix)
+        result = {}
+        try:
+            for text in self.decoder.stream(
+                suffix_ids, self.decoder.fresh_past(entry["past"]), entry["length"], max_new_tokens, result,
+                context=entry["ids"]
+            ):
+                yield text
+        finally:
+            if "prefill_seconds" in result:
+                self._record(entry, len(suffix_ids), result["prefill_seconds"])
+
+    def _record(self, entry, suffix_tokens, elapsed):
+        with self._lock:
+            self.calls += 1
+            self.reused_tokens += entry["length"]
+            self.prefilled_tokens += suffix_tokens
+            self.prefill_seconds += elapsed
+            self.saved_seconds += entry["prefill_seconds"]
+        logger.info(
+            f"前缀缓存: 复用 {entry['length']} 个token，预填充 {suffix_tokens} 个token "
+            f"耗时 {elapsed:.3f}s，约节省 {entry['prefill_seconds']:.3f}s"
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "prefixes": len(self._entries),
+                "calls": self.calls,
+                "reused_tokens": self.reused_tokens,
+                "prefilled_tokens": self.prefilled_tokens,
+                "prefill_seconds": round(self.prefill_seconds, 3),
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
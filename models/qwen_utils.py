@@ -0,0 +1,68 @@
+DEFAULT_SYSTEM = "You are a helpful assistant."
+
+
+def build_chat_prompt(query, history=None, system=DEFAULT_SYSTEM):
+    """按Qwen的ChatML格式拼接对话，与qwen_model.chat使用的格式一致"""
+    parts = [f"<|im_start|>system\n{system}<|im_end|>"]
+    for user_turn, assistant_turn in history or []:
+        parts.append(f"<|im_start|>user\n{user_turn}<|im_end|>")
+        parts.append(f"<|im_start|>assistant\n{assistant_turn}<|im_end|>")
+    parts.append(f"<|im_start|>user\n{query}<|im_end|>")
+    parts.append("<|im_start|>assistant\n")
+    return "\n".join(parts)
+
+
+def stop_token_ids(tokenizer):
+    """生成结束标记：Qwen的<|im_end|>和<|endoftext|>，其他分词器使用eos"""
+    ids = [getattr(tokenizer, name, None) for name in ("im_end_id", "eod_id")]
+    ids = [i for i in ids if i is not None]
+    if not ids and tokenizer.eos_token_id is not None:
+        ids = [tokenizer.eos_token_id]
+    return ids
+
+
+def pad_token_id(tokenizer):
+    """Qwen分词器没有pad标记，左填充时用<|endoftext|>占位（注意力掩码会屏蔽它）"""
+    for name in ("pad_token_id", "eod_id", "eos_token_id"):
+        value = getattr(tokenizer, name, None)
+        if value is not None:
+            return value
+    return 0
+
+
+def decode_reply(tokenizer, token_ids, stop_ids):
+    """截断到第一个结束标记并解码"""
+    token_ids = list(token_ids)
+    for i, token in enumerate(token_ids):
+        if token in stop_ids:
+            token_ids = token_ids[:i]
+            break
+    return tokenizer.decode(token_ids, skip_special_tokens=True).strip()
+
+
+def batch_chat(model, tokenizer, queries, max_new_tokens=512):
+    """对多条单轮对话做一次左填充的批量生成，返回与queries顺序一致的回复"""
+    if not queries:
+        return []
+    import torch
+    device = next(model.parameters()).device
+    stop_ids = stop_token_ids(tokenizer)
+    pad_id = pad_token_id(tokenizer)
+
+    encoded = [tokenizer.encode(build_chat_prompt(q)) for q in queries]
+    max_len = max(len(ids) for ids in encoded)
+    input_ids = torch.full((len(encoded), max_len), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(encoded), max_len), dtype=torch.long)
+    for row, ids in enumerate(encoded):
+        input_ids[row, max_len - len(ids):] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, max_len - len(ids):] = 1
+
+    with torch.no_grad():
+        output = model.generate(
+            input_ids.to(device),
+            attention_mask=attention_mask.to(device),
+            max_new_tokens=max_new_tokens,
+            pad_token_id=pad_id,
+            eos_token_id=stop_ids,
+        )
+    return [decode_reply(tokenizer, row[max_len:].tolist(), stop_ids) for row in output]
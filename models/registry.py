@@ -0,0 +1,147 @@
+import os
+import logging
+
+from utils import config
+
+logger = logging.getLogger("registry")
+
+# 模型注册表：按utils/config.py（可被同名环境变量覆盖）定位模型，
+# 优先从MODELS_DIR加载本地副本，离线模式下找不到本地副本直接报错而不访问模型仓库。
+
+MODEL_NAMES = ("whisper", "emotion", "qwen")
+
+
+def local_model_path(model_id):
+    """返回模型在MODELS_DIR中的本地副本路径，没有时返回None
+
+    model_id本身是已存在的路径时直接使用；否则依次查找 MODELS_DIR/组织/名称 和 MODELS_DIR/名称。
+    """
+    if os.path.exists(model_id):
+        return model_id
+    for candidate in (model_id, os.path.basename(model_id.rstrip("/"))):
+        path = os.path.join(config.MODELS_DIR, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _require_local(name, model_id):
+    if config.MODELS_OFFLINE:
+        raise FileNotFoundError(f"离线模式下未在{config.MODELS_DIR}中找到{name}模型: {model_id}")
+    logger.info(f"本地没有{name}模型，从模型仓库下载: {model_id}")
+
+
+def load_whisper():
+    import whisper
+    size = config.WHISPER_MODEL_SIZE
+    root = os.path.join(config.MODELS_DIR, "whisper")
+    # WHISPER_MODEL_SIZE也可以直接给出检查点文件的路径
+    checkpoint = size if os.path.isfile(size) else os.path.join(root, f"{size}.pt")
+    if os.path.isfile(checkpoint):
+        return whisper.load_model(checkpoint)
+    _require_local("whisper", size)
+    # 下载到MODELS_DIR/whisper，之后即可离线加载
+    return whisper.load_model(size, download_root=root)
+
+
+def load_emotion2vec():
+    # 导入FunASR
+    from funasr import AutoModel
+    path = local_model_path(config.EMOTION2VEC_MODEL)
+    if path is not None:
+        return AutoModel(model=path, disable_update=True)
+    _require_local("emotion", config.EMOTION2VEC_MODEL)
+    return AutoModel(model=config.EMOTION2VEC_MODEL, hub=config.EMOTION2VEC_HUB)
+
+
+def load_causal_lm(model_id, name="qwen"):
+    """加载因果语言模型和分词器，优先使用MODELS_DIR中的本地副本"""
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    path = local_model_path(model_id)
+    if path is None:
+        _require_local(name, model_id)
+    model_name = path or model_id
+    local_only = path is not None
+    tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True, local_files_only=local_only)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        device_map="auto",
+        trust_remote_code=True,
+        local_files_only=local_only
+    )
+    return model, tokenizer
+
+
+def load_qwen():
+    return load_causal_lm(config.QWEN_MODEL_PATH)
+
+
+# 模型名称 -> 默认加载函数
+MODEL_LOADERS = {
+    "whisper": load_whisper,
+    "emotion": load_emotion2vec,
+    "qwen": load_qwen,
+}
+
+
+def _standin_whisper():
+    from models.standins import RuleBasedWhisper
+    return RuleBasedWhisper()
+
+
+def _standin_emotion():
+    from models.standins import EnergyEmotionModel
+    return EnergyEmotionModel()
+
+
+def _standin_qwen():
+    from models.standins import RuleBasedQwen
+    return RuleBasedQwen(), None
+
+
+def _standin_tiny_qwen():
+    from models.standins import tiny_qwen
+    return tiny_qwen()
+
+
+# 模型名称 -> {替身类型: 加载函数}，第一个为默认类型
+STANDIN_LOADERS = {
+    "whisper": {"rule": _standin_whisper},
+    "emotion": {"rule": _standin_emotion},
+    "qwen": {"rule": _standin_qwen, "tiny": _standin_tiny_qwen},
+}
+
+
+def parse_standins(spec):
+    """解析替身模型配置，返回 {模型名称: 替身类型}
+
+    spec可以是字典、名称列表或逗号分隔的字符串，例如 "whisper,emotion,qwen=tiny"；
+    all表示全部模型使用默认类型的替身。
+    """
+    if not spec:
+        return {}
+    if isinstance(spec, dict):
+        items = list(spec.items())
+    else:
+        if isinstance(spec, str):
+            spec = [item for item in spec.split(",") if item.strip()]
+        items = [tuple(item.split("=", 1)) if "=" in item else (item, None) for item in spec]
+    standins = {}
+    for name, kind in items:
+        name = name.strip()
+        kind = kind.strip() if kind else None
+        names = MODEL_NAMES if name == "all" else (name,)
+        for model in names:
+            if model not in STANDIN_LOADERS:
+                raise ValueError(f"未知的模型名称: {model}")
+            kinds = STANDIN_LOADERS[model]
+            if kind is not None and kind not in kinds:
+                raise ValueError(f"{model}模型没有替身类型 {kind}，可选: {', '.join(kinds)}")
+            standins[model] = kind or next(iter(kinds))
+    return standins
+
+
+def standin_loader(name, kind=None):
+    """返回指定替身模型的无参加载函数"""
+    kinds = STANDIN_LOADERS[name]
+    return kinds[kind or next(iter(kinds))]
@@ -0,0 +1,78 @@
+import zlib
+
+# 模板回复：知识库或意图命中时不经过大模型，按客户的具体情感给固定答案加上合适的开头
+
+NEGATIVE_EMOTIONS = ("愤怒", "失望", "悲伤", "厌恶", "恐惧", "担忧", "焦虑", "不满", "烦躁", "无语")
+POSITIVE_EMOTIONS = ("高兴", "感激", "满意", "喜爱", "惊喜", "安心")
+
+
+def emotion_opening(specific_emotion):
+    """按具体情感选择回复开头"""
+    if specific_emotion in NEGATIVE_EMOTIONS:
+        return f"非常理解您现在{specific_emotion}的心情，给您带来不便真的很抱歉。"
+    if specific_emotion in POSITIVE_EMOTIONS:
+        return "感谢您的认可，很高兴能帮到您。"
+    return "您好，感谢您的咨询。"
+
+
+def emotion_category(specific_emotion, emotions=None):
+    """具体情感归为negative/positive/neutral，具体情感未知时按情感分布的主导类别"""
+    if specific_emotion in NEGATIVE_EMOTIONS:
+        return "negative"
+    if specific_emotion in POSITIVE_EMOTIONS:
+        return "positive"
+    if emotions and specific_emotion in (None, "未知"):
+        dominant = max(emotions, key=emotions.get)
+        return {"积极": "positive", "消极": "negative"}.get(dominant, "neutral")
+    return "neutral"
+
+
+def compose_answer(answer, specific_emotion, emotions=None):
+    """知识库答案加上与情感相符的开头；情感负面时补充一句跟进承诺"""
+    category = emotion_category(specific_emotion, emotions)
+    if specific_emotion in (None, "未知"):
+        # 只有情感分布时用该类别的典型情感
+        specific_emotion = {"negative": "不满", "positive": "满意"}.get(category)
+    opening = emotion_opening(specific_emotion)
+    closing = "如果还有问题，我会一直跟进到您满意为止。" if category == "negative" else ""
+    return opening + answer + closing
+
+
+# 可以直接用模板回复的简单意图 -> 候选回复
+INTENT_TEMPLATES = {
+    "greeting": [
+        "您好，很高兴为您服务，请问有什么可以帮您？",
+        "您好，我是智能客服，请问遇到了什么问题？",
+    ],
+    "thanks": [
+        "不客气，很高兴能帮到您！如果还有其他问题，随时联系我们。",
+        "不用客气，这是我们应该做的，祝您生活愉快！",
+    ],
+    "goodbye": [
+        "感谢您的咨询，祝您生活愉快，再见！",
+        "好的，有需要随时找我们，再见！",
+    ],
+    "transfer_human": [
+        "好的，正在为您转接人工客服，请稍候；人工客服服务时间为每天9:00-22:00。",
+    ],
+}
+
+# 客户情绪负面时仍然可以用模板回复的意图
+NEGATIVE_OK_INTENTS = ("transfer_human",)
+
+
+def intent_reply(intent, text, specific_emotion, emotions=None):
+    """简单意图的模板回复，没有模板或客户情绪负面时返回None，交给知识库或大模型
+
+    同一句话总是得到同一个候选回复。
+    """
+    templates = INTENT_TEMPLATES.get(intent)
+    if not templates:
+        return None
+    negative = emotion_category(specific_emotion, emotions) == "negative"
+    if negative and intent not in NEGATIVE_OK_INTENTS:
+        return None
+    reply = templates[zlib.crc32(text.encode("utf-8")) % len(templates)]
+    if negative:
+        reply = emotion_opening(specific_emotion if specific_emotion in NEGATIVE_EMOTIONS else "不满") + reply
+    return reply
@@ -0,0 +1,117 @@
+import time
+import uuid
+import threading
+from collections import deque
+
+from models.conversation_memory import ConversationMemory
+
+
+class TurnContext:
+    """单轮对话的情感上下文
+
+    一轮中情感分析的中间结果（具体情感、emotion2vec原始分数、多模态融合结果）保存在这里，
+    由调用方在分析和生成回复之间传递，不再存放在共享的ModelManager上，
+    因此多个会话可以在不同线程中同时使用同一个ModelManager。
+    """
+
+    def __init__(self, session_id=None, memory=None):
+        self.session_id = session_id
+        self.memory = memory  # 所属会话的对话记忆，为None时按单轮对话生成回复
+        self.text_emotions = None  # {"distribution": 情感分布, "specific": 具体情感}
+        self.audio_scores = None  # emotion2vec的9类原始分数 {标签: 分数}
+        self.multimodal = None  # 多模态融合结果
+        self.knowledge = None  # 知识库检索结果，得分不低于参考阈值的问答
+        self.intent = None  # 意图识别结果 {"intent", "confidence"}
+        self.timings = {}
+
+    @property
+    def specific_emotion(self):
+        """本轮已知的具体情感，优先使用文本分析结果"""
+        if self.multimodal is not None:
+            return self.multimodal.get("text_specific", "未知")
+        if self.text_emotions is not None:
+            return self.text_emotions.get("specific", "未知")
+        return "未知"
+
+    def __repr__(self):
+        return f"TurnContext(session={self.session_id}, specific={self.specific_emotion})"
+
+
+class Session:
+    """一个客户会话：保存对话历史，每轮创建新的TurnContext"""
+
+    def __init__(self, session_id=None, max_history=50, memory_budget=1024):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.history = deque(maxlen=max_history)  # [{"text", "response", "emotions"}, ...]
+        self.turn_count = 0
+        self.memory = ConversationMemory(memory_budget)  # 送入模型的多轮上下文
+        self._lock = threading.Lock()
+
+    def new_turn(self):
+        with self._lock:
+            self.turn_count += 1
+            self.last_active = time.time()
+        return TurnContext(self.session_id, self.memory)
+
+    def record(self, text, response, emotions=None):
+        """记录一轮完整的对话"""
+        with self._lock:
+            self.history.append({"text": text, "response": response, "emotions": emotions})
+            self.last_active = time.time()
+
+    def idle_time(self, now=None):
+        return (now or time.time()) - self.last_active
+
+
+class SessionRegistry:
+    """线程安全的会话表，按会话ID查找或创建会话，空闲超过ttl秒的会话会被清理"""
+
+    def __init__(self, ttl=1800, max_sessions=10000, max_history=50, memory_budget=1024):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self.memory_budget = memory_budget
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id=None):
+        """返回已有会话；session_id为None或不存在时创建新会话"""
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                if len(self._sessions) >= self.max_sessions:
+                    self._expire_locked()
+                if len(self._sessions) >= self.max_sessions:
+                    # 仍然已满时淘汰最久未活动的会话
+                    oldest = min(self._sessions.values(), key=lambda s: s.last_active)
+                    del self._sessions[oldest.session_id]
+                session = Session(session_id, self.max_history, self.memory_budget)
+                self._sessions[session.session_id] = session
+            return session
+
+    def close(self, session_id):
+        """结束会话，返回是否存在该会话"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def expire(self):
+        """清理空闲超时的会话，返回清理数量"""
+        with self._lock:
+            return self._expire_locked()
+
+    def _expire_locked(self):
+        now = time.time()
+        expired = [sid for sid, s in self._sessions.items() if s.idle_time(now) > self.ttl]
+        for sid in expired:
+            del self._sessions[sid]
+        return len(expired)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
@@ -0,0 +1,144 @@
+import logging
+import threading
+
+logger = logging.getLogger("speculative")
+
+# 推测解码的草稿来源：草稿一次提出若干个token，由Qwen在一次前向计算中逐个验证，
+# 接受与贪心解码结果一致的最长前缀。草稿只影响速度，不影响输出。
+
+
+class NgramDraft:
+    """n-gram草稿：取上下文末尾的n个token，在当前上下文（提示词查找）和历史回复中
+    找到最近一次出现的位置，把其后的token作为草稿
+
+    客服回复经常复述客户的话、重复固定的说法，n-gram草稿无需额外模型即可命中这些片段。
+    """
+
+    def __init__(self, max_ngram=3, min_ngram=2, max_tokens=8, max_history_tokens=100000):
+        self.max_ngram = max_ngram
+        self.min_ngram = min_ngram
+        self.max_tokens = max_tokens
+        self.max_history_tokens = max_history_tokens
+        self._replies = []  # 历史回复的token序列
+        self._history_tokens = 0
+        self._index = {}  # n-gram -> (回复序号, n-gram之后的位置)，保留最近一次出现
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _lookup(context, key):
+        """在context中从后往前找key最近一次出现（不含末尾本身），返回其后的位置"""
+        n = len(key)
+        for start in range(len(context) - n - 1, -1, -1):
+            if tuple(context[start:start + n]) == key:
+                return start + n
+        return None
+
+    def propose(self, context, k):
+        for n in range(min(self.max_ngram, len(context)), self.min_ngram - 1, -1):
+            key = tuple(context[-n:])
+            position = self._lookup(context, key)
+            if position is not None:
+                return list(context[position:position + k])
+            with self._lock:
+                hit = self._index.get(key)
+                if hit is not None:
+                    reply, position = hit
+                    return list(self._replies[reply][position:position + k])
+        return []
+
+    def add(self, tokens):
+        """把一条回复加入历史，超出上限时丢弃最早的回复并重建索引"""
+        tokens = list(tokens)
+        if len(tokens) <= self.min_ngram:
+            return
+        with self._lock:
+            self._replies.append(tokens)
+            self._history_tokens += len(tokens)
+            if self._history_tokens > self.max_history_tokens:
+                while self._history_tokens > self.max_history_tokens // 2:
+                    self._history_tokens -= len(self._replies.pop(0))
+                self._index = {}
+                for i in range(len(self._replies)):
+                    self._index_reply(i)
+            else:
+                self._index_reply(len(self._replies) - 1)
+
+    def _index_reply(self, i):
+        tokens = self._replies[i]
+        for n in range(self.min_ngram, self.max_ngram + 1):
+            for end in range(n, len(tokens)):
+                self._index[tuple(tokens[end - n:end])] = (i, end)
+
+
+class ModelDraft:
+    """小模型草稿：用与Qwen共享词表的小模型贪心生成草稿
+
+    保留上一次草稿的KV缓存，新的上下文与之取公共前缀后只预填充新增的token。
+    """
+
+    def __init__(self, model, max_tokens=4):
+        import torch
+        self.torch = torch
+        self.model = model
+        self.max_tokens = max_tokens
+        self.device = next(model.parameters()).device
+        from models.prefix_cache import KVDecoder
+        self.seq_dim = KVDecoder.past_seq_dim(model)
+        self._ids = []
+        self._past = None
+        self._lock = threading.Lock()
+
+    def _forward(self, ids, past, total):
+        torch = self.torch
+        output = self.model(
+            input_ids=torch.tensor([ids], dtype=torch.long, device=self.device),
+            past_key_values=past,
+            attention_mask=torch.ones((1, total), dtype=torch.long, device=self.device),
+            use_cache=True
+        )
+        return int(torch.argmax(output.logits[0, -1])), output.past_key_values
+
+    def propose(self, context, k):
+        from models.prefix_cache import KVDecoder
+        with self._lock, self.torch.no_grad():
+            common = 0
+            limit = min(len(self._ids), len(context) - 1)
+            while common < limit and self._ids[common] == context[common]:
+                common += 1
+            past = KVDecoder.crop_past(self._past, common, len(self._ids), self.seq_dim) if common else None
+            token, past = self._forward(list(context[common:]), past, len(context))
+            proposal = [token]
+            while len(proposal) < k:
+                token, past = self._forward([token], past, len(context) + len(proposal))
+                proposal.append(token)
+            # 缓存覆盖上下文和除最后一个之外的草稿token
+            self._ids = list(context) + proposal[:-1]
+            self._past = past
+            return proposal
+
+
+def tokenizers_compatible(tokenizer, other):
+    """两个分词器对同一段包含中文和ChatML标记的文本给出相同的token"""
+    from models.qwen_utils import build_chat_prompt
+    sample = build_chat_prompt("您好，我的订单为什么还没有发货？Order 12345")
+    try:
+        return tokenizer.encode(sample) == other.encode(sample)
+    except Exception:
+        return False
+
+
+def build_draft(spec, tokenizer):
+    """按配置创建草稿：ngram，或小模型的ID/路径（按models/registry.py的规则加载）
+
+    小模型的分词器与Qwen不一致时无法验证草稿，记录警告并返回None。
+    """
+    if not spec:
+        return None
+    if spec == "ngram":
+        return NgramDraft()
+    from models.registry import load_causal_lm
+    model, draft_tokenizer = load_causal_lm(spec)
+    if not tokenizers_compatible(tokenizer, draft_tokenizer):
+        logger.warning(f"草稿模型 {spec} 的分词器与Qwen不一致，不使用推测解码")
+        return None
+    return ModelDraft(model)
@@ -0,0 +1,221 @@
+import re
+import json
+import zlib
+
+import numpy as np
+
+from models.emotion_lexicon import LexiconEmotionClassifier
+from models.qwen_utils import DEFAULT_SYSTEM, build_chat_prompt
+from models.response_generator import emotion_opening
+from utils.audio_data import AudioData
+from utils.vad import speech_segments
+
+# 替身模型：与真实模型接口相同、无需下载权重的轻量实现，用于离线环境下跑通完整流水线和性能测试
+#   rule: 规则实现，毫秒级、输出确定，回复内容可读
+#   tiny: 随机权重的小型因果语言模型（仅Qwen），走真实的torch前向、KV缓存和批量生成路径
+
+SAMPLE_RATE = 16000
+
+# 替身Whisper按音频内容哈希从中选取转写文本
+STANDIN_TRANSCRIPTS = [
+    "我的订单三天了还没发货，怎么回事",
+    "谢谢你们的帮助，问题已经解决了",
+    "这个产品质量太差了，我要投诉",
+    "请问怎么修改收货地址",
+    "等了一个小时都没人理我，太让人失望了",
+    "能不能帮我看看退款到哪一步了",
+]
+
+
+def _waveform(audio, fs=SAMPLE_RATE):
+    """把路径、AudioData或波形统一为16kHz的float32波形"""
+    if isinstance(audio, str):
+        audio = AudioData.from_file(audio)
+    if isinstance(audio, AudioData):
+        return audio.resample(SAMPLE_RATE).samples
+    samples = np.asarray(audio, dtype=np.float32)
+    if fs != SAMPLE_RATE:
+        samples = AudioData(samples, fs).resample(SAMPLE_RATE).samples
+    return samples
+
+
+class RuleBasedWhisper:
+    """Whisper替身：按能量切分语音片段，每个片段给出一句固定的转写文本"""
+
+    def __init__(self, transcripts=None):
+        self.transcripts = transcripts or STANDIN_TRANSCRIPTS
+
+    def transcribe(self, audio, language=None, task="transcribe", initial_prompt=None, **kwargs):
+        samples = _waveform(audio)
+        segments = []
+        for start, end in speech_segments(samples, SAMPLE_RATE):
+            # 同一段音频总是得到相同的文本
+            index = zlib.crc32(samples[start:end].tobytes()) % len(self.transcripts)
+            segments.append({
+                "start": start / SAMPLE_RATE,
+                "end": end / SAMPLE_RATE,
+                "text": self.transcripts[index],
+            })
+        text = "，".join(s["text"] for s in segments)
+        return {"text": text, "segments": segments, "language": language or "zh"}
+
+
+class EnergyEmotionModel:
+    """emotion2vec替身：由响度、响度起伏和过零率粗略估计9类情感分数
+
+    响亮且起伏大偏生气，响亮且尖锐偏高兴/惊讶，轻声偏悲伤，其余偏中性。
+    分数顺序与emotion2vec一致。
+    """
+
+    def generate(self, input, fs=SAMPLE_RATE, granularity="utterance", extract_embedding=False, **kwargs):
+        samples = _waveform(input, fs)
+        if len(samples) == 0:
+            loudness, variation, zcr = -100.0, 0.0, 0.0
+        else:
+            frame = SAMPLE_RATE // 50
+            n_frames = max(1, len(samples) // frame)
+            frames = np.resize(samples, n_frames * frame).reshape(n_frames, frame)
+            rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+            db = 20.0 * np.log10(np.maximum(rms, 1e-10))
+            loudness, variation = float(np.max(db)), float(np.std(db))
+            zcr = float(np.mean(np.abs(np.diff(np.signbit(samples).astype(np.int8)))))
+        loud = np.clip((loudness + 30.0) / 20.0, 0.0, 1.0)  # -30dB到-10dB之间线性增大
+        quiet = 1.0 - loud
+        lively = np.clip(variation / 10.0, 0.0, 1.0)
+        sharp = np.clip(zcr / 0.2, 0.0, 1.0)
+        # 顺序: 生气、厌恶、恐惧、高兴、中性、其他、悲伤、惊讶、未知
+        logits = np.array([
+            3 * loud * lively, loud * lively, quiet * lively,
+            2 * loud * sharp, 1.5 * (1 - lively), -2.0,
+            2 * quiet * (1 - sharp), loud * sharp * lively, -2.0,
+        ])
+        scores = np.exp(logits - logits.max())
+        scores /= scores.sum()
+        return [{"key": "standin", "scores": [round(float(s), 4) for s in scores]}]
+
+
+class RuleBasedQwen:
+    """Qwen替身：按提示词类型用词典分类器和模板生成情感JSON、回复或摘要
+
+    接口与Qwen的chat/chat_stream一致，多轮对话时固定说明在system中，因此同时检查system和消息。
+    """
+
+    def __init__(self, classifier=None):
+        self.classifier = classifier or LexiconEmotionClassifier()
+
+    def chat(self, tokenizer, query, history=None, system=None, **kwargs):
+        response = self._respond(query, system or "")
+        return response, list(history or []) + [(query, response)]
+
+    def chat_stream(self, tokenizer, query, history=None, system=None, **kwargs):
+        response = self._respond(query, system or "")
+        # 与Qwen的chat_stream相同，产出截至当前的完整回复
+        for end in range(1, len(response) + 1):
+            yield response[:end]
+
+    def _respond(self, query, system):
+        prompt = system + "\n" + query
+        if "对话压缩成一段简短的摘要" in prompt:
+            customer = re.findall(r"客户: (.*)", query)
+            return "；".join(customer)[:100]
+
+        match = re.search(r'(?:文本|客户说): "(.*)"', query, re.S)
+        text = match.group(1) if match else query
+        result = self.classifier.predict(text)
+        if "需要分析的文本如下" in prompt:
+            dominant = max(result["distribution"], key=result["distribution"].get)
+            return json.dumps({
+                "情感分布": result["distribution"], "主导情感": dominant, "具体情感": result["specific"]
+            }, ensure_ascii=False)
+        specific = re.search(r"注意客户表现出的(\S+?)情感", query)
+        reply = self._reply(text, specific.group(1) if specific else result["specific"])
+        if '"回复"' in prompt:
+            return json.dumps({
+                "情感分布": result["distribution"], "具体情感": result["specific"], "回复": reply
+            }, ensure_ascii=False)
+        return reply
+
+    @staticmethod
+    def _reply(text, specific):
+        return f"{emotion_opening(specific)}关于“{text[:30]}”，我已经为您记录，会尽快核实处理并第一时间回复您。"
+
+
+class ByteTokenizer:
+    """按UTF-8字节切分的分词器，认识Qwen的ChatML特殊标记，供随机权重的小模型使用"""
+
+    SPECIAL_TOKENS = ("<|endoftext|>", "<|im_start|>", "<|im_end|>")
+
+    def __init__(self):
+        self.eod_id, self.im_start_id, self.im_end_id = 256, 257, 258
+        self.vocab_size = 256 + len(self.SPECIAL_TOKENS)
+        self.eos_token_id = self.im_end_id
+        self._special = {token: 256 + i for i, token in enumerate(self.SPECIAL_TOKENS)}
+        self._pattern = re.compile("(" + "|".join(re.escape(t) for t in self.SPECIAL_TOKENS) + ")")
+
+    def encode(self, text):
+        ids = []
+        for part in self._pattern.split(text):
+            if part in self._special:
+                ids.append(self._special[part])
+            elif part:
+                ids.extend(part.encode("utf-8"))
+        return ids
+
+    def decode(self, ids, skip_special_tokens=False):
+        data = bytearray()
+        for i in ids:
+            if i < 256:
+                data.append(i)
+            elif not skip_special_tokens:
+                data.extend(self.SPECIAL_TOKENS[i - 256].encode("utf-8"))
+        return data.decode("utf-8", errors="replace")
+
+
+def tiny_qwen(seed=0, hidden_size=64, num_layers=2, mean_new_tokens=24):
+    """随机权重的两层Llama模型和字节分词器
+
+    模型带有与Qwen相同的chat/chat_stream方法。随机权重几乎不会生成结束标记，
+    因此序列长度每到mean_new_tokens的整数倍就强制输出<|im_end|>，回复长度不超过
+    mean_new_tokens个token，与真实模型的短回复相当，而不是每次都生成到max_new_tokens。
+    """
+    import torch
+    from transformers import LlamaConfig, LlamaForCausalLM
+    from models.prefix_cache import KVDecoder
+
+    class TinyChatModel(LlamaForCausalLM):
+        def forward(self, input_ids=None, attention_mask=None, **kwargs):
+            output = super().forward(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+            if attention_mask is not None:
+                # 注意力掩码覆盖全部已计算的token，据此得到每个输出位置的序列长度
+                end = attention_mask.shape[1]
+                lengths = torch.arange(end - output.logits.shape[1] + 1, end + 1, device=output.logits.device)
+                stop = (lengths % mean_new_tokens == 0).view(1, -1)
+                output.logits[..., tokenizer.im_end_id] = torch.where(stop, 1e4, -1e4).to(output.logits.dtype)
+            return output
+
+        def chat(self, tokenizer, query, history=None, system=DEFAULT_SYSTEM, **kwargs):
+            response = ""
+            for response in self.chat_stream(tokenizer, query, history, system):
+                pass
+            return response, list(history or []) + [(query, response)]
+
+        def chat_stream(self, tokenizer, query, history=None, system=DEFAULT_SYSTEM, **kwargs):
+            ids = tokenizer.encode(build_chat_prompt(query, history, system or DEFAULT_SYSTEM))
+            yield from KVDecoder(self, tokenizer).stream(ids)
+
+    torch.manual_seed(seed)
+    tokenizer = ByteTokenizer()
+    model = TinyChatModel(LlamaConfig(
+        vocab_size=tokenizer.vocab_size,
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 2,
+        num_hidden_layers=num_layers,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=8192,
+        bos_token_id=tokenizer.im_start_id,
+        eos_token_id=tokenizer.im_end_id,
+        pad_token_id=tokenizer.eod_id,
+    ))
+    model.eval()
+    return model, tokenizer
@@ -0,0 +1,127 @@
+from collections import deque
+
+import numpy as np
+
+from utils.vad import EnergyVAD
+
+
+class StreamingRecognizer:
+    """流式语音识别：边接收音频块边输出部分和最终转写
+
+    用能量VAD切分语音段：静音超过endpoint_silence_ms即认为一句话结束，对整段解码一次
+    输出final结果，之后这段音频被丢弃、不再参与解码；说话过程中每隔partial_interval秒
+    对当前语音段（不超过max_segment_s）解码一次输出partial结果。开头和句间的静音不送入模型。
+    事件格式: {"type": "partial"/"final", "text": 文本, "start": 秒, "end": 秒}
+    """
+
+    def __init__(self, transcribe, sample_rate=16000, vad=None, partial_interval=1.0,
+                 endpoint_silence_ms=600, max_segment_s=25.0, padding_ms=200):
+        self.transcribe = transcribe  # 函数: float32波形 -> 文本
+        self.sample_rate = sample_rate
+        self.vad = vad or EnergyVAD(sample_rate)
+        self.frame_size = self.vad.frame_size
+        self.partial_samples = int(partial_interval * sample_rate)
+        self.endpoint_frames = max(1, int(endpoint_silence_ms / self.vad.frame_ms))
+        self.max_segment_samples = int(max_segment_s * sample_rate)
+        self._preroll = deque(maxlen=max(1, int(padding_ms / self.vad.frame_ms)))
+        self._pending = np.zeros(0, dtype=np.float32)  # 不足一帧、尚未做VAD的样本
+        self._position = 0  # 已做VAD的样本总数，用于计算时间戳
+        self._reset_segment()
+
+    def _reset_segment(self):
+        self._segment = []
+        self._segment_start = None
+        self._segment_length = 0
+        self._silence_frames = 0
+        self._since_partial = 0
+        self._last_partial = ""
+
+    @staticmethod
+    def _to_float(chunk):
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            return np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+        return np.asarray(chunk, dtype=np.float32)
+
+    def feed(self, chunk):
+        """输入一块16位PCM字节或float32波形，返回本次产生的事件列表"""
+        samples = np.concatenate([self._pending, self._to_float(chunk)])
+        n_frames = len(samples) // self.frame_size
+        self._pending = samples[n_frames * self.frame_size:]
+        if n_frames == 0:
+            return []
+
+        frames = samples[:n_frames * self.frame_size].reshape(n_frames, self.frame_size)
+        decisions = self.vad.is_speech(frames.reshape(-1))
+        events = []
+        for frame, speech in zip(frames, decisions):
+            frame_start = self._position
+            self._position += self.frame_size
+
+            if self._segment_start is None:
+                if not speech:
+                    self._preroll.append(frame)
+                    continue
+                # 语音开始，带上之前的一小段静音避免截断字头
+                self._segment = list(self._preroll)
+                self._segment_start = frame_start - len(self._preroll) * self.frame_size
+                self._segment_length = len(self._segment) * self.frame_size
+                self._preroll.clear()
+
+            self._segment.append(frame)
+            self._segment_length += self.frame_size
+            self._since_partial += self.frame_size
+            self._silence_frames = 0 if speech else self._silence_frames + 1
+
+            if self._silence_frames >= self.endpoint_frames or self._segment_length >= self.max_segment_samples:
+                event = self._finalize()
+            elif self._since_partial >= self.partial_samples:
+                event = self._partial()
+            else:
+                event = None
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _event(self, kind, text):
+        return {
+            "type": kind,
+            "text": text,
+            "start": round(self._segment_start / self.sample_rate, 3),
+            "end": round((self._segment_start + self._segment_length) / self.sample_rate, 3),
+        }
+
+    def _partial(self):
+        self._since_partial = 0
+        text = self.transcribe(np.concatenate(self._segment)).strip()
+        if not text or text == self._last_partial:
+            return None
+        self._last_partial = text
+        return self._event("partial", text)
+
+    def _finalize(self):
+        text = self.transcribe(np.concatenate(self._segment)).strip()
+        event = self._event("final", text) if text else None
+        self._reset_segment()
+        return event
+
+    def finish(self):
+        """音频结束，解码尚未完成的语音段，返回剩余事件"""
+        events = []
+        if self._segment_start is not None:
+            if len(self._pending):
+                self._segment.append(self._pending)
+                self._segment_length += len(self._pending)
+            event = self._finalize()
+            if event is not None:
+                events.append(event)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll.clear()
+        return events
+
+    def stream(self, chunks):
+        """生成器接口：逐块消费音频，依次产出partial/final事件"""
+        for chunk in chunks:
+            for event in self.feed(chunk):
+                yield event
+        for event in self.finish():
+            yield event
@@ -0,0 +1,51 @@
+"""无界面推理服务入口
+
+用法:
+    python -m server --host 0.0.0.0 --port 8000
+"""
+import argparse
+
+import uvicorn
+
+from server.app import create_app
+from utils.metrics import metrics, set_verbose
+
+
+def main():
+    parser = argparse.ArgumentParser(description="智能客服推理服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2, help="并发执行推理的线程数")
+    parser.add_argument("--max-queue", type=int, default=64, help="排队等待推理的最大请求数")
+    parser.add_argument("--llm-batch", type=int, default=0,
+                        help="大模型微批调度的最大批大小，0表示不合并请求；启用时--workers应不小于该值，且回复不带多轮对话记忆")
+    parser.add_argument("--llm-max-wait-ms", type=float, default=10, help="凑批时最多等待的毫秒数")
+    parser.add_argument("--standins", help="使用替身模型，如 all 或 whisper,emotion,qwen=tiny；缺省时取环境变量STANDIN_MODELS")
+    parser.add_argument("--speculative", help="推测解码的草稿: ngram或小模型ID/路径；缺省时取环境变量SPECULATIVE_DRAFT")
+    parser.add_argument("--verbose", action="store_true", help="打印每次调用的模型原始输出和情感分析表格")
+    parser.add_argument("--metrics-log", action="store_true", help="每个阶段结束时输出一行JSON结构化日志")
+    args = parser.parse_args()
+
+    if args.verbose:
+        set_verbose(True)
+    if args.metrics_log:
+        metrics.structured_logs = True
+
+    manager_options = {}
+    if args.llm_batch > 0:
+        manager_options.update({
+            "llm_batching": True,
+            "llm_max_batch": args.llm_batch,
+            "llm_max_wait_ms": args.llm_max_wait_ms,
+        })
+    if args.standins:
+        manager_options["standins"] = args.standins
+    if args.speculative is not None:
+        manager_options["speculative"] = args.speculative
+    app = create_app(max_queue=args.max_queue, workers=args.workers, manager_options=manager_options)
+    # 模型只在本进程中加载一次，因此只运行一个uvicorn进程
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import io
+import os
+import wave
+import asyncio
+import logging
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from server.inference_queue import InferenceQueue, QueueFullError
+from utils.audio_data import AudioData
+from utils.metrics import metrics
+
+logger = logging.getLogger("server")
+
+# 三类情感 -> API规范中的情感标签
+SENTIMENT_LABELS = {"积极": "positive", "消极": "negative", "中性": "neutral"}
+
+
+class TextRequest(BaseModel):
+    text: str
+    session_id: Optional[str] = None  # 同一会话的多轮请求使用相同ID，不传时创建新会话
+
+
+class KnowledgeRequest(BaseModel):
+    query: str
+    top_k: int = 3
+
+
+class FeedbackHub:
+    """/feedback/ws 的连接集合，分析结果产生后推送给所有在线客户端"""
+
+    def __init__(self):
+        self._clients = set()
+
+    async def connect(self, websocket):
+        await websocket.accept()
+        self._clients.add(websocket)
+
+    def disconnect(self, websocket):
+        self._clients.discard(websocket)
+
+    async def broadcast(self, event):
+        for websocket in list(self._clients):
+            try:
+                await websocket.send_json(event)
+            except Exception:
+                self.disconnect(websocket)
+
+
+def _sentiment(emotions):
+    dominant = max(emotions, key=emotions.get)
+    return SENTIMENT_LABELS[dominant], round(emotions[dominant] / 100.0, 4)
+
+
+def _decode_upload(manager, filename, data):
+    """在内存中解码上传的WAV，其他格式落盘后交给ffmpeg"""
+    if filename.lower().endswith(".wav"):
+        try:
+            audio = AudioData.from_file(io.BytesIO(data))
+            audio.source = filename
+            return audio.resample(16000)
+        except (wave.Error, ValueError):
+            pass
+    suffix = os.path.splitext(filename)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        f.write(data)
+        path = f.name
+    try:
+        audio = manager.decode_audio(path)
+        audio.source = filename
+        return audio
+    finally:
+        os.remove(path)
+
+
+def create_app(model_manager=None, max_queue=64, workers=2, manager_options=None):
+    """创建推理服务，所有接口共享同一个ModelManager
+
+    manager_options: 未传入model_manager时创建ModelManager的额外参数，例如启用大模型微批调度
+    """
+    if model_manager is None:
+        from models.model_manager import ModelManager
+        model_manager = ModelManager(warmup=True, **(manager_options or {}))
+
+    queue = InferenceQueue(max_size=max_queue, workers=workers)
+    metrics.add_collector(queue.metric_rows)
+    hub = FeedbackHub()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await queue.start()
+        # 意图分类器在首次访问时训练，提前在线程中完成，避免第一个请求阻塞事件循环
+        await asyncio.to_thread(lambda: model_manager.intent_classifier)
+        yield
+        await queue.stop()
+
+    app = FastAPI(title="智能客服推理服务", lifespan=lifespan)
+    app.state.model_manager = model_manager
+    app.state.queue = queue
+    app.state.feedback = hub
+
+    @app.middleware("http")
+    async def trace_requests(request: Request, call_next):
+        with metrics.span("http", method=request.method) as span:
+            response = await call_next(request)
+            # 使用路由模板作为标签，避免会话ID等路径参数产生大量标签值
+            route = request.scope.get("route")
+            span.labels["path"] = route.path if route is not None else "unmatched"
+            span.labels["status"] = response.status_code
+        return response
+
+    async def run(func, *args, **kwargs):
+        try:
+            return await queue.submit(func, *args, **kwargs)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    @app.get("/health")
+    async def health():
+        return {
+            "models": {name: model_manager.ready(name) for name in ("whisper", "emotion", "qwen")},
+            "load_timings": model_manager.load_timings,
+            "backends": model_manager.active_backends,
+            "queue": queue.stats(),
+            "sessions": len(model_manager.sessions),
+            "llm_scheduler": model_manager.llm_scheduler.stats() if model_manager.llm_scheduler else None,
+        }
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def prometheus_metrics():
+        """Prometheus文本格式的运行指标"""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @app.post("/asr/batch")
+    async def asr_batch(files: list[UploadFile] = File(...), segments: bool = False):
+        """批量转写；segments为true时逐个文件转写并返回Whisper的分段时间戳（不做批量解码）"""
+        audios = []
+        for upload in files:
+            data = await upload.read()
+            try:
+                audios.append(_decode_upload(model_manager, upload.filename, data))
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"无法解码音频 {upload.filename}: {str(e)}")
+        if segments:
+            results = [await run(model_manager.transcribe_segments, audio) for audio in audios]
+            return [
+                {"file": audio.source, "transcript": result["text"], "segments": result["segments"]}
+                for audio, result in zip(audios, results)
+            ]
+        texts = await run(model_manager.recognize_batch, audios)
+        return [{"file": audio.source, "transcript": text} for audio, text in zip(audios, texts)]
+
+    @app.websocket("/asr/stream")
+    async def asr_stream(websocket: WebSocket):
+        """接收16kHz单声道16位PCM的二进制帧，实时返回partial/final转写，收到文本消息"end"后结束"""
+        await websocket.accept()
+        recognizer = model_manager.create_stream_recognizer()
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes"):
+                    events = await run(recognizer.feed, message["bytes"])
+                elif message.get("text") == "end":
+                    break
+                else:
+                    continue
+                for event in events:
+                    await websocket.send_json(event)
+            for event in await run(recognizer.finish):
+                await websocket.send_json(event)
+            await websocket.send_json({"type": "end"})
+            await websocket.close()
+        except WebSocketDisconnect:
+            pass
+        except HTTPException as e:
+            await websocket.send_json({"type": "error", "detail": e.detail})
+            await websocket.close()
+
+    @app.post("/analysis/sentiment")
+    async def analysis_sentiment(request: TextRequest):
+        session = model_manager.sessions.get(request.session_id)
+        emotions = await run(model_manager.analyze_emotion, request.text, session.new_turn())
+        sentiment, score = _sentiment(emotions)
+        result = {"session_id": session.session_id, "sentiment": sentiment, "score": score, "emotions": emotions}
+        await hub.broadcast({"type": "sentiment", "text": request.text, **result})
+        return result
+
+    @app.post("/analysis/result")
+    async def analysis_result(request: TextRequest):
+        """完整的文本轮次：情感分析 + 客服回复"""
+        session = model_manager.sessions.get(request.session_id)
+        emotions, response = await run(model_manager.analyze_and_respond, request.text, session.new_turn())
+        session.record(request.text, response, emotions)
+        sentiment, score = _sentiment(emotions)
+        result = {
+            "session_id": session.session_id,
+            "sentiment": sentiment,
+            "score": score,
+            "emotions": emotions,
+            "response": response,
+        }
+        await hub.broadcast({"type": "result", "text": request.text, **result})
+        return result
+
+    @app.post("/nlp/intent")
+    async def nlp_intent(request: TextRequest):
+        """意图识别（不经过推理队列，分类只需毫秒级；在线程中执行，分类器尚未训练时也不阻塞事件循环）"""
+        result = await asyncio.to_thread(model_manager.classify_intent, request.text)
+        if result is None:
+            raise HTTPException(status_code=404, detail="未加载意图分类器")
+        return result
+
+    @app.post("/kb/search")
+    async def kb_search(request: KnowledgeRequest):
+        """在FAQ知识库中检索，返回得分最高的top_k条问答（不经过推理队列，检索只需毫秒级）"""
+        if model_manager.knowledge_base is None:
+            raise HTTPException(status_code=404, detail="未加载知识库")
+        with metrics.span("kb_search"):
+            results = model_manager.knowledge_base.search(request.query, request.top_k)
+        return {"query": request.query, "results": results}
+
+    @app.delete("/sessions/{session_id}")
+    async def close_session(session_id: str):
+        if not model_manager.sessions.close(session_id):
+            raise HTTPException(status_code=404, detail=f"会话不存在: {session_id}")
+        return {"session_id": session_id, "closed": True}
+
+    @app.websocket("/feedback/ws")
+    async def feedback_ws(websocket: WebSocket):
+        await hub.connect(websocket)
+        try:
+            while True:
+                # 客户端消息仅用于保持连接
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            hub.disconnect(websocket)
+
+    return app
@@ -0,0 +1,91 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("inference_queue")
+
+
+class QueueFullError(Exception):
+    """推理队列已满，调用方应稍后重试"""
+
+
+class InferenceQueue:
+    """有界的异步推理队列
+
+    请求在事件循环中排队，由固定数量的worker在线程池中执行阻塞的模型调用，
+    队列满时立即拒绝而不是无限堆积，避免多个客服端同时请求时内存和延迟失控。
+    """
+
+    def __init__(self, max_size=64, workers=2):
+        self.max_size = max_size
+        self.workers = workers
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self._queue = None
+        self._tasks = []
+        self._executor = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"推理队列已启动: {self.workers} 个worker，队列上限 {self.max_size}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    async def submit(self, func, *args, **kwargs):
+        """提交阻塞函数并等待结果，队列已满时抛出QueueFullError"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((functools.partial(func, *args, **kwargs), future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"推理队列已满({self.max_size})")
+        return await future
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            call, future = await self._queue.get()
+            self.in_flight += 1
+            try:
+                result = await loop.run_in_executor(self._executor, call)
+                if not future.done():
+                    future.set_result(result)
+                self.completed += 1
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                self.failed += 1
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_max": self.max_size,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    def metric_rows(self):
+        """导出指标时调用，格式见MetricsRegistry.add_collector"""
+        stats = self.stats()
+        return [
+            ("inference_queue_depth", "gauge", "等待推理的请求数", [({}, stats["queue_depth"])]),
+            ("inference_in_flight", "gauge", "正在推理的请求数", [({}, stats["in_flight"])]),
+            ("inference_requests_total", "counter", "推理请求数",
+             [({"status": status}, stats[status]) for status in ("completed", "failed", "rejected")]),
+        ]
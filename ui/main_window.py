@@ -1,4 +1,5 @@
 import os
+import time
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QPushButton, QTextEdit, QLabel, QProgressBar,
                             QSplitter, QFrame, QFileDialog, QMessageBox, 
@@ -70,15 +71,22 @@ class BubbleWidget(QFrame):
         layout.addWidget(sender)
         
         # 消息文本 - 使用更易读的字体
-        message = QLabel(text)
-        message.setFont(QFont("Segoe UI", 10))
-        message.setWordWrap(True)
-        message.setTextInteractionFlags(Qt.TextSelectableByMouse)
-        layout.addWidget(message)
+        self.message = QLabel(text)
+        self.message.setFont(QFont("Segoe UI", 10))
+        self.message.setWordWrap(True)
+        self.message.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.message)
         
         # 设置最小和最大宽度
         self.setMinimumWidth(100)
         self.setMaximumWidth(500)
+    
+    def append_text(self, delta):
+        """追加文本，用于流式显示回复"""
+        self.message.setText(self.message.text() + delta)
+    
+    def set_text(self, text):
+        self.message.setText(text)
 
 
 class MessageItem(QWidget):
@@ -89,14 +97,14 @@ class MessageItem(QWidget):
         layout.setContentsMargins(10, 5, 10, 5)
         
         # 创建气泡小部件
-        bubble = BubbleWidget(text, is_customer)
+        self.bubble = BubbleWidget(text, is_customer)
         
         # 根据是客户还是客服调整对齐方式
         if is_customer:
             layout.addStretch()
-            layout.addWidget(bubble)
+            layout.addWidget(self.bubble)
         else:
-            layout.addWidget(bubble)
+            layout.addWidget(self.bubble)
             layout.addStretch()
 
 
@@ -144,43 +152,68 @@ class WorkerThread(QThread):
     finished = pyqtSignal(dict)
     progress = pyqtSignal(int)
     error = pyqtSignal(str)
+    partial = pyqtSignal(str)  # 流式生成时的回复增量
     
-    def __init__(self, model_manager, text="", audio_path=None):
+    def __init__(self, model_manager, text="", audio=None, stream=True, parallel=True, session=None):
         super().__init__()
         self.model_manager = model_manager
+        # 本轮对话所属的会话，情感上下文随turn传递，多个线程可以同时使用同一个ModelManager
+        self.session = session if session is not None else model_manager.sessions.get()
         self.text = text
-        self.audio_path = audio_path
+        self.audio = audio  # 音频文件路径或内存中的AudioData
+        self.stream = stream
+        self.parallel = parallel  # 语音识别与音频情感分析并发执行
         
     def run(self):
         try:
             self.progress.emit(10)
+            timings = {}
+            response = None
+            turn = self.session.new_turn()
         
-            if self.audio_path:
+            if self.audio is not None:
                 # 处理语音
                 self.progress.emit(20)
-                # 音频转文字
-                text = self.model_manager.recognize_speech(self.audio_path)
+                # 音频转文字，同时使用emotion2vec分析音频情感
+                text, emotions, timings = self.model_manager.process_audio(
+                    self.audio, parallel=self.parallel, turn=turn
+                )
                 self.text = text
-                self.progress.emit(30)
-            
-                # 使用emotion2vec分析音频情感
-                emotions = self.model_manager.analyze_audio_emotion(self.audio_path)
                 self.progress.emit(50)
+            elif self.model_manager.single_pass_text:
+                # 一次生成同时得到文本情感和回复
+                self.progress.emit(30)
+                generation_start = time.perf_counter()
+                emotions, response = self.model_manager.analyze_and_respond(self.text, turn)
+                timings["generation"] = time.perf_counter() - generation_start
             else:
-                # 使用基于规则的方法分析文本情感
+                # 分级分析文本情感：词典分类器优先，必要时使用大模型
                 self.progress.emit(30)
-                emotions = self.model_manager.analyze_emotion(self.text)
+                emotions = self.model_manager.analyze_emotion(self.text, turn)
                 self.progress.emit(50)
         
-            # 生成回复
-            response = self.model_manager.generate_response(self.text, emotions)
+            # 生成回复（单次生成模式下已经得到回复）
+            if response is None:
+                generation_start = time.perf_counter()
+                if self.stream:
+                    # 流式生成，每收到一段增量就通知界面
+                    chunks = []
+                    for delta in self.model_manager.generate_response_stream(self.text, emotions, turn):
+                        chunks.append(delta)
+                        self.partial.emit(delta)
+                    response = "".join(chunks)
+                else:
+                    response = self.model_manager.generate_response(self.text, emotions, turn)
+                timings["generation"] = time.perf_counter() - generation_start
+            self.session.record(self.text, response, emotions)
             self.progress.emit(90)
             
             # 返回结果
             result = {
                 "text": self.text,
                 "emotions": emotions,
-                "response": response
+                "response": response,
+                "timings": timings
             }
             self.progress.emit(100)
             self.finished.emit(result)
@@ -193,10 +226,13 @@ class MainWindow(QMainWindow):
     def __init__(self, model_manager):
         super().__init__()
         self.model_manager = model_manager
-        self.audio_recorder = AudioRecorder()
-        self.current_audio_path = None
+        # 录音数据直接在内存中交给模型，不再写入临时WAV文件；去除静音后再识别
+        self.audio_recorder = AudioRecorder(save_to_disk=False, trim_silence=True)
+        self.current_audio = None
         self.worker = None
+        self.session = model_manager.sessions.get()  # 当前窗口的客户会话
         self.chat_history = []
+        self.streaming_item = None  # 正在流式显示的客服回复
         
         # 设置窗口
         self.setWindowTitle("智能客服系统")
@@ -414,7 +450,7 @@ class MainWindow(QMainWindow):
         
         # 音频录制信号
         self.audio_recorder.recording_started.connect(self.on_recording_started)
-        self.audio_recorder.recording_finished.connect(self.on_recording_finished)
+        self.audio_recorder.audio_ready.connect(self.on_recording_finished)
     
     def eventFilter(self, obj, event):
         if obj == self.input_text and event.type() == event.KeyPress:
@@ -452,23 +488,23 @@ class MainWindow(QMainWindow):
         dots = "." * self.recording_dots
         self.status_label.setText(f"正在录音{dots}")
     
-    def on_recording_finished(self, path):
+    def on_recording_finished(self, audio):
         self.btn_record.setEnabled(True)
         self.btn_stop.setEnabled(False)
         self.btn_send.setEnabled(True)
-        self.current_audio_path = path
+        self.current_audio = audio
         
         # 停止录音动画
         if hasattr(self, 'recording_timer'):
             self.recording_timer.stop()
         
         # 录音完成后再处理
-        if path and os.path.exists(path):
+        if audio is not None and len(audio.samples) > 0:
             self.status_label.setText("录音已完成，正在处理...")
             self.process_input(audio_only=True)
         else:
-            self.status_label.setText("录音失败")
-            QMessageBox.warning(self, "录音错误", "录音保存失败，请重试！")
+            self.status_label.setText("未检测到语音")
+            QMessageBox.warning(self, "录音错误", "未检测到有效语音，请重试！")
     
     def send_message(self):
         text = self.input_text.toPlainText().strip()
@@ -496,25 +532,27 @@ class MainWindow(QMainWindow):
             text = ""
         
         # 检查是否有输入
-        if not text and not self.current_audio_path:
+        if not text and not self.current_audio:
             QMessageBox.warning(self, "输入错误", "请输入文本或进行语音录制！")
             self.btn_send.setEnabled(True)
             self.btn_record.setEnabled(True)
             return
         
         # 如果是语音输入且没有显示文本，显示"正在处理语音..."
-        if self.current_audio_path and not text:
+        if self.current_audio and not text:
             self.add_message("(正在处理语音...)", is_customer=True)
         
         # 创建并启动工作线程
         self.worker = WorkerThread(
             self.model_manager, 
             text=text, 
-            audio_path=self.current_audio_path if not text else None
+            audio=self.current_audio if not text else None,
+            session=self.session
         )
         
         # 连接信号
         self.worker.progress.connect(self.update_progress)
+        self.worker.partial.connect(self.handle_partial)
         self.worker.finished.connect(self.handle_results)
         self.worker.error.connect(self.handle_error)
         
@@ -557,10 +595,9 @@ class MainWindow(QMainWindow):
     def update_progress(self, value):
         self.progress_bar.setValue(value)
     
-    @pyqtSlot(dict)
-    def handle_results(self, results):
+    def replace_voice_placeholder(self, text):
         # 如果是语音输入，更新之前的"处理中"消息
-        if self.current_audio_path and not results["text"] in [item["text"] for item in self.chat_history if item.get("is_customer", False)]:
+        if self.current_audio and not text in [item["text"] for item in self.chat_history if item.get("is_customer", False)]:
             # 移除最后一条客户消息（如果是处理中的消息）
             last_item = self.chat_layout.itemAt(self.chat_layout.count() - 1)
             if last_item and isinstance(last_item.widget(), MessageItem):
@@ -571,22 +608,47 @@ class MainWindow(QMainWindow):
                     self.chat_history.pop()
             
             # 添加识别出的文本作为客户消息
-            self.add_message(results["text"], is_customer=True)
-        
-        # 添加客服回复
-        self.add_message(results["response"], is_customer=False, emotions=results["emotions"])
+            self.add_message(text, is_customer=True)
+    
+    @pyqtSlot(str)
+    def handle_partial(self, delta):
+        if self.streaming_item is None:
+            # 收到第一段回复时再创建客服气泡，语音输入需先替换"处理中"消息
+            self.replace_voice_placeholder(self.worker.text)
+            self.streaming_item = MessageItem("", is_customer=False)
+            self.chat_layout.addWidget(self.streaming_item)
+        self.streaming_item.bubble.append_text(delta)
+        QTimer.singleShot(0, self.scroll_to_bottom)
+    
+    @pyqtSlot(dict)
+    def handle_results(self, results):
+        if self.streaming_item is not None:
+            # 回复已流式显示，只需校正最终文本并记录历史
+            self.streaming_item.bubble.set_text(results["response"])
+            self.chat_history.append({
+                "text": results["response"],
+                "is_customer": False,
+                "emotions": results["emotions"]
+            })
+            self.streaming_item = None
+        else:
+            self.replace_voice_placeholder(results["text"])
+            
+            # 添加客服回复
+            self.add_message(results["response"], is_customer=False, emotions=results["emotions"])
         
         # 重置状态
         self.status_label.setText("就绪")
         self.progress_bar.setValue(0)
         self.btn_send.setEnabled(True)
         self.btn_record.setEnabled(True)
-        self.current_audio_path = None  # 清除当前音频路径
+        self.current_audio = None  # 清除当前音频
     
     @pyqtSlot(str)
     def handle_error(self, error_msg):
+        self.streaming_item = None
         QMessageBox.critical(self, "处理错误", f"发生错误: {error_msg}")
         self.status_label.setText("处理出错")
         self.btn_send.setEnabled(True)
         self.btn_record.setEnabled(True)
-        self.current_audio_path = None
\ No newline at end of file
+        self.current_audio = None
\ No newline at end of file
@@ -0,0 +1,88 @@
+import wave
+from math import gcd
+
+import numpy as np
+
+
+class AudioData:
+    """内存中的单声道音频：float32波形（取值范围[-1, 1]）+ 采样率
+
+    录音器直接把采集到的PCM数据交给模型，避免写入WAV文件后再由
+    Whisper调用ffmpeg、emotion2vec重新读取和重采样。
+    """
+
+    def __init__(self, samples, sample_rate=16000, source=None):
+        self.samples = np.ascontiguousarray(samples, dtype=np.float32)
+        self.sample_rate = sample_rate
+        self.source = source  # 来源描述（文件路径等），仅用于日志
+
+    @classmethod
+    def from_pcm16(cls, data, sample_rate=16000, channels=1, source=None):
+        """由16位PCM字节数据创建，多声道时取平均值混为单声道"""
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        return cls(samples, sample_rate, source)
+
+    @classmethod
+    def from_file(cls, path):
+        """读取16位PCM的WAV文件"""
+        with wave.open(path, 'rb') as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"仅支持16位PCM的WAV文件: {path}")
+            data = wf.readframes(wf.getnframes())
+            return cls.from_pcm16(data, wf.getframerate(), wf.getnchannels(), source=path)
+
+    @property
+    def duration(self):
+        """时长（秒）"""
+        return len(self.samples) / float(self.sample_rate)
+
+    def resample(self, target_rate=16000):
+        """重采样到目标采样率，采样率相同时直接返回自身
+
+        安装了scipy时使用多相滤波（resample_poly）；否则降采样前先用加窗sinc低通滤波
+        去掉新奈奎斯特频率以上的成分，再线性插值，避免44.1/48kHz的音频降到16kHz时混叠。
+        """
+        if self.sample_rate == target_rate or len(self.samples) == 0:
+            return self
+        try:
+            from scipy.signal import resample_poly
+        except ImportError:
+            resample_poly = None
+        if resample_poly is not None:
+            common = gcd(int(self.sample_rate), int(target_rate))
+            samples = resample_poly(self.samples, int(target_rate) // common, int(self.sample_rate) // common)
+            return AudioData(samples, target_rate, self.source)
+
+        samples = self.samples
+        if target_rate < self.sample_rate:
+            samples = np.convolve(samples, self._lowpass(target_rate / float(self.sample_rate)), mode="same")
+        target_length = int(round(len(samples) * target_rate / float(self.sample_rate)))
+        positions = np.linspace(0, len(samples) - 1, target_length)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+        return AudioData(samples, target_rate, self.source)
+
+    @staticmethod
+    def _lowpass(ratio, zero_crossings=16):
+        """截止频率为新奈奎斯特频率（原采样率的ratio/2）的Kaiser加窗sinc低通滤波器"""
+        half = int(np.ceil(zero_crossings / ratio))
+        n = np.arange(-half, half + 1)
+        taps = ratio * np.sinc(ratio * n) * np.kaiser(len(n), 8.0)
+        return (taps / taps.sum()).astype(np.float32)
+
+    def to_pcm16(self):
+        """转换为16位PCM字节数据"""
+        return (np.clip(self.samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+    def save(self, path):
+        """保存为WAV文件"""
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(self.to_pcm16())
+
+    def __repr__(self):
+        source = f", source={self.source}" if self.source else ""
+        return f"AudioData({self.duration:.2f}s, {self.sample_rate}Hz{source})"
@@ -3,33 +3,57 @@ import wave
 import threading
 import time
 import os
+import logging
+import numpy as np
+from collections import deque
 from datetime import datetime
 from PyQt5.QtCore import QObject, pyqtSignal
+from utils.audio_data import AudioData
+from utils.vad import SpeechSegmenter
+from utils.ring_buffer import AudioRingBuffer
+
+logger = logging.getLogger("audio_recorder")
 
 
 class AudioRecorder(QObject):
     recording_started = pyqtSignal()
     recording_finished = pyqtSignal(str)
+    audio_ready = pyqtSignal(object)  # 录音结束后发送内存中的AudioData
+    chunk_ready = pyqtSignal(bytes)  # 录音过程中每读到一块PCM数据即发送，供流式识别使用
+    segment_ready = pyqtSignal(object)  # 检测到一段完整语音时发送该段的AudioData
+    audio_truncated = pyqtSignal(float)  # 录音超过max_duration，audio_ready只包含最近的音频时发送被丢弃的秒数
     
-    def __init__(self, channels=1, rate=16000, chunk=1024, format=pyaudio.paInt16):
+    def __init__(self, channels=1, rate=16000, chunk=1024, format=pyaudio.paInt16, save_to_disk=True,
+                 trim_silence=False, auto_stop_silence=None, max_duration=600):
         super().__init__()
         self.channels = channels
         self.rate = rate
         self.chunk = chunk
         self.format = format
+        self.save_to_disk = save_to_disk  # 为False时不写WAV文件，只发送audio_ready
+        self.trim_silence = trim_silence  # 为True时audio_ready只包含语音部分
+        self.auto_stop_silence = auto_stop_silence  # 说话后静音超过该秒数自动停止录音，None表示不自动停止
         self.recording = False
+        self.output_file = None
         self.audio = pyaudio.PyAudio()
+        
+        # 预分配的环形缓冲区，最多保留max_duration秒，多次录音复用同一块内存。
+        # 写WAV文件时录音边录边落盘，超过max_duration后缓冲区只保留最近的音频；
+        # 不写文件时录满max_duration自动停止
+        self.max_duration = max_duration
+        self.buffer = AudioRingBuffer(int(max_duration * rate) * channels)
     
     def start_recording(self, output_dir="temp"):
         if self.recording:
             return
         
-        # 确保输出目录存在
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 使用时间戳创建唯一文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        self.output_file = os.path.join(output_dir, f"audio_{timestamp}.wav")
+        if self.save_to_disk:
+            # 确保输出目录存在
+            os.makedirs(output_dir, exist_ok=True)
+            
+            # 使用时间戳创建唯一文件名
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            self.output_file = os.path.join(output_dir, f"audio_{timestamp}.wav")
         
         self.recording = True
         
@@ -50,28 +74,96 @@ class AudioRecorder(QObject):
             frames_per_buffer=self.chunk
         )
         
-        frames = []
+        self.buffer.reset()
+        
+        # 边录边写WAV文件，长时间通话不必等到结束再整体写出
+        wav_file = None
+        if self.save_to_disk:
+            output_dir = os.path.dirname(self.output_file)
+            if output_dir and not os.path.exists(output_dir):
+                os.makedirs(output_dir, exist_ok=True)
+            wav_file = wave.open(self.output_file, 'wb')
+            wav_file.setnchannels(self.channels)
+            wav_file.setsampwidth(self.audio.get_sample_size(self.format))
+            wav_file.setframerate(self.rate)
+        
+        # 实时检测语音，切出只含语音的片段
+        segmenter = None
+        if self.trim_silence or self.auto_stop_silence:
+            segmenter = SpeechSegmenter(self.rate)
+        # 去除静音后的语音片段，与环形缓冲区一样最多保留max_duration秒，超出时丢弃最早的部分
+        segments = deque()
+        segment_samples = 0
+        dropped_samples = 0
+        limit = int(self.max_duration * self.rate)
+
+        def keep(segment):
+            nonlocal segment_samples, dropped_samples
+            segments.append(segment)
+            segment_samples += len(segment)
+            while segment_samples > limit:
+                excess = segment_samples - limit
+                if len(segments[0]) <= excess:
+                    dropped = segments.popleft()
+                    segment_samples -= len(dropped)
+                    dropped_samples += len(dropped)
+                else:
+                    segments[0] = segments[0][excess:]
+                    segment_samples -= excess
+                    dropped_samples += excess
         
         # 录制音频
         while self.recording:
             data = stream.read(self.chunk)
-            frames.append(data)
+            self.buffer.write(data)
+            if wav_file is not None:
+                wav_file.writeframes(data)
+            elif self.buffer.full:
+                # 达到最长录音时长
+                self.recording = False
+            self.chunk_ready.emit(data)
+            
+            if segmenter is not None:
+                samples = AudioData.from_pcm16(data, self.rate, self.channels).samples
+                for segment in segmenter.feed(samples):
+                    keep(segment)
+                    self.segment_ready.emit(AudioData(segment, self.rate))
+                # 客户说完话后静音超时，自动停止录音
+                if (self.auto_stop_silence and segmenter.speech_detected
+                        and segmenter.silence_duration >= self.auto_stop_silence):
+                    self.recording = False
         
         # 停止并关闭流
         stream.stop_stream()
         stream.close()
         
-        # 确保目录存在
-        output_dir = os.path.dirname(self.output_file)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
+        if wav_file is not None:
+            wav_file.close()
+        
+        if segmenter is not None:
+            segment = segmenter.finish()
+            if segment is not None:
+                keep(segment)
+                self.segment_ready.emit(AudioData(segment, self.rate))
         
-        # 保存录音文件
-        with wave.open(self.output_file, 'wb') as wf:
-            wf.setnchannels(self.channels)
-            wf.setsampwidth(self.audio.get_sample_size(self.format))
-            wf.setframerate(self.rate)
-            wf.writeframes(b''.join(frames))
+        # 内存中的音频直接交给模型，去除静音后模型只处理语音部分
+        if self.trim_silence:
+            samples = np.concatenate(segments) if segments else np.zeros(0, dtype=np.float32)
+            dropped = dropped_samples / self.rate
+        else:
+            samples = None
+            dropped = (self.buffer.written - len(self.buffer)) / self.channels / self.rate
+        if dropped > 0:
+            # save_to_disk时录音文件仍然完整，只有交给模型的内存音频被截断
+            logger.warning(f"录音超过最长时长 {self.max_duration}s，内存中的音频丢弃了最早的 {dropped:.1f}s")
+            self.audio_truncated.emit(dropped)
+        if samples is not None:
+            self.audio_ready.emit(AudioData(samples, self.rate))
+        else:
+            self.audio_ready.emit(AudioData.from_pcm16(self.buffer.to_array(), self.rate, self.channels))
+        
+        if not self.save_to_disk:
+            return
         
         print(f"录音已保存到：{self.output_file}")
         
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text, converter=None):
+    """缓存键的文本归一化：繁体转简体、去除空白和标点、英文转小写"""
+    if converter is not None:
+        text = converter.convert(text)
+    return "".join(
+        ch for ch in text.lower()
+        if not ch.isspace() and not unicodedata.category(ch).startswith("P")
+    )
+
+
+def emotion_bucket(emotions, step=20):
+    """将情感分布量化为粗粒度的桶，相近的情感分布共享缓存"""
+    dominant = max(emotions, key=emotions.get)
+    levels = "/".join(f"{key}{int(round(value / step)) * step}" for key, value in sorted(emotions.items()))
+    return f"{dominant}|{levels}"
+
+
+class SQLiteStore:
+    """同一个SQLite文件上各缓存命名空间共用的连接和锁
+
+    每个命名空间各开一个连接、每次写入都提交时，多个线程同时写会出现database is locked。
+    这里一个文件只开一个连接，所有读写经同一把锁串行执行；写入累积commit_every条
+    或距上次提交超过commit_interval秒时才提交，进程退出时提交剩余的写入。
+    WAL模式和忙等待超时用于同一文件被其他进程打开的情况。
+    """
+
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, db_path, commit_every=64, commit_interval=1.0):
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.lock = threading.Lock()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT, key TEXT, value TEXT, created REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def shared(cls, db_path):
+        """返回db_path对应的共享实例，同一文件只创建一次"""
+        key = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+        with cls._stores_lock:
+            store = cls._stores.get(key)
+            if store is None:
+                store = cls._stores[key] = cls(db_path)
+            return store
+
+    @classmethod
+    def flush_all(cls):
+        with cls._stores_lock:
+            stores = list(cls._stores.values())
+        for store in stores:
+            store.flush()
+
+    def write(self, sql, params=(), commit=False):
+        """执行一条写入语句，commit为True时立即提交，否则按批提交"""
+        with self.lock:
+            self._conn.execute(sql, params)
+            self._pending += 1
+            if (commit or self._pending >= self.commit_every
+                    or time.monotonic() - self._last_commit >= self.commit_interval):
+                self._commit()
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def flush(self):
+        with self.lock:
+            if self._pending:
+                self._commit()
+
+    def _commit(self):
+        # 调用方需持有锁
+        self._conn.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+
+atexit.register(SQLiteStore.flush_all)
+
+
+class TTLCache:
+    """线程安全的LRU+TTL缓存，可选持久化到SQLite
+
+    内存中按最近使用顺序保存最多max_size条，超过ttl秒的条目视为过期。
+    指定db_path时写入经SQLiteStore批量落盘（同一文件的各命名空间共用一个连接），
+    启动时加载未过期的条目，使缓存跨重启保持预热。
+    值需要能被JSON序列化。
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, db_path=None, namespace="default"):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (写入时间, 值)
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        self._db = SQLiteStore.shared(db_path)
+        self._db.write(
+            "DELETE FROM cache WHERE namespace = ? AND created < ?",
+            (self.namespace, time.time() - self.ttl), commit=True
+        )
+        rows = self._db.query(
+            "SELECT key, value, created FROM cache WHERE namespace = ? ORDER BY created DESC LIMIT ?",
+            (self.namespace, self.max_size)
+        )
+        # 按写入时间从旧到新放入，最新的条目位于LRU末尾
+        for key, value, created in reversed(rows):
+            self._data[key] = (created, json.loads(value))
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            created, value = item
+            if time.time() - created > self.ttl:
+                self._evict(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._data[key] = (now, value)
+            self._data.move_to_end(key)
+            if self._db is not None:
+                self._db.write(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, created) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False), now)
+                )
+            while len(self._data) > self.max_size:
+                self._evict(next(iter(self._data)))
+
+    def _evict(self, key):
+        # 调用方需持有锁
+        self._data.pop(key, None)
+        if self._db is not None:
+            self._db.write("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self._db is not None:
+                self._db.write("DELETE FROM cache WHERE namespace = ?", (self.namespace,), commit=True)
+
+    def flush(self):
+        """立即提交尚未落盘的写入"""
+        if self._db is not None:
+            self._db.flush()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    @property
+    def hit_rate(self):
+        with self._lock:
+            return self._hit_rate()
+
+    def _hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """命中/未命中次数、命中率和当前条目数"""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self._hit_rate(),
+            }
@@ -5,19 +5,71 @@ APP_NAME = "智能客服系统"
 VERSION = "1.0.0"
 
 # 模型配置
-MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "local_models")
+# 以下模型配置都可以用同名环境变量覆盖，例如 WHISPER_MODEL_SIZE=tiny
+MODELS_DIR = os.environ.get(
+    "MODELS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "local_models")
+)
 TEMP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "temp")
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
 
 # 确保目录存在
 os.makedirs(MODELS_DIR, exist_ok=True)
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# 离线模式：只从MODELS_DIR加载模型，不访问模型仓库
+MODELS_OFFLINE = os.environ.get("MODELS_OFFLINE", "0") == "1"
+
+# 替身模型：用规则或随机权重的小模型代替真实模型，接口相同，用于无模型环境下的测试
+# 格式为逗号分隔的 模型名称[=类型]，all表示全部，例如 "whisper,emotion,qwen=tiny"
+STANDIN_MODELS = os.environ.get("STANDIN_MODELS", "")
+
 # Whisper 配置
-WHISPER_MODEL_SIZE = "small"  # 可选: tiny, base, small, medium, large
+WHISPER_MODEL_SIZE = os.environ.get("WHISPER_MODEL_SIZE", "small")  # 可选: tiny, base, small, medium, large
 
 # 情感分析配置
 EMOTION_MODEL_PATH = "uer/chinese_roberta_L-12_H-768_A-12_E-1-sentiment"
 EMOTION_TOKENIZER_PATH = "uer/chinese_roberta_L-12_H-768"
 
+# 语音情感配置
+EMOTION2VEC_MODEL = os.environ.get("EMOTION2VEC_MODEL", "iic/emotion2vec_plus_base")
+EMOTION2VEC_HUB = os.environ.get("EMOTION2VEC_HUB", "hf")  # 国内用户可以使用"ms"，海外用户使用"hf"
+
 # Qwen 配置
-QWEN_MODEL_PATH = "Qwen/Qwen-1_8B-Chat"
\ No newline at end of file
+QWEN_MODEL_PATH = os.environ.get("QWEN_MODEL_PATH", "Qwen/Qwen-1_8B-Chat")
+# 推测解码的草稿: 空为不使用；ngram为从上下文和历史回复中查找；或与Qwen共享词表的小模型ID/路径
+# 贪心解码下输出不变，只影响生成速度
+SPECULATIVE_DRAFT = os.environ.get("SPECULATIVE_DRAFT", "")
+
+# 知识库配置
+# FAQ问答文件（JSON数组或每行一个JSON对象），为空时不使用知识库
+KNOWLEDGE_BASE_PATH = os.environ.get("KNOWLEDGE_BASE_PATH", os.path.join(DATA_DIR, "faq.json"))
+KB_ANSWER_THRESHOLD = 0.6  # 最相关问答的得分不低于该值时直接用其答案回复，不调用大模型
+KB_CONTEXT_THRESHOLD = 0.3  # 得分不低于该值的问答作为参考资料放进回复提示词
+KB_TOP_K = 3
+
+# 意图识别配置
+# 意图标注文件（每行一个 {"text", "intent"}），与知识库问答一起训练意图分类器，为空时不做意图识别
+INTENT_DATA_PATH = os.environ.get("INTENT_DATA_PATH", os.path.join(DATA_DIR, "intents.jsonl"))
+
+# 长音频情感分析配置
+# 超过SER_LONG_AUDIO_SECONDS的音频切成重叠窗口分批送入emotion2vec，避免整段前向的平方级注意力开销
+SER_WINDOW_SECONDS = 4.0
+SER_HOP_SECONDS = 2.0
+SER_LONG_AUDIO_SECONDS = 30.0
+
+# 多模态情感融合配置
+FUSION_TEXT_WEIGHT = float(os.environ.get("FUSION_TEXT_WEIGHT", "0.6"))  # 文本情感的融合权重，音频为1减去该值
+# 用标注数据学习得到的融合权重文件（见EmotionAnalyzer.fit/save），文件存在时优先于FUSION_TEXT_WEIGHT
+FUSION_WEIGHTS_PATH = os.environ.get("FUSION_WEIGHTS_PATH", os.path.join(DATA_DIR, "fusion_weights.json"))
+
+# 日志与指标配置
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+VERBOSE = os.environ.get("VERBOSE", "0") == "1"  # 打印每次调用的模型原始输出和情感分析表格
+METRICS_LOG = os.environ.get("METRICS_LOG", "0") == "1"  # 每个阶段结束时输出一行JSON结构化日志
+
+# 推理后端配置
+# fp32: 原始模型；int8: torch动态量化（仅CPU）；ctranslate2: 使用faster-whisper（仅Whisper）
+# 所选后端未安装或加载失败时自动退回fp32
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "fp32")  # 可选: fp32, int8, ctranslate2
+EMOTION_BACKEND = os.environ.get("EMOTION_BACKEND", "fp32")  # 可选: fp32, int8
+QWEN_BACKEND = os.environ.get("QWEN_BACKEND", "fp32")  # 可选: fp32, int8
@@ -0,0 +1,265 @@
+import json
+import time
+import inspect
+import functools
+import logging
+import threading
+import weakref
+
+from utils import config
+
+# 运行指标：计数器、直方图和采集回调，导出为Prometheus文本格式；
+# 阶段耗时同时可以输出为结构化日志（每行一个JSON），调试打印由verbose开关控制。
+
+logger = logging.getLogger("metrics")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    escaped = [
+        (k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in key
+    ]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不减的计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """可增可减的当前值"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    """按桶累计的耗时分布"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._values = {}  # 标签 -> [各桶计数, 总和, 样本数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            entry = self._values.get(_label_key(labels))
+            return entry[2] if entry else 0
+
+    def samples(self):
+        rows = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    rows.append((f"{self.name}_bucket", key + (("le", _format_value(float(bound))),), bucket_count))
+                rows.append((f"{self.name}_bucket", key + (("le", "+Inf"),), count))
+                rows.append((f"{self.name}_sum", key, total))
+                rows.append((f"{self.name}_count", key, count))
+        return rows
+
+
+class Span:
+    """计时上下文：退出时把耗时记入直方图，并按配置输出结构化日志"""
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.seconds = None
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        # 流式生成被调用方提前关闭时不算出错
+        error = exc_type is not None and not issubclass(exc_type, GeneratorExit)
+        self.registry.stage_seconds.observe(self.seconds, stage=self.name, **self.labels)
+        if error:
+            self.registry.errors.inc(stage=self.name)
+        self.registry.log_event("span", stage=self.name, seconds=round(self.seconds, 6), error=error, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """一组指标；collector回调在导出时调用，用于缓存命中率、会话数等现成的统计"""
+
+    def __init__(self, prefix="ics_", structured_logs=False):
+        self.prefix = prefix
+        self.structured_logs = structured_logs
+        self._metrics = {}
+        self._collectors = {}  # 名称 -> [绑定方法的弱引用, ...]，按登记顺序
+        self._lock = threading.Lock()
+
+        self.stage_seconds = self.histogram("stage_seconds", "流水线各阶段耗时（秒）")
+        self.errors = self.counter("stage_errors_total", "各阶段抛出异常的次数")
+        self.fallbacks = self.counter("fallbacks_total", "各类降级处理的次数")
+        self.model_load_seconds = self.gauge("model_load_seconds", "模型加载耗时（秒）")
+        self.model_load_failures = self.counter("model_load_failures_total", "模型加载失败的次数")
+
+    def _register(self, cls, name, help, **kwargs):
+        full_name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, help, **kwargs)
+            return metric
+
+    def counter(self, name, help):
+        return self._register(Counter, name, help)
+
+    def gauge(self, name, help):
+        return self._register(Gauge, name, help)
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, buckets=buckets)
+
+    def span(self, name, **labels):
+        """记录一个阶段的耗时: with metrics.span("asr"): ..."""
+        return Span(self, name, labels)
+
+    def traced(self, name):
+        """装饰器：把函数（或生成器从开始到耗尽）的耗时记为一个阶段"""
+        def decorator(func):
+            if inspect.isgeneratorfunction(func):
+                @functools.wraps(func)
+                def generator(*args, **kwargs):
+                    with self.span(name):
+                        yield from func(*args, **kwargs)
+                return generator
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def fallback(self, reason, **fields):
+        """记录一次降级处理"""
+        self.fallbacks.inc(reason=reason)
+        self.log_event("fallback", reason=reason, **fields)
+
+    def log_event(self, event, **fields):
+        if self.structured_logs:
+            logger.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, ensure_ascii=False))
+
+    def add_collector(self, method, name=None):
+        """登记导出时调用的绑定方法，返回 [(指标名, 类型, 说明, [(标签字典, 值), ...]), ...]
+
+        按name（缺省为方法的限定名，如 ModelManager._collect_metrics）登记，同名的只导出最近登记且仍存活的一个，
+        否则多个实例会导出重复的指标族。只保存弱引用，所属对象被回收后自动失效。
+        """
+        name = name or method.__qualname__
+        with self._lock:
+            self._collectors.setdefault(name, []).append(weakref.WeakMethod(method))
+
+    def _collected(self):
+        rows = []
+        with self._lock:
+            collectors = []
+            for name in list(self._collectors):
+                refs = [ref for ref in self._collectors[name] if ref() is not None]
+                if refs:
+                    self._collectors[name] = refs
+                    collectors.append(refs[-1]())
+                else:
+                    del self._collectors[name]
+        for collect in collectors:
+            if collect is None:
+                continue
+            try:
+                rows.extend(collect())
+            except Exception as e:
+                logger.warning(f"指标采集出错: {str(e)}")
+        return rows
+
+    def render(self):
+        """Prometheus文本格式"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in samples:
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        for name, kind, help, values in self._collected():
+            name = self.prefix + name
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                lines.append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享的默认指标
+metrics = MetricsRegistry(structured_logs=config.METRICS_LOG)
+
+
+def set_verbose(enabled):
+    config.VERBOSE = enabled
+
+
+def debug_print(*args, **kwargs):
+    """调试打印，只在utils/config.py的VERBOSE开启时输出"""
+    if config.VERBOSE:
+        print(*args, **kwargs)
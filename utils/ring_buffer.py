@@ -0,0 +1,83 @@
+import threading
+import numpy as np
+
+
+class AudioRingBuffer:
+    """预分配的PCM环形缓冲区
+
+    录音时每块数据直接拷贝进固定大小的NumPy数组，不再为每块创建并保存bytes对象，
+    长时间通话的内存占用固定为capacity。样本用绝对位置（自开始以来写入的总样本数）
+    寻址，下游可以通过memoryview零拷贝地读取仍在缓冲区中的任意区间。
+    """
+
+    def __init__(self, capacity, dtype=np.int16):
+        self.capacity = int(capacity)
+        self._buffer = np.zeros(self.capacity, dtype=dtype)
+        self._view = memoryview(self._buffer)
+        self._lock = threading.Lock()
+        self.written = 0  # 自开始以来写入的样本总数
+
+    @property
+    def start(self):
+        """缓冲区中最早样本的绝对位置，更早的样本已被覆盖"""
+        return max(0, self.written - self.capacity)
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    @property
+    def full(self):
+        return self.written >= self.capacity
+
+    def reset(self):
+        """清空缓冲区以便复用，不重新分配内存"""
+        with self._lock:
+            self.written = 0
+
+    def write(self, data):
+        """写入bytes或数组，缓冲区满后覆盖最旧的样本，返回写入的样本数"""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(data, dtype=self._buffer.dtype)
+        else:
+            samples = np.asarray(data, dtype=self._buffer.dtype)
+        if len(samples) > self.capacity:
+            # 超过容量的部分只保留最后capacity个样本
+            skipped = len(samples) - self.capacity
+            samples = samples[skipped:]
+        else:
+            skipped = 0
+
+        with self._lock:
+            pos = (self.written + skipped) % self.capacity
+            first = min(len(samples), self.capacity - pos)
+            self._buffer[pos:pos + first] = samples[:first]
+            self._buffer[:len(samples) - first] = samples[first:]
+            self.written += skipped + len(samples)
+        return skipped + len(samples)
+
+    def views(self, start=None, stop=None):
+        """返回绝对位置[start, stop)区间的memoryview列表（跨越缓冲区末尾时为两段）
+
+        视图直接引用内部数组，之后的写入可能覆盖其内容，需要长期保存时请复制。
+        """
+        with self._lock:
+            start = self.start if start is None else max(start, self.start)
+            stop = self.written if stop is None else min(stop, self.written)
+            if stop <= start:
+                return []
+            a = start % self.capacity
+            b = a + (stop - start)
+            if b <= self.capacity:
+                return [self._view[a:b]]
+            return [self._view[a:], self._view[:b - self.capacity]]
+
+    def latest(self, n):
+        """最近n个样本的memoryview列表"""
+        return self.views(self.written - n, self.written)
+
+    def to_array(self, start=None, stop=None):
+        """复制区间内的样本为连续数组"""
+        views = self.views(start, stop)
+        if not views:
+            return np.zeros(0, dtype=self._buffer.dtype)
+        return np.concatenate([np.asarray(v) for v in views])
@@ -0,0 +1,40 @@
+import time
+
+
+class IncrementalConverter:
+    """对流式输出的文本增量进行简繁转换
+
+    opencc按词组转换，新到达的字符可能改变末尾几个字的转换结果，
+    因此每次只输出除末尾holdback个字符外已稳定的部分，结束时再flush剩余内容。
+    """
+
+    def __init__(self, converter=None, holdback=2):
+        self.converter = converter
+        self.holdback = holdback
+        self._raw = ""
+        self._emitted = 0
+        self.seconds = 0.0  # 累计转换耗时
+
+    def _convert(self):
+        if self.converter is None:
+            return self._raw
+        start = time.perf_counter()
+        converted = self.converter.convert(self._raw)
+        self.seconds += time.perf_counter() - start
+        return converted
+
+    def feed(self, delta):
+        """追加一段原始文本，返回可以安全输出的转换后增量"""
+        self._raw += delta
+        converted = self._convert()
+        stable_end = max(len(converted) - self.holdback, self._emitted)
+        out = converted[self._emitted:stable_end]
+        self._emitted = stable_end
+        return out
+
+    def flush(self):
+        """返回尚未输出的剩余内容"""
+        converted = self._convert()
+        out = converted[self._emitted:]
+        self._emitted = len(converted)
+        return out
@@ -0,0 +1,175 @@
+import numpy as np
+
+
+class EnergyVAD:
+    """基于短时能量的语音活动检测
+
+    按帧计算RMS能量(dBFS)，高于阈值判为语音。阈值取固定下限与自适应噪声底+余量中
+    的较大者，噪声底只在非语音帧上缓慢更新，适应不同环境的底噪。
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, threshold_db=-45.0, margin_db=10.0,
+                 noise_adapt=0.05):
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.frame_ms = frame_ms
+        self.threshold_db = threshold_db  # 绝对能量下限
+        self.margin_db = margin_db  # 高出噪声底多少判为语音
+        self.noise_adapt = noise_adapt  # 噪声底的更新速度
+        self.noise_floor_db = None
+
+    @staticmethod
+    def frame_energy_db(frames):
+        """每帧的RMS能量(dBFS)，frames形状为(帧数, 帧长)"""
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+        return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+    def is_speech(self, samples):
+        """对完整的帧逐帧判断，返回布尔数组；末尾不足一帧的样本被忽略"""
+        samples = np.asarray(samples, dtype=np.float32)
+        n_frames = len(samples) // self.frame_size
+        if n_frames == 0:
+            return np.zeros(0, dtype=bool)
+        frames = samples[:n_frames * self.frame_size].reshape(n_frames, self.frame_size)
+        energies = self.frame_energy_db(frames)
+
+        decisions = np.empty(n_frames, dtype=bool)
+        for i, energy in enumerate(energies):
+            if self.noise_floor_db is None:
+                self.noise_floor_db = min(energy, self.threshold_db)
+            threshold = max(self.threshold_db, self.noise_floor_db + self.margin_db)
+            decisions[i] = energy > threshold
+            if not decisions[i]:
+                self.noise_floor_db += self.noise_adapt * (energy - self.noise_floor_db)
+        return decisions
+
+    def reset(self):
+        self.noise_floor_db = None
+
+
+def speech_segments(samples, sample_rate=16000, vad=None, min_silence_ms=300,
+                    min_speech_ms=150, padding_ms=100):
+    """找出音频中的语音片段，返回[(起始样本, 结束样本), ...]
+
+    短于min_silence_ms的停顿会被合并，短于min_speech_ms的片段视为噪声丢弃，
+    每个片段前后各保留padding_ms避免截断字头字尾。
+    """
+    vad = vad or EnergyVAD(sample_rate)
+    decisions = vad.is_speech(samples)
+    frame = vad.frame_size
+    min_silence = max(1, int(min_silence_ms / vad.frame_ms))
+    min_speech = max(1, int(min_speech_ms / vad.frame_ms))
+    padding = int(sample_rate * padding_ms / 1000)
+
+    segments = []
+    start = None
+    silence = 0
+    for i, speech in enumerate(decisions):
+        if speech:
+            if start is None:
+                start = i
+            silence = 0
+        elif start is not None:
+            silence += 1
+            if silence >= min_silence:
+                end = i - silence + 1
+                if end - start >= min_speech:
+                    segments.append((start, end))
+                start = None
+                silence = 0
+    if start is not None:
+        end = len(decisions) - silence
+        if end - start >= min_speech:
+            segments.append((start, end))
+
+    # 加上前后留白后相邻片段可能重叠，合并为一个
+    merged = []
+    for s, e in segments:
+        s, e = max(0, s * frame - padding), min(len(samples), e * frame + padding)
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((s, e))
+    return merged
+
+
+class SpeechSegmenter:
+    """增量式语音切分：逐块输入音频，语音段结束时返回该段的波形
+
+    用于录音过程中实时去除静音，并据此判断静音持续了多久。
+    """
+
+    def __init__(self, sample_rate=16000, vad=None, min_silence_ms=500, min_speech_ms=150, padding_ms=150):
+        self.sample_rate = sample_rate
+        self.vad = vad or EnergyVAD(sample_rate)
+        self.frame_size = self.vad.frame_size
+        self.end_frames = max(1, int(min_silence_ms / self.vad.frame_ms))
+        self.min_speech_frames = max(1, int(min_speech_ms / self.vad.frame_ms))
+        self.padding_frames = max(1, int(padding_ms / self.vad.frame_ms))
+        self.speech_detected = False  # 是否已经出现过语音
+        self.silence_frames = 0  # 最近一次语音之后连续的静音帧数
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll = []
+        self._segment = None  # 当前语音段的帧列表
+        self._speech_frames = 0
+
+    @property
+    def silence_duration(self):
+        """最近一次语音之后已持续的静音时长（秒）"""
+        return self.silence_frames * self.vad.frame_ms / 1000.0
+
+    def feed(self, samples):
+        """输入float32波形，返回本次结束的语音段列表"""
+        samples = np.concatenate([self._pending, np.asarray(samples, dtype=np.float32)])
+        n_frames = len(samples) // self.frame_size
+        self._pending = samples[n_frames * self.frame_size:]
+        frames = samples[:n_frames * self.frame_size].reshape(n_frames, self.frame_size)
+        segments = []
+        for frame, speech in zip(frames, self.vad.is_speech(frames.reshape(-1))):
+            if speech:
+                self.speech_detected = True
+                self.silence_frames = 0
+            else:
+                self.silence_frames += 1
+
+            if self._segment is None:
+                if speech:
+                    self._segment = self._preroll + [frame]
+                    self._speech_frames = 1
+                    self._preroll = []
+                else:
+                    self._preroll = (self._preroll + [frame])[-self.padding_frames:]
+                continue
+
+            self._segment.append(frame)
+            if speech:
+                self._speech_frames += 1
+            elif self.silence_frames >= self.end_frames:
+                segment = self._close()
+                if segment is not None:
+                    segments.append(segment)
+        return segments
+
+    def _close(self):
+        # 去掉末尾多余的静音，只保留padding
+        keep = len(self._segment) - max(0, self.silence_frames - self.padding_frames)
+        frames = self._segment[:keep]
+        enough = self._speech_frames >= self.min_speech_frames
+        self._segment = None
+        self._speech_frames = 0
+        return np.concatenate(frames) if enough else None
+
+    def finish(self):
+        """输入结束，返回尚未结束的最后一个语音段（没有则返回None）"""
+        segment = self._close() if self._segment is not None else None
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll = []
+        return segment
+
+
+def trim_silence(samples, sample_rate=16000, **kwargs):
+    """去除首尾静音和较长的停顿，返回只含语音的波形（无语音时返回空数组）"""
+    segments = speech_segments(samples, sample_rate, **kwargs)
+    if not segments:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate([samples[s:e] for s, e in segments])